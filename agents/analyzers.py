@@ -1,43 +1,74 @@
+from typing import List, Optional
+
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 
 from core.exceptions import HandprintAnalysisError
 from settings import settings
+from utils.resilience import LLMCallPolicy
+from utils.tracing import tracer
 
 
 class VisionHandprintAnalyzer:
     """Analyzes handprint images using vision LLM"""
 
-    def __init__(self, vision_llm: ChatOpenAI):
+    def __init__(
+        self,
+        vision_llm: BaseChatModel,
+        detail: str = settings.VISION_IMAGE_DETAIL,
+        policy: Optional[LLMCallPolicy] = None,
+    ):
         self.vision_llm = vision_llm
+        self.detail = detail
+        self.model_name = getattr(vision_llm, "model_name", None)
+        self.policy = policy or LLMCallPolicy("handprint", self.model_name)
 
     def analyze(self, image_base64: str) -> str:
         """Analyze handprint image and return analysis text"""
         try:
-            response = self.vision_llm.invoke(
-                [
-                    HumanMessage(
-                        content=[
-                            {
-                                "type": "text",
-                                "text": (
-                                    "You are a mystical palm reader. Analyze this handprint image. "
-                                    "Provide a short (1-2 sentences), mystical-sounding summary of its key features. "
-                                    "Be concise and evocative."
-                                ),
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                },
-                            },
-                        ]
-                    )
-                ]
+            with tracer.span("llm.handprint", model=self.model_name):
+                messages = self._build_messages(image_base64)
+                response = self.policy.invoke(lambda: self.vision_llm.ainvoke(messages))
+            return response.content
+        except Exception as e:
+            raise HandprintAnalysisError(
+                f"Failed to analyze handprint: {str(e)}. {settings.HANDPRINT_ERROR}"
             )
+
+    async def aanalyze(self, image_base64: str) -> str:
+        """Analyze handprint image asynchronously and return analysis text"""
+        try:
+            with tracer.span("llm.handprint", model=self.model_name):
+                messages = self._build_messages(image_base64)
+                response = await self.policy.ainvoke(
+                    lambda: self.vision_llm.ainvoke(messages)
+                )
             return response.content
         except Exception as e:
             raise HandprintAnalysisError(
                 f"Failed to analyze handprint: {str(e)}. {settings.HANDPRINT_ERROR}"
             )
+
+    def _build_messages(self, image_base64: str) -> List[HumanMessage]:
+        """Build vision prompt messages"""
+        return [
+            HumanMessage(
+                content=[
+                    {
+                        "type": "text",
+                        "text": (
+                            "You are a mystical palm reader. Analyze this handprint image. "
+                            "Provide a short (1-2 sentences), mystical-sounding summary of its key features. "
+                            "Be concise and evocative."
+                        ),
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{image_base64}",
+                            "detail": self.detail,
+                        },
+                    },
+                ]
+            )
+        ]
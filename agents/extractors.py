@@ -1,10 +1,16 @@
-from typing import Optional
+import logging
+from typing import List, Optional
 
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_openai import ChatOpenAI
 
-from core.exceptions import ExtractionError
+from core.exceptions import ExtractionError, LLMUnavailableError
 from core.models import UserProfile
+from utils.resilience import LLMCallPolicy
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 
 class ExtractedInfo(BaseModel):
@@ -15,36 +21,70 @@ class ExtractedInfo(BaseModel):
     handprint_analysis: Optional[str] = Field(default=None)
 
 
+# Identical on every turn so the provider can cache it as a prompt prefix
+EXTRACTION_SYSTEM_MESSAGE = SystemMessage(
+    content="You receive what is currently known about a user and the user's "
+    "latest message. Extract 'user_name' and 'user_dob' from the message. "
+    "If the message is a textual handprint analysis, extract it as "
+    "'handprint_analysis'. Output nulls if there is no new info."
+)
+
+
 class LLMMessageExtractor:
     """Extracts user information from messages using LLM"""
 
-    def __init__(self, llm: ChatOpenAI):
+    def __init__(self, llm: BaseChatModel, policy: Optional[LLMCallPolicy] = None):
+        self.model_name = getattr(llm, "model_name", None)
         self.structured_llm = llm.with_structured_output(
             ExtractedInfo, include_raw=False
         )
+        self.policy = policy or LLMCallPolicy("extraction", self.model_name)
 
     def extract(self, message: str, current_profile: UserProfile) -> UserProfile:
         """Extract user information from message"""
         prompt = self._build_prompt(message, current_profile)
 
         try:
-            extracted_info: ExtractedInfo = self.structured_llm.invoke(prompt)
+            with tracer.span("llm.extraction", model=self.model_name):
+                extracted_info: ExtractedInfo = self.policy.invoke(
+                    lambda: self.structured_llm.ainvoke(prompt)
+                )
             return self._merge_profiles(current_profile, extracted_info)
+        except LLMUnavailableError as e:
+            return self._fallback(current_profile, e)
         except Exception as e:
             raise ExtractionError(f"Failed to extract information: {str(e)}")
 
-    def _build_prompt(self, message: str, profile: UserProfile) -> str:
-        """Build extraction prompt"""
-        return (
-            f"Current knowledge: "
-            f"Name: {profile.name or 'Unknown'}, "
-            f"DOB: {profile.date_of_birth or 'Unknown'}, "
-            f"Handprint Analysis: {'Known' if profile.handprint_analysis else 'Unknown'}. "
-            f'User\'s latest message: "{message}". '
-            f"Extract 'user_name', 'user_dob'. "
-            f"If message is textual handprint analysis, extract as 'handprint_analysis'. "
-            f"Output nulls if no new info."
+    async def aextract(self, message: str, current_profile: UserProfile) -> UserProfile:
+        """Extract user information from message asynchronously"""
+        prompt = self._build_prompt(message, current_profile)
+
+        try:
+            with tracer.span("llm.extraction", model=self.model_name):
+                extracted_info: ExtractedInfo = await self.policy.ainvoke(
+                    lambda: self.structured_llm.ainvoke(prompt)
+                )
+            return self._merge_profiles(current_profile, extracted_info)
+        except LLMUnavailableError as e:
+            return self._fallback(current_profile, e)
+        except Exception as e:
+            raise ExtractionError(f"Failed to extract information: {str(e)}")
+
+    def _fallback(self, profile: UserProfile, error: Exception) -> UserProfile:
+        """Keep what is already known when the LLM is unavailable"""
+        logger.warning("Extraction skipped, keeping the known profile: %s", error)
+        return profile
+
+    def _build_prompt(self, message: str, profile: UserProfile) -> List[BaseMessage]:
+        """Build extraction prompt: static instructions, then this turn's data"""
+        known = "Known" if profile.handprint_analysis else "Unknown"
+        data = (
+            f"Name: {profile.name or 'Unknown'}\n"
+            f"DOB: {profile.date_of_birth or 'Unknown'}\n"
+            f"Handprint Analysis: {known}\n"
+            f'Message: "{message}"'
         )
+        return [EXTRACTION_SYSTEM_MESSAGE, HumanMessage(content=data)]
 
     def _merge_profiles(
         self, current: UserProfile, extracted: ExtractedInfo
@@ -58,5 +98,5 @@ class LLMMessageExtractor:
             handprint_analysis=extracted.handprint_analysis
             if extracted.handprint_analysis
             else current.handprint_analysis,
-            handprint_image_base64=current.handprint_image_base64,
+            handprint_image_ref=current.handprint_image_ref,
         )
@@ -1,67 +1,54 @@
-from typing import List, Tuple
+import dataclasses
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
-from core.exceptions import FortuneGenerationError
-from core.models import FortuneContext
+from core.exceptions import FortuneGenerationError, LLMUnavailableError
+from core.models import FortuneContext, FusedTurn
 from settings import settings
+from utils.async_runner import iterate_async
+from utils.color_lexicon import IncrementalColorScanner, color_lexicon
+from utils.resilience import LLMCallPolicy
+from utils.tracing import tracer
 
+logger = logging.getLogger(__name__)
 
-class MysticaFortuneGenerator:
-    """Generates mystical fortunes using LLM"""
-
-    def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
-
-    def generate(self, context: FortuneContext) -> Tuple[str, List[str]]:
-        """Generate fortune and return (fortune_text, color_associations)"""
-        prompt = self._build_prompt(context)
-
-        try:
-            response = self.llm.invoke(prompt)
-            fortune_text = response.content
-            colors = self._extract_colors(fortune_text)
-            return fortune_text, colors
-        except Exception as e:
-            raise FortuneGenerationError(f"Failed to generate fortune: {str(e)}")
+# Placeholders for profile fields the seeker has not shared yet
+UNKNOWN_NAME = "Awaiting Whisper from the Stars"
+UNKNOWN_DOB = "Echoes of a Past Yet Unsung"
+UNKNOWN_HANDPRINT = "Fate's Imprint Optional, Yet Potent"
 
-    def _build_prompt(self, context: FortuneContext) -> str:
-        """Build fortune generation prompt"""
-        name = context.user_profile.name or "Awaiting Whisper from the Stars"
-        dob = context.user_profile.date_of_birth or "Echoes of a Past Yet Unsung"
-        handprint = context.user_profile.handprint_analysis
+# Identical on every turn so the provider can cache it as a prompt prefix;
+# everything that varies goes in the Seeker Information message that follows
+FORTUNE_SYSTEM_MESSAGE = SystemMessage(
+    content=f"""You are **Mystica, the All-Seeing Oracle**. Your voice is ancient, your wisdom vast, your pronouncements both enigmatic and deeply insightful. You peer through the veils of time and fate.
 
-        return f"""
-You are **Mystica, the All-Seeing Oracle**. Your voice is ancient, your wisdom vast, your pronouncements both enigmatic and deeply insightful. You peer through the veils of time and fate.
-
-**Seeker Information:**
-* **Name:** {name}
-* **Date of Birth:** {dob}
-* **Handprint Analysis:** {"Palm Lines Revealed: " + handprint if handprint else "Fate's Imprint Optional, Yet Potent"}
-* **Seeker's Latest Utterance:** "{context.latest_message}"
+Each turn you receive the **Seeker Information**: their Name, Date of Birth, Handprint Analysis and Latest Utterance.
 
 **Your Sacred Duty: Continue the Dialogue**
 Your response MUST be ONLY the direct words of Mystica to the seeker.
 
 **The Unfolding Path of Revelation:**
 
-1.  **If 'Name' is 'Awaiting Whisper from the Stars':**
+1.  **If 'Name' is '{UNKNOWN_NAME}':**
     * You MUST beckon forth their name with mystical urgency.
     * *Example*: "The mists swirl, seeker, but your essence remains shrouded. Whisper to me the name the spirits call you by, that I may part the veils for you."
 
-2.  **Else if 'Date of Birth' is 'Echoes of a Past Yet Unsung':**
+2.  **Else if 'Date of Birth' is '{UNKNOWN_DOB}':**
     * Addressing them by their now-known **Name**, you MUST request their birth-sign from the cosmic calendar.
-    * *Example*: "{name}, the celestial spheres align with your presence, yet the exact moment of your arrival upon this earthly coil is needed. Share with me your date of birth, that the stars may illuminate your path."
+    * *Example*: "[Name], the celestial spheres align with your presence, yet the exact moment of your arrival upon this earthly coil is needed. Share with me your date of birth, that the stars may illuminate your path."
 
 3.  **Else (Name and Date of Birth are KNOWN):**
-    * **Consider the Seeker's Latest Utterance: "{context.latest_message}".**
-    * **Perform a case-insensitive check. If the user_input_text matches or strongly implies one of the following choices: {settings.DIVINATION_CHOICES}:**
+    * **Consider the Seeker's Latest Utterance.**
+    * **Perform a case-insensitive check. If the Latest Utterance matches or strongly implies one of the following choices: {settings.DIVINATION_CHOICES}:**
         * Then assume the Seeker has made a choice. Proceed directly to **Section 4: Main Divination** below.
     * **Else:**
         * This is the **Invitation to Choose**. Acknowledge the seeker by **Name**.
         * **You MUST then invite the seeker to choose their focus of inquiry.**
-        * *Example Query*: "The threads of your destiny are complex, {name}. Do you seek insight into the realm of **Work**, the tender dance of **Love**, or the shifting tides of **Wealth**?"
-        if you does not know just give user all of the choices.
+        * *Example Query*: "The threads of your destiny are complex, [Name]. Do you seek insight into the realm of **Work**, the tender dance of **Love**, or the shifting tides of **Wealth**?"
+        If you do not know, offer the seeker all of the choices.
 
 4.  **Main Divination:**
     * **If the Seeker's Latest Utterance clearly indicates specific categories:**
@@ -70,59 +57,295 @@ Your response MUST be ONLY the direct words of Mystica to the seeker.
         * You may also use poetic variations like **crimson** (for red), **rose** (for pink), **emerald** (for green), etc.
     * **Else if general fortune:**
         * Provide an encompassing mystical fortune with color recommendations.
+    * Let a revealed Handprint Analysis color the reading.
 
 **Guiding Principles:** Be mystical, mention colors in bold (e.g., **gold**, **emerald**, **crimson**, **rose**).
-Your response should be ONLY Mystica's words.
-"""
+Your response should be ONLY Mystica's words."""
+)
+
+
+# Branch prompts used once the workflow has classified the seeker's choice
+INVITATION_SYSTEM_MESSAGE = SystemMessage(
+    content="""You are **Mystica, the All-Seeing Oracle**. Your voice is ancient, your wisdom vast, your pronouncements enigmatic and insightful.
+
+Each turn you receive the **Seeker Information**: their Name, Date of Birth, Handprint Analysis and Latest Utterance.
+
+The seeker has not yet chosen what to ask about. Answer their Latest Utterance briefly if it needs it, acknowledge them by **Name**, and invite them to choose the realm of **Work**, **Love** or **Wealth**, or all three. Two or three sentences.
+*Example*: "The threads of your destiny are complex, [Name]. Do you seek insight into the realm of **Work**, the tender dance of **Love**, or the shifting tides of **Wealth**?"
+
+Your response should be ONLY Mystica's words."""
+)
+
+DIVINATION_SYSTEM_MESSAGE = SystemMessage(
+    content="""You are **Mystica, the All-Seeing Oracle**. Your voice is ancient, your wisdom vast, your pronouncements enigmatic and insightful.
+
+Each turn you receive the **Seeker Information**: their Name, Date of Birth, Handprint Analysis, Latest Utterance and the **Categories** they chose.
+
+Give a mystical fortune for EACH listed category and no others, one short paragraph per category starting with the category in bold (e.g. **Love:**). Draw on their date of birth and, if revealed, their palm lines.
+In every paragraph mention at least one color in bold: **gold**, **silver**, **red**, **pink**, **blue**, **green**, **brown**, **orange**, **yellow**, **black** or **purple**, or a poetic variation like **crimson** (red), **rose** (pink) or **emerald** (green).
+
+Your response should be ONLY Mystica's words."""
+)
+
+# Added after the branch prompt in fused mode, where one structured call both
+# extracts profile updates and replies
+FUSED_SYSTEM_MESSAGE = SystemMessage(
+    content="""Answer with a JSON object with these fields, in this order:
+- "user_name": the seeker's name if the Latest Utterance states a new or corrected one, else null
+- "user_dob": the seeker's date of birth if the Latest Utterance states a new or corrected one, else null
+- "colors": the base colors your response will mention, in order of first mention, as listed in the schema (a poetic variation counts as its base color: **crimson** is Red); an empty list if none
+- "response": Mystica's words, following the instructions above"""
+)
+
+FUSED_TURN_SCHEMA: Dict[str, Any] = {
+    "title": "MysticaTurn",
+    "description": "Profile updates from the seeker's message and Mystica's reply",
+    "type": "object",
+    "properties": {
+        "user_name": {"type": ["string", "null"]},
+        "user_dob": {"type": ["string", "null"]},
+        "colors": {
+            "type": "array",
+            "items": {"type": "string", "enum": color_lexicon.colors},
+        },
+        "response": {"type": "string"},
+    },
+    "required": ["user_name", "user_dob", "colors", "response"],
+    "additionalProperties": False,
+}
+
+
+class MysticaFortuneGenerator:
+    """Generates mystical fortunes using LLM"""
+
+    def __init__(self, llm: BaseChatModel, policy: Optional[LLMCallPolicy] = None):
+        self.llm = llm
+        self.model_name = getattr(llm, "model_name", None)
+        self.policy = policy or LLMCallPolicy("fortune", self.model_name)
+
+    def generate(self, context: FortuneContext) -> Tuple[str, List[str]]:
+        """Generate fortune and return (fortune_text, color_associations)"""
+        prompt = self._build_prompt(context)
+
+        try:
+            with tracer.span("llm.fortune", model=self.model_name):
+                response = self.policy.invoke(lambda: self.llm.ainvoke(prompt))
+            fortune_text = response.content
+            colors = self._extract_colors(fortune_text)
+            return fortune_text, colors
+        except LLMUnavailableError as e:
+            logger.warning("Fortune skipped, answering with the fallback: %s", e)
+            return settings.FORTUNE_FALLBACK, []
+        except Exception as e:
+            raise FortuneGenerationError(f"Failed to generate fortune: {str(e)}")
+
+    async def agenerate(self, context: FortuneContext) -> Tuple[str, List[str]]:
+        """Generate fortune asynchronously and return (fortune_text, color_associations)"""
+        prompt = self._build_prompt(context)
+
+        try:
+            with tracer.span("llm.fortune", model=self.model_name):
+                response = await self.policy.ainvoke(lambda: self.llm.ainvoke(prompt))
+            fortune_text = response.content
+            colors = self._extract_colors(fortune_text)
+            return fortune_text, colors
+        except LLMUnavailableError as e:
+            logger.warning("Fortune skipped, answering with the fallback: %s", e)
+            return settings.FORTUNE_FALLBACK, []
+        except Exception as e:
+            raise FortuneGenerationError(f"Failed to generate fortune: {str(e)}")
+
+    def generate_stream(self, context: FortuneContext) -> Iterator[str]:
+        """Generate fortune and yield text chunks as they arrive"""
+        # The stream timeout needs the event loop, so run the async stream on it
+        return iterate_async(self.agenerate_stream(context))
+
+    async def agenerate_stream(self, context: FortuneContext) -> AsyncIterator[str]:
+        """Generate fortune asynchronously and yield text chunks as they arrive"""
+        prompt = self._build_prompt(context)
+        streamed = False
+
+        try:
+            with tracer.span("llm.fortune", model=self.model_name, stream=True):
+                async for chunk in self.policy.astream(
+                    lambda: self.llm.astream(prompt)
+                ):
+                    if chunk.content:
+                        streamed = True
+                        yield chunk.content
+        except LLMUnavailableError as e:
+            logger.warning("Fortune cut short, answering with the fallback: %s", e)
+            yield (
+                f"\n\n{settings.FORTUNE_FALLBACK}"
+                if streamed
+                else settings.FORTUNE_FALLBACK
+            )
+        except Exception as e:
+            raise FortuneGenerationError(f"Failed to generate fortune: {str(e)}")
+
+    def create_color_detector(self) -> IncrementalColorScanner:
+        """Create a detector for color mentions in a streamed fortune"""
+        return color_lexicon.scanner()
+
+    def _build_prompt(self, context: FortuneContext) -> List[BaseMessage]:
+        """Build fortune generation prompt: static instructions, then this turn's data"""
+        profile = context.user_profile
+        handprint = profile.handprint_analysis
+
+        seeker = [
+            "Seeker Information:",
+            f"Name: {profile.name or UNKNOWN_NAME}",
+            f"Date of Birth: {profile.date_of_birth or UNKNOWN_DOB}",
+            f"Handprint Analysis: {handprint or UNKNOWN_HANDPRINT}",
+            f'Latest Utterance: "{context.latest_message}"',
+        ]
+
+        # A classified choice needs only the instructions for its branch
+        if context.categories is None:
+            system = FORTUNE_SYSTEM_MESSAGE
+        elif not context.categories:
+            system = INVITATION_SYSTEM_MESSAGE
+        else:
+            system = DIVINATION_SYSTEM_MESSAGE
+            categories = ", ".join(c.capitalize() for c in context.categories)
+            seeker.append(f"Categories: {categories}")
+
+        return [system, HumanMessage(content="\n".join(seeker))]
 
     def _extract_colors(self, text: str) -> List[str]:
         """Extract mentioned colors from fortune text"""
-        text_lower = text.lower()
-        colors = []
-
-        # Extended color mapping to handle variations
-        color_mappings = {
-            # Direct matches
-            "gold": "Gold",
-            "brown": "Brown",
-            "orange": "Orange",
-            "yellow": "Yellow",
-            "green": "Green",
-            "pink": "Pink",
-            "blue": "Blue",
-            "red": "Red",
-            "black": "Black",
-            "silver": "Silver",
-            "violet": "Violet",
-            "emerald": "Green",
-            "purple": "Purple",
-            "crimson": "Red",
-            "rose": "Pink",
-            "scarlet": "Red",
-            "azure": "Blue",
-            "golden": "Gold",
-            "silvery": "Silver",
-            "ebony": "Black",
-            "ivory": "Yellow",
-            "jade": "Green",
-            "ruby": "Red",
-            "sapphire": "Blue",
-            "amber": "Orange",
-            "coral": "Pink",
-            "lavender": "Purple",
-            "turquoise": "Blue",
-            "bronze": "Brown",
-            "copper": "Orange",
-            "pearl": "Silver",
-            "onyx": "Black",
-        }
+        return color_lexicon.extract(text).colors
+
+
+class FusedTurnStream:
+    """Streams the reply of a fused turn; colors and result are set as they complete"""
+
+    def __init__(self, generator: "MysticaFusedTurnGenerator", context: FortuneContext):
+        self._generator = generator
+        self._context = context
+        self.colors: Optional[List[str]] = None
+        self.result: Optional[FusedTurn] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._generator._astream(self._context, self)
 
-        # Check for each color mapping
-        for color_variant, base_color in color_mappings.items():
-            if (
-                f" {color_variant}" in text_lower
-                or f"**{color_variant}**" in text_lower
-            ):
-                colors.append(base_color)
 
-        return list(set(colors))
+class MysticaFusedTurnGenerator:
+    """
+    Extracts profile updates and generates the fortune in one structured call
+
+    The reply, the seeker's name and date of birth and the base colors come
+    back as one JSON object, halving the LLM round trips of a turn and
+    replacing the color scan of the reply with the model's own list. Any
+    failure raises FortuneGenerationError so the caller can fall back to
+    separate extraction and generation calls. The branch prompts and the
+    color scan are those of the MysticaFortuneGenerator it holds.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        policy: Optional[LLMCallPolicy] = None,
+        fortune_generator: Optional[MysticaFortuneGenerator] = None,
+    ):
+        self.llm = llm
+        self.model_name = getattr(llm, "model_name", None)
+        self.policy = policy or LLMCallPolicy("fused", self.model_name)
+        self.structured_llm = llm.with_structured_output(FUSED_TURN_SCHEMA)
+        self.fortune_generator = fortune_generator or MysticaFortuneGenerator(llm)
+
+    def generate(self, context: FortuneContext) -> FusedTurn:
+        """Generate the reply and the profile updated from the latest message"""
+        prompt = self._build_fused_prompt(context)
+
+        try:
+            with tracer.span("llm.fused", model=self.model_name):
+                data = self.policy.invoke(lambda: self.structured_llm.ainvoke(prompt))
+        except Exception as e:
+            raise FortuneGenerationError(f"Failed to generate fused turn: {str(e)}")
+        return self._parse(context, data)
+
+    async def agenerate(self, context: FortuneContext) -> FusedTurn:
+        """Generate the reply and the updated profile asynchronously"""
+        prompt = self._build_fused_prompt(context)
+
+        try:
+            with tracer.span("llm.fused", model=self.model_name):
+                data = await self.policy.ainvoke(
+                    lambda: self.structured_llm.ainvoke(prompt)
+                )
+        except Exception as e:
+            raise FortuneGenerationError(f"Failed to generate fused turn: {str(e)}")
+        return self._parse(context, data)
+
+    def stream(self, context: FortuneContext) -> FusedTurnStream:
+        """Stream the reply as it is generated; the result is set once consumed"""
+        return FusedTurnStream(self, context)
+
+    async def _astream(
+        self, context: FortuneContext, stream: FusedTurnStream
+    ) -> AsyncIterator[str]:
+        """Yield the growing response field of the partially parsed JSON"""
+        prompt = self._build_fused_prompt(context)
+        data: Dict[str, Any] = {}
+        sent = 0
+
+        try:
+            with tracer.span("llm.fused", model=self.model_name, stream=True):
+                async for data in self.policy.astream(
+                    lambda: self.structured_llm.astream(prompt)
+                ):
+                    # The colors precede the response, so they are complete
+                    # as soon as the response starts
+                    if stream.colors is None and "response" in data:
+                        stream.colors = self._colors(data)
+
+                    text = data.get("response") or ""
+                    if len(text) > sent:
+                        yield text[sent:]
+                        sent = len(text)
+        except LLMUnavailableError as e:
+            if not sent:
+                raise FortuneGenerationError(f"Fused turn unavailable: {str(e)}")
+            logger.warning("Fused turn cut short, answering with the fallback: %s", e)
+            yield f"\n\n{settings.FORTUNE_FALLBACK}"
+            stream.result = FusedTurn(
+                profile=context.user_profile,
+                text=f"{data['response']}\n\n{settings.FORTUNE_FALLBACK}",
+                colors=stream.colors or [],
+            )
+            return
+        except Exception as e:
+            raise FortuneGenerationError(f"Failed to generate fused turn: {str(e)}")
+
+        stream.result = self._parse(context, data)
+
+    def _build_fused_prompt(self, context: FortuneContext) -> List[BaseMessage]:
+        """Fortune prompt with the fused output instructions after the branch prompt"""
+        system, seeker = self.fortune_generator._build_prompt(context)
+        return [system, FUSED_SYSTEM_MESSAGE, seeker]
+
+    def _parse(self, context: FortuneContext, data: Dict[str, Any]) -> FusedTurn:
+        """Turn for the structured output, merging profile updates"""
+        text = (data or {}).get("response")
+        if not text:
+            raise FortuneGenerationError("Fused turn returned no response")
+
+        profile = context.user_profile
+        updates = {
+            field: data[key]
+            for field, key in (("name", "user_name"), ("date_of_birth", "user_dob"))
+            if data.get(key)
+        }
+        return FusedTurn(
+            profile=dataclasses.replace(profile, **updates) if updates else profile,
+            text=text,
+            colors=self._colors(data),
+        )
+
+    def _colors(self, data: Dict[str, Any]) -> List[str]:
+        """Base colors of the structured output, or of a scan of the reply without them"""
+        if "colors" not in data:
+            return self.fortune_generator._extract_colors(data.get("response") or "")
+        colors = [color_lexicon.normalize(color) for color in data["colors"] or []]
+        return list(dict.fromkeys(c for c in colors if c in color_lexicon.colors))
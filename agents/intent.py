@@ -0,0 +1,175 @@
+"""
+Local divination intent classifier for Mystica Oracle
+"""
+
+import difflib
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from settings import settings
+
+ALL_CATEGORIES = "all"
+
+# "all" synonyms that only agree to go on: they select every category when
+# nothing specific was named ("yes please"), not next to a category
+# ("yes, love please", "both work and love")
+AFFIRMATION = "affirmation"
+AFFIRMATIONS = {"yes", "sure", "ok", "okay", "more", "proceed", "continue", "both"}
+
+# Words that exclude the categories after them up to the end of the clause
+# ("not interested in love, just work"); "but" only does after an "all"
+# word ("all but love"), and otherwise ends the clause ("not love but work")
+NEGATIONS = {"not", "no", "never", "t", "except", "without", "besides"}
+CLAUSE_ENDS = {"but", "just", "only", "instead", "rather"}
+
+# Thai negation marks exclude the terms after them within the same phrase
+THAI_NEGATIONS = ("ไม่", "ยกเว้น")
+_THAI_PHRASE_BREAK = re.compile(r"[\s,.;:!?]+|แต่")
+
+# Shortest word fuzzy matching is tried on; shorter typos are too ambiguous
+MIN_FUZZY_LENGTH = 4
+FUZZY_CUTOFF = 0.85
+
+# Everyday words within fuzzy reach of a synonym ("health" of "wealth"):
+# only exact and swapped-letter matches apply to them
+NOT_TYPOS = {
+    "health",
+    "healthy",
+    "honey",
+    "hearth",
+    "heard",
+    "eating",
+    "sturdy",
+    "fiance",
+    "fiancee",
+    "world",
+    "worth",
+    "worry",
+    "brush",
+}
+
+_WORD = re.compile(r"\w+")
+_THAI = re.compile(r"[฀-๿]")
+
+# Words, and runs of clause punctuation
+_TOKEN = re.compile(r"(\w+)|[,.;:!?\n]+")
+
+
+@dataclass
+class DivinationIntent:
+    """What the seeker asked for: categories to divine, or none yet"""
+
+    categories: List[str] = field(default_factory=list)
+
+    @property
+    def is_choice(self) -> bool:
+        """Whether the seeker picked at least one category"""
+        return bool(self.categories)
+
+
+class DivinationIntentClassifier:
+    """
+    Maps an utterance to divination categories without an LLM call
+
+    Words are matched against per-category synonyms, exactly first, then
+    with neighbouring letters swapped, then fuzzily to absorb other typos,
+    except for everyday words that merely look like a synonym. Thai has no
+    spaces, so Thai synonyms are matched as substrings. Categories negated
+    within a clause are dropped, and "all" style words select every
+    category that is not negated.
+    """
+
+    def __init__(
+        self,
+        categories: List[str] = settings.DIVINATION_CATEGORIES,
+        synonyms: Dict[str, List[str]] = settings.DIVINATION_SYNONYMS,
+        choices: List[str] = settings.DIVINATION_CHOICES,
+    ):
+        self.categories = list(categories)
+        self._word_category: Dict[str, str] = {}
+        self._thai_terms: Dict[str, str] = {}
+        for category, words in synonyms.items():
+            for word in words:
+                word = word.lower()
+                if category == ALL_CATEGORIES and word in AFFIRMATIONS:
+                    category_of_word = AFFIRMATION
+                else:
+                    category_of_word = category
+                target = self._thai_terms if _THAI.search(word) else self._word_category
+                target[word] = category_of_word
+
+        # Every listed choice counts as a synonym source too
+        for choice in choices:
+            for word in _WORD.findall(choice.lower()):
+                if word in self.categories:
+                    self._word_category.setdefault(word, word)
+
+        self._vocabulary = list(self._word_category)
+        self._match_word = lru_cache(maxsize=4096)(self._match_word_uncached)
+
+    def classify(self, utterance: str) -> DivinationIntent:
+        """Categories the seeker chose, in canonical order"""
+        text = utterance.lower()
+        found: Set[str] = set()
+        negated: Set[str] = set()
+
+        negating = False
+        for token in _TOKEN.finditer(text):
+            word = token.group(1)
+            if word is None:
+                negating = False
+            elif word in NEGATIONS:
+                negating = True
+            elif word == "but":
+                negating = ALL_CATEGORIES in found
+            elif word in CLAUSE_ENDS:
+                negating = False
+            else:
+                category = self._match_word(word)
+                if category is not None:
+                    (negated if negating else found).add(category)
+
+        if _THAI.search(text):
+            self._classify_thai(text, found, negated)
+
+        wants_all = ALL_CATEGORIES in found
+        affirmed = AFFIRMATION in found
+        found &= set(self.categories)
+        found -= negated
+        if wants_all or (not found and affirmed):
+            found = set(self.categories) - negated
+
+        return DivinationIntent(categories=[c for c in self.categories if c in found])
+
+    def _classify_thai(self, text: str, found: Set[str], negated: Set[str]):
+        """Add the Thai terms of text to found, or to negated after a negation"""
+        for phrase in _THAI_PHRASE_BREAK.split(text):
+            negations = [phrase.find(n) for n in THAI_NEGATIONS if n in phrase]
+            negation = min(negations) if negations else len(phrase)
+            for term, category in self._thai_terms.items():
+                position = phrase.find(term)
+                if position < 0:
+                    continue
+                # "ไม่เอาความรัก" negates; the term itself may contain the mark
+                (negated if negation < position else found).add(category)
+
+    def _match_word_uncached(self, word: str) -> Optional[str]:
+        """Category of a single word, tolerating small typos"""
+        category = self._word_category.get(word)
+        if category is not None or len(word) < MIN_FUZZY_LENGTH:
+            return category
+
+        # Swapped neighbouring letters ("lvoe") are the most common typo
+        for i in range(len(word) - 1):
+            swapped = word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+            if swapped in self._word_category:
+                return self._word_category[swapped]
+
+        if word in NOT_TYPOS:
+            return None
+        matches = difflib.get_close_matches(
+            word, self._vocabulary, n=1, cutoff=FUZZY_CUTOFF
+        )
+        return self._word_category[matches[0]] if matches else None
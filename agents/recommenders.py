@@ -2,25 +2,69 @@
 Product recommendation service for Mystica Oracle
 """
 
-from typing import List, Tuple
+import logging
+from typing import List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
+from core.interfaces import ProductCatalog
 from core.models import Product
+from data.ranking import CatalogRanker
+from data.reasons_store import ReasonBatcher, ReasonsRefresher, ReasonsStore
+from data.text_index import TextIndex
 from settings import settings
+from utils.async_runner import run_coroutine
+from utils.resilience import LLMCallPolicy, remaining_time
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REASON = "This item carries an auspicious resonance with the guiding energies."
+
+# Identical for every batch so the provider can cache it as a prompt prefix
+REASONS_SYSTEM_MESSAGE = SystemMessage(
+    content="""You are Mystica, the All-Seeing Oracle, continuing your guidance for a seeker.
+The seeker has been attuned to specific color energies that align with their current path.
+For each item you are given, each resonating with one of these auspicious colors, provide a brief, mystical, and positive suitability reason (1 sentence per item).
+Focus on how the item's essence, combined with its associated color's energy, might uniquely benefit the seeker or illuminate their journey. Be poetic and insightful.
+
+Please provide your reasons in a numbered list, corresponding to the item numbers you are given. Ensure each reason is a single, flowing sentence.
+Example format for your response:
+1. [Mystical reason for item 1, linking its essence and color to the seeker's path.]
+2. [Mystical reason for item 2, linking its essence and color to the seeker's path.]"""
+)
 
 
 class MysticaProductRecommender:
     """Recommends products based on color associations"""
 
-    def __init__(self, llm: ChatOpenAI):
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        reasons_store: Optional[ReasonsStore] = None,
+        reasons_refresher: Optional[ReasonsRefresher] = None,
+        policy: Optional[LLMCallPolicy] = None,
+        reason_batcher: Optional[ReasonBatcher] = None,
+        min_price: float = settings.RECOMMENDATION_MIN_PRICE_BAHT,
+        max_price: float = settings.RECOMMENDATION_MAX_PRICE_BAHT,
+        text_index: Optional[TextIndex] = None,
+    ):
         self.llm = llm
+        self.model_name = getattr(llm, "model_name", None)
+        self.policy = policy or LLMCallPolicy("reasons", self.model_name)
+        self.reasons_store = reasons_store
+        self.reasons_refresher = reasons_refresher
+        self.reason_batcher = reason_batcher
+        self.min_price = min_price
+        self.max_price = max_price
+        self.text_index = text_index
 
     def recommend(
-        self, colors: List[str], products: List[Product]
+        self, colors: List[str], products: List[Product], query: Optional[str] = None
     ) -> List[Tuple[Product, str]]:
         """Recommend products based on colors and return list of (product, reason) tuples"""
-        matching_products = self._find_matching_products(colors, products)
+        matching_products = self._find_matching_products(colors, products, query)
 
         if not matching_products:
             return []
@@ -28,64 +72,152 @@ class MysticaProductRecommender:
         reasons = self._generate_reasons(matching_products)
         return list(zip(matching_products, reasons))
 
+    async def arecommend(
+        self, colors: List[str], products: List[Product], query: Optional[str] = None
+    ) -> List[Tuple[Product, str]]:
+        """Recommend products asynchronously and return list of (product, reason) tuples"""
+        matching_products = self._find_matching_products(colors, products, query)
+
+        if not matching_products:
+            return []
+
+        reasons = await self._agenerate_reasons(matching_products)
+        return list(zip(matching_products, reasons))
+
     def _find_matching_products(
-        self, colors: List[str], products: List[Product]
+        self, colors: List[str], products: List[Product], query: Optional[str] = None
     ) -> List[Product]:
-        """Find products matching the given colors"""
-        matching_products = []
-
-        for product in products:
-            product_color = self._extract_product_color(product)
-            if (
-                product_color in colors
-                and len(matching_products) < settings.MAX_PRODUCT_RECOMMENDATIONS
-            ):
-                matching_products.append(product)
-
-        return matching_products
-
-    def _extract_product_color(self, product: Product) -> str:
-        """Extract normalized color from product"""
-        # Extract base color, removing any parenthetical descriptions
-        color_string = product.inferred_color_association_primary.split("(")[0].strip()
-
-        # Normalize color mappings (same as in fortune_teller.py)
-        color_mappings = {
-            "Gold": "Gold",
-            "Brown": "Brown",
-            "Orange": "Orange",
-            "Yellow": "Yellow",
-            "Green": "Green",
-            "Pink": "Pink",
-            "Blue": "Blue",
-            "Red": "Red",
-            "Black": "Black",
-            "Silver": "Silver",
-            "Violet": "Purple",
-            "Purple": "Purple",
-        }
-
-        # Return the normalized color
-        return color_mappings.get(color_string.capitalize(), color_string.capitalize())
+        """
+        Best products for the colors, within budget
+
+        Colors weigh more the earlier and more often they were mentioned;
+        a color repeated in colors counts once per repetition. With a text
+        index of the catalog, products matching the query text rank higher.
+        """
+        if isinstance(products, ProductCatalog):
+            ranker = products.ranker()
+        else:
+            ranker = CatalogRanker.from_products(
+                products, [p.inferred_color_association_primary for p in products]
+            )
+
+        relevance = None
+        if query and self.text_index is not None:
+            if self.text_index.covers(products):
+                with tracer.span("text_index.query", chars=len(query)):
+                    relevance = self.text_index.scores(query)
+            else:
+                logger.warning(
+                    "Text index at %s was built from another catalog; rebuild it",
+                    self.text_index.directory,
+                )
+
+        positions = ranker.rank(
+            colors,
+            settings.MAX_PRODUCT_RECOMMENDATIONS,
+            min_price=self.min_price,
+            max_price=self.max_price,
+            relevance=relevance,
+        )
+        return [products[position] for position in positions]
 
     def _generate_reasons(self, products: List[Product]) -> List[str]:
         """Generate mystical reasons for product recommendations"""
         if not products:
             return []
 
-        prompt = self._build_reasons_prompt(products)
+        reasons = self._stored_reasons(products)
+        missing = [p for p, reason in zip(products, reasons) if reason is None]
 
-        try:
-            response = self.llm.invoke(prompt)
-            return self._parse_reasons(response.content, len(products))
-        except Exception:
-            # Return default reasons if generation fails
-            default_reason = (
-                "This item carries an auspicious resonance with the guiding energies."
-            )
-            return [default_reason] * len(products)
+        if missing:
+            try:
+                if self.reason_batcher is not None:
+                    fresh = run_coroutine(self._abatched_reasons(missing))
+                else:
+                    fresh = self.generate_fresh_reasons(missing)
+            except Exception as e:
+                # Return default reasons if generation fails
+                logger.warning("Reasons skipped, using the default: %s", e)
+                fresh = [None] * len(missing)
+            reasons = self._fill_reasons(products, reasons, missing, fresh)
 
-    def _build_reasons_prompt(self, products: List[Product]) -> str:
+        return reasons
+
+    async def _agenerate_reasons(self, products: List[Product]) -> List[str]:
+        """Generate mystical reasons for product recommendations asynchronously"""
+        if not products:
+            return []
+
+        reasons = self._stored_reasons(products)
+        missing = [p for p, reason in zip(products, reasons) if reason is None]
+
+        if missing:
+            try:
+                if self.reason_batcher is not None:
+                    fresh = await self._abatched_reasons(missing)
+                else:
+                    fresh = await self.agenerate_fresh_reasons(missing)
+            except Exception as e:
+                # Return default reasons if generation fails
+                logger.warning("Reasons skipped, using the default: %s", e)
+                fresh = [None] * len(missing)
+            reasons = self._fill_reasons(products, reasons, missing, fresh)
+
+        return reasons
+
+    def generate_fresh_reasons(self, products: List[Product]) -> List[Optional[str]]:
+        """Generate reasons with the LLM, bypassing the store (None where unparsed)"""
+        with tracer.span("llm.reasons", model=self.model_name, items=len(products)):
+            prompt = self._build_reasons_prompt(products)
+            response = self.policy.invoke(lambda: self.llm.ainvoke(prompt))
+        return self._parse_reasons(response.content, len(products), default=None)
+
+    async def agenerate_fresh_reasons(
+        self, products: List[Product]
+    ) -> List[Optional[str]]:
+        """Generate reasons with the LLM asynchronously, bypassing the store"""
+        with tracer.span("llm.reasons", model=self.model_name, items=len(products)):
+            prompt = self._build_reasons_prompt(products)
+            response = await self.policy.ainvoke(lambda: self.llm.ainvoke(prompt))
+        return self._parse_reasons(response.content, len(products), default=None)
+
+    async def _abatched_reasons(self, products: List[Product]) -> List[Optional[str]]:
+        """Reasons from the cross-session batcher, within the turn deadline"""
+        with tracer.span("reasons.batch_wait", items=len(products)):
+            return await self.reason_batcher.request(products, remaining_time())
+
+    def _stored_reasons(self, products: List[Product]) -> List[Optional[str]]:
+        """Look up precomputed reasons, keeping the refresher aware of these products"""
+        if self.reasons_store is None:
+            return [None] * len(products)
+
+        reasons = self.reasons_store.sample(products)
+        # Misses are generated by the caller; the refresher only tops pools up
+        if self.reasons_refresher is not None:
+            self.reasons_refresher.track(products)
+        return reasons
+
+    def _fill_reasons(
+        self,
+        products: List[Product],
+        reasons: List[Optional[str]],
+        missing: List[Product],
+        fresh: List[Optional[str]],
+    ) -> List[str]:
+        """Merge freshly generated reasons into the stored ones"""
+        generated = {id(p): reason for p, reason in zip(missing, fresh)}
+
+        if self.reasons_store is not None:
+            for product, reason in zip(missing, fresh):
+                if reason:
+                    self.reasons_store.add(product, [reason])
+
+        return [
+            reason or generated.get(id(product)) or DEFAULT_REASON
+            for product, reason in zip(products, reasons)
+        ]
+
+    def _build_reasons_prompt(self, products: List[Product]) -> List[BaseMessage]:
         """Build prompt for generating recommendation reasons"""
         prompt_items = "\n".join(
             [
@@ -95,22 +227,14 @@ class MysticaProductRecommender:
                 for i, p in enumerate(products)
             ]
         )
+        return [REASONS_SYSTEM_MESSAGE, HumanMessage(content=prompt_items)]
 
-        return f"""You are Mystica, the All-Seeing Oracle, continuing your guidance for a seeker.
-The seeker has been attuned to specific color energies that align with their current path.
-For the following items, each resonating with one of these auspicious colors, provide a brief, mystical, and positive suitability reason (1 sentence per item).
-Focus on how the item's essence, combined with its associated color's energy, might uniquely benefit the seeker or illuminate their journey. Be poetic and insightful.
-
-Here are the items:
-{prompt_items}
-
-Please provide your reasons in a numbered list, corresponding to the item numbers above. Ensure each reason is a single, flowing sentence.
-Example format for your response:
-1. [Mystical reason for item 1, linking its essence and color to the seeker's path.]
-2. [Mystical reason for item 2, linking its essence and color to the seeker's path.]
-"""
-
-    def _parse_reasons(self, text: str, expected_count: int) -> List[str]:
+    def _parse_reasons(
+        self,
+        text: str,
+        expected_count: int,
+        default: Optional[str] = DEFAULT_REASON,
+    ) -> List[Optional[str]]:
         """Parse numbered reasons from LLM response"""
         reasons = []
 
@@ -127,10 +251,7 @@ Example format for your response:
                         continue
 
         # Fill with default reasons if needed
-        default_reason = (
-            "This item carries an auspicious resonance with the guiding energies."
-        )
         while len(reasons) < expected_count:
-            reasons.append(default_reason)
+            reasons.append(default)
 
         return reasons[:expected_count]
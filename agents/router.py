@@ -0,0 +1,78 @@
+"""
+Conversation stage routing for Mystica Oracle
+"""
+
+import random
+from typing import Dict, List, Optional
+
+from core.models import UserProfile
+
+
+class ConversationStage:
+    """Stages of a reading, decided from what is known about the seeker"""
+
+    ASK_NAME = "ask_name"
+    ASK_DOB = "ask_dob"
+    DIVINATION = "divination"
+
+
+# Mystica's lines for the information-gathering stages; {name} is the seeker's
+ASK_NAME_LINES = [
+    "The mists swirl, seeker, but your essence remains shrouded. Whisper to me "
+    "the name the spirits call you by, that I may part the veils for you.",
+    "Ah, a new soul stands before the Oracle's flame, yet its light bears no "
+    "name. Speak it, seeker, and let the stars take note of you.",
+    "The cards tremble at your arrival, but they will not turn for a nameless "
+    "wanderer. Tell me, by what name are you known beneath the heavens?",
+    "I sense a curious spirit drawn to my chamber. Before the threads of fate "
+    "can be read, I must know the name woven into them. What are you called?",
+]
+
+ASK_DOB_LINES = [
+    "{name}, the celestial spheres align with your presence, yet the exact "
+    "moment of your arrival upon this earthly coil is needed. Share with me "
+    "your date of birth, that the stars may illuminate your path.",
+    "Welcome, {name}. Your name now echoes through the astral halls. To chart "
+    "the heavens as they stood at your first breath, tell me the day you were "
+    "born.",
+    "{name}... yes, the spirits murmur it softly. But the constellations keep "
+    "their secrets until I know your birth date. When did you enter this world?",
+    "The veil thins for you, {name}. One key remains: the date the cosmos first "
+    "greeted you. Reveal your date of birth, and the reading may begin.",
+]
+
+
+class ConversationRouter:
+    """
+    Decides the stage of a turn from the merged profile
+
+    Asking for a name or a date of birth needs no generation, so those
+    stages are answered from templated lines; only the divination itself
+    goes to the fortune LLM.
+    """
+
+    def __init__(
+        self,
+        lines: Optional[Dict[str, List[str]]] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.lines = lines or {
+            ConversationStage.ASK_NAME: ASK_NAME_LINES,
+            ConversationStage.ASK_DOB: ASK_DOB_LINES,
+        }
+        self.rng = rng or random.Random()
+
+    def route(self, profile: UserProfile) -> str:
+        """Stage for the next reply to a seeker"""
+        if not profile.name:
+            return ConversationStage.ASK_NAME
+        if not profile.date_of_birth:
+            return ConversationStage.ASK_DOB
+        return ConversationStage.DIVINATION
+
+    def respond(self, stage: str, profile: UserProfile) -> Optional[str]:
+        """Templated reply for a stage, or None if the stage needs the LLM"""
+        lines = self.lines.get(stage)
+        if not lines:
+            return None
+        return self.rng.choice(lines).format(name=profile.name or "seeker")
@@ -1,17 +1,77 @@
-from typing import List
+import asyncio
+import copy
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
 from langchain_core.messages import AIMessage, BaseMessage
 from ui.state import StateManager
 
-from core.exceptions import WorkflowError
+from agents.intent import DivinationIntentClassifier
+from agents.router import ConversationRouter, ConversationStage
+from core.exceptions import FortuneGenerationError, WorkflowError
 from core.interfaces import (
     FortuneGenerator,
+    FusedTurnGenerator,
     HandprintAnalyzer,
     MessageExtractor,
     ProductRecommender,
 )
-from core.models import FortuneContext, Product
+from core.models import (
+    MESSAGE_KIND_RECOMMENDATION,
+    FortuneContext,
+    FusedTurn,
+    HandprintImage,
+    Product,
+    UserProfile,
+)
+from data.blob_store import BlobStore
+from data.handprint_cache import HandprintAnalysisCache
 from data.repositories import ProductRepository
+from settings import settings
+from utils.async_runner import iterate_async
+from utils.color_lexicon import color_lexicon
+from utils.resilience import deadline
+from utils.tracing import Trace, tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TurnResult:
+    """Outcome of a single conversation turn"""
+
+    profile: UserProfile
+    responses: List[BaseMessage] = field(default_factory=list)
+    colors: List[str] = field(default_factory=list)
+    trace: Optional[Trace] = None
+
+
+class TurnStream:
+    """Streams the fortune for a turn and holds the turn result once exhausted"""
+
+    def __init__(
+        self, workflow: "MysticaWorkflow", user_message: str, profile: UserProfile
+    ):
+        self._workflow = workflow
+        self._user_message = user_message
+        self._profile = profile
+        self.result: Optional[TurnResult] = None
+
+    def __iter__(self) -> Iterator[str]:
+        return iterate_async(self.__aiter__())
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        with (
+            tracer.trace("turn", stream=True) as trace,
+            deadline(settings.TURN_DEADLINE_SECONDS),
+        ):
+            async for chunk in self._workflow._astream_turn(
+                self._user_message, self._profile, self
+            ):
+                yield chunk
+        if self.result is not None:
+            self.result.trace = trace
 
 
 class MysticaWorkflow:
@@ -24,7 +84,12 @@ class MysticaWorkflow:
         handprint_analyzer: HandprintAnalyzer,
         product_recommender: ProductRecommender,
         product_repository: ProductRepository,
-        state_manager: StateManager,
+        state_manager: Optional[StateManager] = None,
+        handprint_cache: Optional[HandprintAnalysisCache] = None,
+        blob_store: Optional[BlobStore] = None,
+        router: Optional[ConversationRouter] = None,
+        intent_classifier: Optional[DivinationIntentClassifier] = None,
+        fused_generator: Optional[FusedTurnGenerator] = None,
     ):
         self.extractor = extractor
         self.fortune_generator = fortune_generator
@@ -32,57 +97,537 @@ class MysticaWorkflow:
         self.product_recommender = product_recommender
         self.product_repository = product_repository
         self.state_manager = state_manager
+        self.handprint_cache = handprint_cache
+        self.blob_store = blob_store
+        self.router = router or ConversationRouter()
+        self.intent_classifier = intent_classifier or DivinationIntentClassifier()
+        self.fused_generator = fused_generator
+
+    def for_session(self, state_manager: StateManager) -> "MysticaWorkflow":
+        """Same workflow and services, bound to a session's state"""
+        workflow = copy.copy(self)
+        workflow.state_manager = state_manager
+        return workflow
 
     def process_message(self, user_message: str) -> List[BaseMessage]:
         """Process a user message and return response messages"""
         try:
-            responses = []
+            with (
+                tracer.trace("turn") as trace,
+                deadline(settings.TURN_DEADLINE_SECONDS),
+            ):
+                self.state_manager.set_last_trace(trace)
+                return self._process_message(user_message)
+        except Exception as e:
+            raise WorkflowError(f"Workflow processing failed: {str(e)}")
+
+    def _process_message(self, user_message: str) -> List[BaseMessage]:
+        """Run a turn synchronously, with a span per stage"""
+        responses = []
 
-            # Get current state
-            current_profile = self.state_manager.get_user_profile()
+        # Get current state
+        current_profile = self.state_manager.get_user_profile()
 
+        # Extract information and reply in one call once name and DOB are known
+        turn = self._fused_turn(user_message, current_profile)
+        if turn is not None:
+            self.state_manager.set_user_profile(turn.profile)
+            fortune_text, colors = turn.text, turn.colors
+        else:
             # Extract information from message
-            updated_profile = self.extractor.extract(user_message, current_profile)
+            with tracer.span("extraction"):
+                updated_profile = self.extractor.extract(user_message, current_profile)
             self.state_manager.set_user_profile(updated_profile)
 
+            # Ask for missing details without the LLM
+            reply = self._templated_reply(updated_profile)
+            if reply is not None:
+                return [AIMessage(content=reply)]
+
             # Generate fortune
-            context = FortuneContext(
-                user_profile=updated_profile, latest_message=user_message
+            context = self._fortune_context(user_message, updated_profile)
+            with tracer.span("fortune"):
+                fortune_text, colors = self.fortune_generator.generate(context)
+        responses.append(AIMessage(content=fortune_text))
+
+        # Handle product recommendations if colors were mentioned
+        if colors:
+            self.state_manager.set_color_associations(colors)
+            products = self._load_products()
+            mentions = self._color_mentions(fortune_text, colors)
+            with tracer.span("recommendation", colors=len(colors)):
+                recommendations = self.product_recommender.recommend(
+                    mentions, products, self._product_query(fortune_text, user_message)
+                )
+
+            if recommendations:
+                responses.append(self._recommendation_message(recommendations))
+
+        return responses
+
+    async def aprocess_message(self, user_message: str) -> List[BaseMessage]:
+        """Process a user message asynchronously and return response messages"""
+        current_profile = self.state_manager.get_user_profile()
+        result = await self.arespond(user_message, current_profile)
+        self.apply_turn(result)
+        return result.responses
+
+    async def arespond(
+        self,
+        user_message: str,
+        profile: UserProfile,
+        image: Optional[HandprintImage] = None,
+    ) -> TurnResult:
+        """
+        Run a turn without touching session state
+
+        Catalog loading and (optionally) handprint analysis overlap with the
+        extraction and generation LLM calls, which are fused into one when
+        enabled. Callers apply the result to their session with apply_turn.
+        """
+        with tracer.trace("turn") as trace, deadline(settings.TURN_DEADLINE_SECONDS):
+            result = await self._arespond(user_message, profile, image)
+        result.trace = trace
+        return result
+
+    async def _arespond(
+        self,
+        user_message: str,
+        profile: UserProfile,
+        image: Optional[HandprintImage],
+    ) -> TurnResult:
+        """Run a turn asynchronously, with a span per stage"""
+        products_task = asyncio.create_task(asyncio.to_thread(self._load_products))
+        try:
+            # Extract information and reply in one call once name and DOB are known
+            turn = None
+            if image is None:
+                turn = await self._afused_turn(user_message, profile)
+
+            if turn is not None:
+                updated_profile, fortune_text, colors = (
+                    turn.profile,
+                    turn.text,
+                    turn.colors,
+                )
+            else:
+                # Extract information, analyzing a new handprint alongside it
+                if image is not None:
+                    updated_profile, analysis, image_ref = await asyncio.gather(
+                        self._aextract(user_message, profile),
+                        self._aanalyze_handprint(image),
+                        asyncio.to_thread(self._store_handprint_image, image),
+                    )
+                    updated_profile.handprint_analysis = analysis
+                    updated_profile.handprint_image_ref = image_ref
+                else:
+                    updated_profile = await self._aextract(user_message, profile)
+
+                # Ask for missing details without the LLM
+                reply = self._templated_reply(updated_profile)
+                if reply is not None:
+                    return TurnResult(
+                        profile=updated_profile, responses=[AIMessage(content=reply)]
+                    )
+
+                # Generate fortune
+                context = self._fortune_context(user_message, updated_profile)
+                with tracer.span("fortune"):
+                    fortune_text, colors = await self.fortune_generator.agenerate(
+                        context
+                    )
+
+            result = TurnResult(
+                profile=updated_profile,
+                responses=[AIMessage(content=fortune_text)],
+                colors=colors,
             )
-            fortune_text, colors = self.fortune_generator.generate(context)
-            responses.append(AIMessage(content=fortune_text))
 
             # Handle product recommendations if colors were mentioned
             if colors:
-                self.state_manager.set_color_associations(colors)
-                products = self.product_repository.get_all_products()
-                recommendations = self.product_recommender.recommend(colors, products)
+                products = await products_task
+                mentions = self._color_mentions(fortune_text, colors)
+                with tracer.span("recommendation", colors=len(colors)):
+                    recommendations = await self.product_recommender.arecommend(
+                        mentions,
+                        products,
+                        self._product_query(fortune_text, user_message),
+                    )
 
                 if recommendations:
-                    rec_message = self._format_recommendations(recommendations)
-                    responses.append(AIMessage(content=rec_message))
+                    result.responses.append(
+                        self._recommendation_message(recommendations)
+                    )
 
-            return responses
+            return result
 
         except Exception as e:
             raise WorkflowError(f"Workflow processing failed: {str(e)}")
+        finally:
+            if not products_task.done():
+                products_task.cancel()
+
+    def stream_message(self, user_message: str) -> TurnStream:
+        """Stream the fortune for a user message; the result is set once consumed"""
+        return TurnStream(self, user_message, self.state_manager.get_user_profile())
+
+    async def _astream_turn(
+        self, user_message: str, profile: UserProfile, stream: TurnStream
+    ) -> AsyncIterator[str]:
+        """Stream fortune chunks, starting product matching as colors appear"""
+        products_task = asyncio.create_task(asyncio.to_thread(self._load_products))
+        recommendation_task: Optional[asyncio.Task] = None
+        # Color mentions and text query the running recommendation ranks by
+        speculated: Optional[Tuple[List[str], str]] = None
+        chunks: List[str] = []
+        result: Optional[TurnResult] = None
+        try:
+            # Extract information and reply in one call once name and DOB are known
+            context = self._fused_context(user_message, profile)
+            if context is not None:
+                fused = self.fused_generator.stream(context)
+                try:
+                    with tracer.span("fused", stream=True):
+                        async for chunk in fused:
+                            # The colors are known before the reply starts
+                            if fused.colors and speculated is None:
+                                speculated = (
+                                    list(fused.colors),
+                                    self._product_query("", user_message),
+                                )
+                                recommendation_task = self._respeculate(
+                                    recommendation_task, *speculated, products_task
+                                )
+                            chunks.append(chunk)
+                            yield chunk
+                except FortuneGenerationError as e:
+                    if chunks:
+                        raise
+                    logger.warning(
+                        "Fused turn failed, falling back to two calls: %s", e
+                    )
+                else:
+                    result = TurnResult(
+                        profile=fused.result.profile,
+                        responses=[AIMessage(content="".join(chunks))],
+                        colors=fused.result.colors,
+                    )
+
+            if result is None:
+                updated_profile = await self._aextract(user_message, profile)
+
+                # Ask for missing details without the LLM
+                reply = self._templated_reply(updated_profile)
+                if reply is not None:
+                    stream.result = TurnResult(
+                        profile=updated_profile, responses=[AIMessage(content=reply)]
+                    )
+                    yield reply
+                    return
+
+                context = self._fortune_context(user_message, updated_profile)
+                detector = self.fortune_generator.create_color_detector()
+
+                with tracer.span("fortune", stream=True):
+                    async for chunk in self.fortune_generator.agenerate_stream(context):
+                        chunks.append(chunk)
+
+                        # Restart speculative matching whenever a new color shows up
+                        if detector.feed(chunk):
+                            # Terms as written, as the final ranking uses them
+                            speculated = (
+                                [m.term for m in detector.scan.mentions],
+                                self._product_query("".join(chunks), user_message),
+                            )
+                            recommendation_task = self._respeculate(
+                                recommendation_task, *speculated, products_task
+                            )
 
-    def process_handprint(self, image_base64: str) -> str:
+                        yield chunk
+
+                # The last word may not have been followed by a boundary yet
+                detector.finish()
+                result = TurnResult(
+                    profile=updated_profile,
+                    responses=[AIMessage(content="".join(chunks))],
+                    colors=list(detector.colors),
+                )
+
+            # Rank again on the whole fortune unless the early guess already
+            # used the same mention weights and text
+            text = "".join(chunks)
+            final = (
+                self._color_mentions(text, result.colors),
+                self._product_query(text, user_message),
+            )
+            if final != speculated:
+                recommendation_task = self._respeculate(
+                    recommendation_task, *final, products_task
+                )
+
+            if recommendation_task is not None:
+                recommendations = await recommendation_task
+                if recommendations:
+                    result.responses.append(
+                        self._recommendation_message(recommendations)
+                    )
+
+            stream.result = result
+
+        except Exception as e:
+            raise WorkflowError(f"Workflow processing failed: {str(e)}")
+        finally:
+            if recommendation_task is not None and not recommendation_task.done():
+                recommendation_task.cancel()
+            if not products_task.done():
+                products_task.cancel()
+
+    def _respeculate(
+        self,
+        task: Optional[asyncio.Task],
+        colors: List[str],
+        query: str,
+        products_task: asyncio.Task,
+    ) -> Optional[asyncio.Task]:
+        """Restart speculative product matching for a new color list"""
+        if task is not None:
+            task.cancel()
+        if not colors:
+            return None
+        return asyncio.create_task(self._arecommend(list(colors), query, products_task))
+
+    def _product_query(self, fortune_text: str, user_message: str) -> str:
+        """Text products are matched against: the fortune and the seeker's focus"""
+        categories = self.intent_classifier.classify(user_message).categories
+        focus = [settings.TEXT_QUERY_FOCUS_TERMS.get(c, c) for c in categories]
+        return " ".join([fortune_text, *focus]).strip()
+
+    def _color_mentions(self, text: str, colors: List[str]) -> List[str]:
+        """
+        Color terms in order of mention, once per mention, for ranking products
+
+        Terms as written ("coral", not its canonical "Pink") so products match
+        the nearest colors; colors the text does not mention follow.
+        """
+        scan = [m for m in color_lexicon.scan(text) if m.color in colors]
+        mentioned = {m.color for m in scan}
+        return [m.term for m in scan] + [c for c in colors if c not in mentioned]
+
+    def _fortune_context(
+        self, user_message: str, profile: UserProfile
+    ) -> FortuneContext:
+        """Fortune context for a turn, with the seeker's classified choice"""
+        return FortuneContext(
+            user_profile=profile,
+            latest_message=user_message,
+            categories=self.intent_classifier.classify(user_message).categories,
+        )
+
+    def _fused_context(
+        self, user_message: str, profile: UserProfile
+    ) -> Optional[FortuneContext]:
+        """Context for a fused turn, or None if the turn takes the two-call path"""
+        if self.fused_generator is None:
+            return None
+        stage = self.router.route(profile)
+        if stage != ConversationStage.DIVINATION:
+            return None
+        tracer.annotate(stage=stage)
+        return self._fortune_context(user_message, profile)
+
+    def _fused_turn(
+        self, user_message: str, profile: UserProfile
+    ) -> Optional[FusedTurn]:
+        """Fused turn within a fused span, or None to take the two-call path"""
+        context = self._fused_context(user_message, profile)
+        if context is None:
+            return None
+        try:
+            with tracer.span("fused"):
+                return self.fused_generator.generate(context)
+        except FortuneGenerationError as e:
+            logger.warning("Fused turn failed, falling back to two calls: %s", e)
+            return None
+
+    async def _afused_turn(
+        self, user_message: str, profile: UserProfile
+    ) -> Optional[FusedTurn]:
+        """Fused turn within a fused span, or None to take the two-call path"""
+        context = self._fused_context(user_message, profile)
+        if context is None:
+            return None
+        try:
+            with tracer.span("fused"):
+                return await self.fused_generator.agenerate(context)
+        except FortuneGenerationError as e:
+            logger.warning("Fused turn failed, falling back to two calls: %s", e)
+            return None
+
+    def _templated_reply(self, profile: UserProfile) -> Optional[str]:
+        """Mystica's line for an information-gathering stage, or None to divine"""
+        stage = self.router.route(profile)
+        tracer.annotate(stage=stage)
+        return self.router.respond(stage, profile)
+
+    async def _aextract(self, user_message: str, profile: UserProfile) -> UserProfile:
+        """Extract profile details from a message within an extraction span"""
+        with tracer.span("extraction"):
+            return await self.extractor.aextract(user_message, profile)
+
+    def _load_products(self):
+        """Load the product catalog within a catalog span"""
+        with tracer.span("catalog"):
+            return self.product_repository.get_all_products()
+
+    async def _arecommend(
+        self, colors: List[str], query: str, products_task: asyncio.Task
+    ) -> List[tuple[Product, str]]:
+        """Recommend products once the catalog has loaded"""
+        # Shield the shared catalog load from cancellation of this attempt
+        products = await asyncio.shield(products_task)
+        with tracer.span("recommendation", colors=len(set(colors))):
+            return await self.product_recommender.arecommend(colors, products, query)
+
+    def apply_turn(self, result: TurnResult):
+        """Persist the outcome of a turn to session state"""
+        latest_profile = self.state_manager.get_user_profile()
+
+        # Keep a handprint analysis that completed while the turn was in flight
+        if latest_profile.handprint_analysis and not result.profile.handprint_analysis:
+            result.profile.handprint_analysis = latest_profile.handprint_analysis
+            result.profile.handprint_image_ref = latest_profile.handprint_image_ref
+
+        self.state_manager.set_user_profile(result.profile)
+        self._pin_handprint_image(result.profile)
+        if result.colors:
+            self.state_manager.set_color_associations(result.colors)
+        if result.trace is not None:
+            self.state_manager.set_last_trace(result.trace)
+
+    def process_handprint(self, image: HandprintImage) -> str:
         """Process handprint image and return analysis"""
         try:
-            analysis = self.handprint_analyzer.analyze(image_base64)
+            with (
+                tracer.trace("handprint") as trace,
+                deadline(settings.TURN_DEADLINE_SECONDS),
+            ):
+                self.state_manager.set_last_trace(trace)
+                analysis = self._cached_handprint_analysis(image)
+                if analysis is None:
+                    analysis = self.handprint_analyzer.analyze(image.base64)
+                    self._cache_handprint_analysis(image, analysis)
+
+                # Update profile with handprint analysis
+                profile = self.state_manager.get_user_profile()
+                profile.handprint_analysis = analysis
+                profile.handprint_image_ref = self._store_handprint_image(image)
+                self.state_manager.set_user_profile(profile)
+                self._pin_handprint_image(profile)
+
+            return analysis
+
+        except Exception as e:
+            raise WorkflowError(f"Handprint processing failed: {str(e)}")
+
+    async def aprocess_handprint(self, image: HandprintImage) -> str:
+        """Process handprint image asynchronously and return analysis"""
+        try:
+            with (
+                tracer.trace("handprint") as trace,
+                deadline(settings.TURN_DEADLINE_SECONDS),
+            ):
+                self.state_manager.set_last_trace(trace)
+                analysis, image_ref = await asyncio.gather(
+                    self._aanalyze_handprint(image),
+                    asyncio.to_thread(self._store_handprint_image, image),
+                )
 
             # Update profile with handprint analysis
             profile = self.state_manager.get_user_profile()
             profile.handprint_analysis = analysis
-            profile.handprint_image_base64 = image_base64
+            profile.handprint_image_ref = image_ref
             self.state_manager.set_user_profile(profile)
+            self._pin_handprint_image(profile)
 
             return analysis
 
         except Exception as e:
             raise WorkflowError(f"Handprint processing failed: {str(e)}")
 
+    def _store_handprint_image(self, image: HandprintImage) -> Optional[str]:
+        """Put the image bytes in the blob store and return their reference"""
+        if self.blob_store is None:
+            return None
+        with tracer.span("blob_store.put", bytes=len(image.data)):
+            return self.blob_store.put(image.data)
+
+    def _pin_handprint_image(self, profile: UserProfile):
+        """Lease the profile's handprint image for the session, releasing the old one"""
+        if self.blob_store is None:
+            return
+
+        lease = self.state_manager.get_handprint_lease()
+        ref = profile.handprint_image_ref
+        if lease is not None and lease.ref == ref:
+            return
+
+        if lease is not None:
+            lease.release()
+        self.state_manager.set_handprint_lease(
+            self.blob_store.lease(ref) if ref else None
+        )
+
+    def handprint_message(self, analysis: str) -> AIMessage:
+        """Chat message announcing a handprint analysis to the seeker"""
+        return AIMessage(
+            content=f'Mystica has gleaned from your palm: "{analysis}" '
+            f"This insight will guide our session."
+        )
+
+    def get_handprint_image(self, profile: UserProfile) -> Optional[bytes]:
+        """Raw JPEG bytes of the profile's handprint, if still stored"""
+        if self.blob_store is None or not profile.handprint_image_ref:
+            return None
+        return self.blob_store.get(profile.handprint_image_ref)
+
+    async def _aanalyze_handprint(self, image: HandprintImage) -> str:
+        """Analyze a handprint asynchronously, reusing cached analyses"""
+        analysis = await asyncio.to_thread(self._cached_handprint_analysis, image)
+        if analysis is None:
+            analysis = await self.handprint_analyzer.aanalyze(image.base64)
+            await asyncio.to_thread(self._cache_handprint_analysis, image, analysis)
+        return analysis
+
+    def _cached_handprint_analysis(self, image: HandprintImage) -> Optional[str]:
+        """Look up an analysis of the same (or a near-identical) image"""
+        if self.handprint_cache is None or not image.content_hash:
+            return None
+        with tracer.span("handprint_cache.lookup") as span:
+            analysis = self.handprint_cache.get(
+                image.content_hash, image.perceptual_hash
+            )
+            span.set(cache_hit=analysis is not None)
+        return analysis
+
+    def _cache_handprint_analysis(self, image: HandprintImage, analysis: str):
+        """Share an analysis with every session"""
+        if (
+            self.handprint_cache is None
+            or not image.content_hash
+            or image.perceptual_hash is None
+        ):
+            return
+        self.handprint_cache.put(image.content_hash, image.perceptual_hash, analysis)
+
+    def _recommendation_message(
+        self, recommendations: List[tuple[Product, str]]
+    ) -> AIMessage:
+        """Recommendations as a chat message tagged for the recommendation avatar"""
+        return AIMessage(
+            content=self._format_recommendations(recommendations),
+            name=MESSAGE_KIND_RECOMMENDATION,
+        )
+
     def _format_recommendations(
         self, recommendations: List[tuple[Product, str]]
     ) -> str:
@@ -0,0 +1,339 @@
+"""
+Headless JSON-over-HTTP entry point for Mystica Oracle
+
+Serves the same workflow as the Streamlit app without a browser session.
+Conversation state lives in the configured SessionStore, so several worker
+processes can serve one conversation when they share a SQLite file or a
+Redis server (pair them with the local disk blob store for handprints).
+
+Endpoints:
+    POST   /sessions                  start a reading, returns the greeting
+    GET    /sessions/{id}             profile, chat history and colors
+    DELETE /sessions/{id}             forget a session
+    POST   /sessions/{id}/messages    {"message": "..."} -> Mystica's replies
+    POST   /sessions/{id}/handprint   raw image bytes -> handprint analysis
+    GET    /metrics                   span latency histograms (Prometheus text)
+
+Usage:
+    python -m api.server [--host HOST] [--port PORT]
+"""
+
+import argparse
+import io
+import json
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from cachetools import LRUCache
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from core.exceptions import MysticaException
+from core.interfaces import SessionStore
+from core.models import (
+    MESSAGE_KIND_ASSISTANT,
+    MESSAGE_KIND_RECOMMENDATION,
+)
+from settings import settings
+from ui.state import StateManager
+from utils.async_runner import run_coroutine
+from utils.dependencies import AgentRegistry, get_registry
+from utils.image_processing import prepare_handprint_image
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+GREETING = "Hello, I wish to know my future!"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class SessionNotFound(MysticaException):
+    """No live session with the requested id"""
+
+    pass
+
+
+class RequestTooLarge(ValueError):
+    """Request body over SERVICE_MAX_BODY_BYTES"""
+
+    pass
+
+
+class MysticaService:
+    """Runs workflow turns for sessions kept in a shared SessionStore"""
+
+    def __init__(
+        self,
+        registry: Optional[AgentRegistry] = None,
+        store: Optional[SessionStore] = None,
+    ):
+        self.registry = registry or get_registry()
+        self.store = store or self.registry.get_session_store()
+
+        # Process-local state (blob leases), rebuilt on demand when a session
+        # moves to another worker
+        self._local: LRUCache = LRUCache(maxsize=settings.SESSION_LOCAL_STATE_SIZE)
+        # Per-session turn locks and how many requests hold or wait for each;
+        # kept out of the LRU so a lock in use is never replaced
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._slots_lock = threading.Lock()
+
+        # Bound to each request's session with for_session
+        self.workflow = self.registry.get_workflow()
+
+    def _session(self, session_id: str) -> StateManager:
+        """State manager of a session"""
+        with self._slots_lock:
+            local = self._local.get(session_id)
+            if local is None:
+                local = self._local[session_id] = {}
+        return StateManager(self.store, session_id, local)
+
+    def _existing_session(self, session_id: str) -> StateManager:
+        """State manager of a session that has been started"""
+        state_manager = self._session(session_id)
+        if not state_manager.is_initialized():
+            raise SessionNotFound(session_id)
+        return state_manager
+
+    @contextmanager
+    def _turn_lock(self, session_id: str) -> Iterator[None]:
+        """Run one turn of a session at a time in this process"""
+        with self._slots_lock:
+            lock, users = self._locks.get(session_id, (None, 0))
+            lock = lock or threading.Lock()
+            self._locks[session_id] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._slots_lock:
+                lock, users = self._locks[session_id]
+                if users == 1:
+                    del self._locks[session_id]
+                else:
+                    self._locks[session_id] = (lock, users - 1)
+
+    def create_session(self) -> Dict[str, Any]:
+        """Start a session with the same greeting turn as the app"""
+        session_id = uuid.uuid4().hex
+        state_manager = self._session(session_id)
+        with self._turn_lock(session_id):
+            responses = self._run_turn(state_manager, GREETING)
+            state_manager.set_initialized()
+        return {"session_id": session_id, "messages": serialize_messages(responses)}
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        """Profile, chat history and colors of a session"""
+        state_manager = self._existing_session(session_id)
+        return {
+            "session_id": session_id,
+            "profile": asdict(state_manager.get_user_profile()),
+            "messages": [asdict(r) for r in state_manager.get_chat_records()],
+            "colors": state_manager.get_color_associations(),
+        }
+
+    def delete_session(self, session_id: str):
+        """Forget a session and release its local state"""
+        self.store.delete(session_id)
+        with self._slots_lock:
+            local = self._local.pop(session_id, None)
+        lease = (local or {}).get(f"{settings.STATE_KEY_PREFIX}handprint_lease")
+        if lease is not None:
+            lease.release()
+
+    def send_message(self, session_id: str, message: str) -> Dict[str, Any]:
+        """Run a turn for a seeker's message"""
+        state_manager = self._existing_session(session_id)
+        with self._turn_lock(session_id):
+            responses = self._run_turn(state_manager, message)
+        return {"messages": serialize_messages(responses)}
+
+    def upload_handprint(self, session_id: str, data: bytes) -> Dict[str, Any]:
+        """Analyze a handprint photo for a session"""
+        from PIL import Image
+
+        state_manager = self._existing_session(session_id)
+        try:
+            image = prepare_handprint_image(io.BytesIO(data))
+        except (OSError, Image.DecompressionBombError):
+            # Not an image, truncated, or too many pixels: the client's error
+            raise ValueError("Expected a JPEG or PNG image")
+        with self._turn_lock(session_id):
+            workflow = self.workflow.for_session(state_manager)
+            analysis = run_coroutine(workflow.aprocess_handprint(image))
+            # Announced in the chat, as the app does
+            message = workflow.handprint_message(analysis)
+            state_manager.add_message(message)
+        return {"analysis": analysis, "messages": serialize_messages([message])}
+
+    def _run_turn(self, state_manager: StateManager, message: str) -> List[BaseMessage]:
+        """Run a turn on the shared event loop and record it in the session"""
+        workflow = self.workflow.for_session(state_manager)
+        result = run_coroutine(
+            workflow.arespond(message, state_manager.get_user_profile())
+        )
+        workflow.apply_turn(result)
+
+        state_manager.add_message(HumanMessage(content=message))
+        for response in result.responses:
+            state_manager.add_message(response)
+        return result.responses
+
+
+def serialize_messages(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    """Mystica's reply messages as JSON objects"""
+    return [
+        {
+            "kind": MESSAGE_KIND_RECOMMENDATION
+            if m.name == MESSAGE_KIND_RECOMMENDATION
+            else MESSAGE_KIND_ASSISTANT,
+            "content": m.content,
+        }
+        for m in messages
+    ]
+
+
+class MysticaRequestHandler(BaseHTTPRequestHandler):
+    """Routes HTTP requests to the service"""
+
+    service: MysticaService
+
+    def do_POST(self):
+        """Create sessions, send messages and upload handprints"""
+        parts = self._path_parts()
+        if parts == ["sessions"]:
+            self._respond(201, self.service.create_session)
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages":
+            self._respond(200, lambda: self._send_message(parts[1]))
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "handprint":
+            self._respond(
+                200,
+                lambda: self.service.upload_handprint(parts[1], self._read_body()),
+            )
+        else:
+            self._write_json(404, {"error": "not found"})
+
+    def do_GET(self):
+        """Read a session or the metrics"""
+        parts = self._path_parts()
+        if len(parts) == 2 and parts[0] == "sessions":
+            self._respond(200, lambda: self.service.get_session(parts[1]))
+        elif parts == ["metrics"]:
+            self._write(
+                200, tracer.export_prometheus().encode("utf-8"), PROMETHEUS_TYPE
+            )
+        else:
+            self._write_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        """Delete a session"""
+        parts = self._path_parts()
+        if len(parts) == 2 and parts[0] == "sessions":
+            self._respond(204, lambda: self.service.delete_session(parts[1]))
+        else:
+            self._write_json(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        """Log requests through logging instead of stderr"""
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def _send_message(self, session_id: str) -> Dict[str, Any]:
+        """Parse a message request and run the turn"""
+        body = self._read_body()
+        try:
+            message = json.loads(body)["message"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError('Expected a JSON body with a "message" string')
+        if not isinstance(message, str) or not message.strip():
+            raise ValueError('Expected a JSON body with a "message" string')
+        return self.service.send_message(session_id, message)
+
+    def _respond(self, status: int, handler):
+        """Run a handler and write its result or error as JSON"""
+        try:
+            payload = handler()
+        except SessionNotFound:
+            self._write_json(404, {"error": "session not found"})
+        except RequestTooLarge as e:
+            self._write_json(413, {"error": str(e)})
+        except ValueError as e:
+            self._write_json(400, {"error": str(e)})
+        except MysticaException as e:
+            logger.warning("Request failed: %s", e)
+            self._write_json(502, {"error": str(e)})
+        except Exception:
+            logger.exception("Unhandled error serving %s", self.path)
+            self._write_json(500, {"error": "internal error"})
+        else:
+            self._write_json(status, payload)
+
+    def _path_parts(self) -> List[str]:
+        """Non-empty path segments, without the query string"""
+        return [p for p in self.path.split("?", 1)[0].split("/") if p]
+
+    def _read_body(self) -> bytes:
+        """Request body bytes, refusing bodies over SERVICE_MAX_BODY_BYTES"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length < 0:
+            raise ValueError("Invalid Content-Length")
+        if length > settings.SERVICE_MAX_BODY_BYTES:
+            # Unread, so the connection must not be reused
+            self.close_connection = True
+            raise RequestTooLarge(
+                f"Request body over {settings.SERVICE_MAX_BODY_BYTES} bytes"
+            )
+        return self.rfile.read(length)
+
+    def _write_json(self, status: int, payload: Any):
+        """Write a JSON response, or an empty one for 204"""
+        body = b"" if status == 204 else json.dumps(payload).encode("utf-8")
+        self._write(status, body, "application/json")
+
+    def _write(self, status: int, body: bytes, content_type: str):
+        """Write a response"""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(
+    host: str = settings.SERVICE_HOST,
+    port: int = settings.SERVICE_PORT,
+    service: Optional[MysticaService] = None,
+) -> ThreadingHTTPServer:
+    """HTTP server bound to a service"""
+    handler = type(
+        "BoundMysticaRequestHandler",
+        (MysticaRequestHandler,),
+        {"service": service or MysticaService()},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=settings.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVICE_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = create_server(args.host, args.port)
+    logger.info("Serving Mystica Oracle on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark of catalog loading and color lookup on a large synthetic catalog
+
+Usage:
+    python -m benchmarks.catalog [--products N] [--lookups N]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from typing import List
+
+from core.interfaces import ProductCatalog
+from core.models import Product
+from data.catalog import CSV_LIST_SEPARATOR, load_catalog
+from data.columnar_catalog import write_columnar_catalog
+from settings import settings
+from utils.color_lexicon import color_lexicon
+
+SYNTHETIC_COLORS = [
+    "Gold",
+    "Brown (for chocolate variant)",
+    "Orange",
+    "Yellow",
+    "Green",
+    "Pink",
+    "Blue",
+    "Red",
+    "Black",
+    "Silver",
+    "Purple",
+]
+
+
+def synthetic_products(count: int, seed: int = 0) -> List[Product]:
+    """Generate a catalog with a realistic mix of colors"""
+    rng = random.Random(seed)
+    return [
+        Product(
+            item_name_thai=f"สินค้า {i}",
+            item_name_english_approximation=f"Product {i}",
+            price_baht=round(rng.uniform(10, 500), 2),
+            original_price_baht=None,
+            promotion_details_thai=None,
+            quantity_size_thai=None,
+            textual_attributes_for_recommendation=["synthetic", f"batch-{i % 50}"],
+            inferred_color_association_primary=rng.choice(SYNTHETIC_COLORS),
+            product_id=f"P{i:07d}",
+        )
+        for i in range(count)
+    ]
+
+
+def find_by_colors(catalog, colors: List[str], limit: int) -> List[Product]:
+    """Indexed lookup on catalogs, a linear scan on plain product lists"""
+    if isinstance(catalog, ProductCatalog):
+        return catalog.find_by_colors(colors, limit)
+
+    matches = []
+    for product in catalog:
+        color = color_lexicon.normalize(product.inferred_color_association_primary)
+        if color in colors:
+            matches.append(product)
+            if len(matches) >= limit:
+                break
+    return matches
+
+
+def write_catalogs(products: List[Product], directory: str) -> List[str]:
+    """Write the catalog as JSON, CSV and, if pyarrow is installed, Parquet and Arrow"""
+    records = [asdict(p) for p in products]
+    paths = []
+
+    json_path = os.path.join(directory, "products.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+    paths.append(json_path)
+
+    csv_path = os.path.join(directory, "products.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        for record in records:
+            attributes = record["textual_attributes_for_recommendation"]
+            record = dict(record)
+            record["textual_attributes_for_recommendation"] = CSV_LIST_SEPARATOR.join(
+                attributes
+            )
+            writer.writerow(record)
+    paths.append(csv_path)
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return paths
+
+    parquet_path = os.path.join(directory, "products.parquet")
+    pq.write_table(pa.Table.from_pylist(records), parquet_path)
+    paths.append(parquet_path)
+
+    arrow_path = os.path.join(directory, "products.arrow")
+    write_columnar_catalog(products, arrow_path)
+    paths.append(arrow_path)
+    return paths
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    products = synthetic_products(args.products)
+    rng = random.Random(1)
+    base_colors = ["Gold", "Brown", "Red", "Green", "Blue", "Purple", "Silver"]
+    queries = [rng.sample(base_colors, 3) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Loading {args.products} products (heap = Python objects retained):")
+        catalogs = {}
+        for path in write_catalogs(products, directory):
+            tracemalloc.start()
+            start = time.perf_counter()
+            catalog = load_catalog(path)
+            elapsed = time.perf_counter() - start
+            heap_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+
+            name = os.path.basename(path)
+            size_mb = os.path.getsize(path) / 1e6
+            print(
+                f"  {name:<18} {size_mb:7.1f} MB file  {elapsed * 1000:8.1f} ms"
+                f"  {heap_mb:7.1f} MB heap"
+            )
+            catalogs[name] = catalog
+
+        del products
+        snapshot = catalogs["products.json"]
+        backends = [("linear scan", list(snapshot)), ("color index", snapshot)]
+        if "products.arrow" in catalogs:
+            backends.append(("columnar", catalogs["products.arrow"]))
+        # The color index is part of each catalog's ranker, built on first use
+        for _, catalog in backends[1:]:
+            catalog.ranker()
+
+        limit = settings.MAX_PRODUCT_RECOMMENDATIONS
+        print(f"\nColor lookup (3 colors, top {limit}) over {args.lookups} queries:")
+        for name, catalog in backends:
+            start = time.perf_counter()
+            for colors in queries:
+                find_by_colors(catalog, colors, limit)
+            per_query_us = (time.perf_counter() - start) / args.lookups * 1e6
+            print(f"  {name:<12} {per_query_us:10.1f} us")
+
+        # A color with no products is the linear scan's worst case
+        print(f"\nUnmatched color over {args.lookups} queries:")
+        for name, catalog in backends:
+            start = time.perf_counter()
+            for _ in range(args.lookups):
+                find_by_colors(catalog, ["White"], limit)
+            per_query_us = (time.perf_counter() - start) / args.lookups * 1e6
+            print(f"  {name:<12} {per_query_us:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
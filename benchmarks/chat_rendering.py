@@ -0,0 +1,69 @@
+"""
+Benchmark of chat history rerun time as the conversation grows
+
+Runs ChatInterface under Streamlit's AppTest with a pre-filled history and
+times a rerun, with the default window and with the window opened to the
+whole history (the old render-everything behaviour).
+
+Usage:
+    python -m benchmarks.chat_rendering [--sizes 10,100,1000] [--runs N]
+"""
+
+import argparse
+import time
+
+from streamlit.testing.v1 import AppTest
+
+
+def chat_app():
+    """Script run by AppTest: fill the history once, then render the chat"""
+    import streamlit as st
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    from ui.chat import ChatInterface
+    from ui.state import StateManager
+
+    state_manager = StateManager()
+    if not state_manager.get_chat_records():
+        for i in range(st.session_state["bench_messages"] // 2):
+            state_manager.add_message(HumanMessage(content=f"Question {i}?"))
+            state_manager.add_message(
+                AIMessage(content=f"**Work:** A *golden* omen, number {i}. " * 8)
+            )
+        if st.session_state["bench_full_history"]:
+            state_manager.set_chat_window_turns(len(state_manager.get_turn_starts()))
+
+    ChatInterface(state_manager).render()
+
+
+def time_reruns(messages: int, full_history: bool, runs: int) -> float:
+    """Median seconds per rerun of the chat"""
+    app = AppTest.from_function(chat_app, default_timeout=60)
+    app.session_state["bench_messages"] = messages
+    app.session_state["bench_full_history"] = full_history
+    app.run()
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'messages':>9}  {'windowed':>10}  {'full history':>13}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        windowed = time_reruns(size, full_history=False, runs=args.runs)
+        full = time_reruns(size, full_history=True, runs=args.runs)
+        print(f"{size:>9}  {windowed * 1000:>8.1f}ms  {full * 1000:>11.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
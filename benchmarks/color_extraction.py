@@ -0,0 +1,119 @@
+"""
+Micro-benchmark of fortune color extraction, legacy vs compiled lexicon
+
+Usage:
+    python -m benchmarks.color_extraction [--number N]
+"""
+
+import argparse
+import timeit
+from typing import List
+
+from utils.color_lexicon import color_lexicon
+
+SAMPLE_FORTUNES = [
+    "Greetings, seeker. The mists swirl, but your essence remains shrouded. "
+    "Whisper to me the name the spirits call you by.",
+    "**Work:** A **golden** thread weaves through your labours; the **emerald** "
+    "of growth awaits those who persevere.\n\n**Love:** Your heart glows "
+    "**crimson**, and a **rose**-hued dawn approaches.\n\n**Wealth:** "
+    "**Silver** coins gather like pearls on a moonlit shore.",
+    "Gold, azure and onyx converge upon your path. Turquoise waters calm the "
+    "storm while amber embers keep you warm; lavender dreams guide your sleep.",
+]
+
+# The implementation the lexicon replaced, kept here for comparison
+LEGACY_COLOR_MAPPINGS = {
+    "gold": "Gold",
+    "brown": "Brown",
+    "orange": "Orange",
+    "yellow": "Yellow",
+    "green": "Green",
+    "pink": "Pink",
+    "blue": "Blue",
+    "red": "Red",
+    "black": "Black",
+    "silver": "Silver",
+    "violet": "Violet",
+    "emerald": "Green",
+    "purple": "Purple",
+    "crimson": "Red",
+    "rose": "Pink",
+    "scarlet": "Red",
+    "azure": "Blue",
+    "golden": "Gold",
+    "silvery": "Silver",
+    "ebony": "Black",
+    "ivory": "Yellow",
+    "jade": "Green",
+    "ruby": "Red",
+    "sapphire": "Blue",
+    "amber": "Orange",
+    "coral": "Pink",
+    "lavender": "Purple",
+    "turquoise": "Blue",
+    "bronze": "Brown",
+    "copper": "Orange",
+    "pearl": "Silver",
+    "onyx": "Black",
+}
+
+
+def legacy_extract_colors(text: str) -> List[str]:
+    """Substring scan used before the lexicon"""
+    text_lower = text.lower()
+    colors = []
+    color_mappings = dict(LEGACY_COLOR_MAPPINGS)
+
+    for color_variant, base_color in color_mappings.items():
+        if f" {color_variant}" in text_lower or f"**{color_variant}**" in text_lower:
+            colors.append(base_color)
+
+    return list(set(colors))
+
+
+def lexicon_extract_colors(text: str) -> List[str]:
+    """Single-pass compiled lexicon scan"""
+    return color_lexicon.extract(text).colors
+
+
+def streamed_extract_colors(text: str, chunk_size: int = 4) -> List[str]:
+    """Incremental lexicon scan over token-sized chunks"""
+    scanner = color_lexicon.scanner()
+    for start in range(0, len(text), chunk_size):
+        scanner.feed(text[start : start + chunk_size])
+    scanner.finish()
+    return scanner.colors
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("Detected colors (legacy | lexicon):")
+    for text in SAMPLE_FORTUNES:
+        print(
+            f"  {sorted(legacy_extract_colors(text))} | {lexicon_extract_colors(text)}"
+        )
+
+    print(f"\nTime per fortune over {args.number} runs:")
+    for name, fn in [
+        ("legacy", legacy_extract_colors),
+        ("lexicon", lexicon_extract_colors),
+        ("streamed", streamed_extract_colors),
+    ]:
+        seconds = min(
+            timeit.repeat(
+                lambda: [fn(text) for text in SAMPLE_FORTUNES],
+                number=args.number,
+                repeat=3,
+            )
+        )
+        per_call_us = seconds / (args.number * len(SAMPLE_FORTUNES)) * 1e6
+        print(f"  {name:<9} {per_call_us:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
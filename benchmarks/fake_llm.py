@@ -0,0 +1,161 @@
+"""
+Latency-injecting fake chat model for benchmarking without OpenAI credits
+
+FakeChatModel is a LangChain chat model, so it goes wherever ChatOpenAI
+does: the stage model copies, callbacks, caches and structured output.
+Responses come from a responder callable; latency is a time to first
+token drawn from a distribution plus completion tokens at a fixed rate.
+A fraction of calls can fail after their first-token delay (error_rate).
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+Responder = Callable[[List[BaseMessage]], str]
+
+# Roughly four characters per token, as in the offline token estimate
+CHARS_PER_TOKEN = 4
+
+
+class FakeLLMError(RuntimeError):
+    """Injected failure of a simulated call"""
+
+    pass
+
+
+@dataclass
+class LatencyModel:
+    """
+    Time to first token of a simulated call
+
+    Attributes:
+        median_ms: Median time to first token
+        distribution: "constant", "uniform" (0 to twice the median) or
+            "lognormal" (long tail controlled by sigma)
+        sigma: Lognormal shape; 0.5 puts p99 at about 3.2x the median
+    """
+
+    median_ms: float = 500.0
+    distribution: str = "lognormal"
+    sigma: float = 0.5
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a delay in seconds"""
+        if self.distribution == "constant" or self.median_ms <= 0:
+            return self.median_ms / 1000
+        if self.distribution == "uniform":
+            return rng.uniform(0, 2 * self.median_ms) / 1000
+        return rng.lognormvariate(math.log(self.median_ms), self.sigma) / 1000
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from a responder after a simulated delay"""
+
+    responder: Responder
+    structured_responder: Optional[Callable[[List[BaseMessage]], Dict[str, Any]]] = None
+    latency: LatencyModel = LatencyModel()
+    tokens_per_second: float = 60.0
+    error_rate: float = 0.0
+    model_name: str = "fake-chat"
+    seed: Optional[int] = None
+    rng: Optional[random.Random] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def model_post_init(self, context: Any):
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+
+    def _delays(self, text: str) -> List[float]:
+        """Delay before the first chunk, then one per completion token"""
+        tokens = max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        return [self.latency.sample(self.rng)] + [per_token] * (tokens - 1)
+
+    def _chunks(self, text: str) -> Iterator[str]:
+        """Text split into token-sized chunks"""
+        for start in range(0, max(len(text), 1), CHARS_PER_TOKEN):
+            yield text[start : start + CHARS_PER_TOKEN]
+
+    def _maybe_fail(self):
+        """Raise for the configured fraction of calls"""
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise FakeLLMError(f"{self.model_name} failed (injected)")
+
+    def _result(self, text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(text))])
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ):
+        text = self.responder(messages)
+        delays = self._delays(text)
+        time.sleep(delays[0])
+        self._maybe_fail()
+        time.sleep(sum(delays[1:]))
+        return self._result(text)
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ):
+        text = self.responder(messages)
+        delays = self._delays(text)
+        await asyncio.sleep(delays[0])
+        self._maybe_fail()
+        await asyncio.sleep(sum(delays[1:]))
+        return self._result(text)
+
+    def _stream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        text = self.responder(messages)
+        for i, (delay, piece) in enumerate(zip(self._delays(text), self._chunks(text))):
+            time.sleep(delay)
+            if i == 0:
+                self._maybe_fail()
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        text = self.responder(messages)
+        for i, (delay, piece) in enumerate(zip(self._delays(text), self._chunks(text))):
+            await asyncio.sleep(delay)
+            if i == 0:
+                self._maybe_fail()
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    def with_structured_output(self, schema, **kwargs):
+        """Structured output from canned field values, after the same delay"""
+        # A JSON schema dict comes back as a dict, streamed as partial dicts
+        build = (
+            JsonOutputParser()
+            if isinstance(schema, dict)
+            else RunnableLambda(lambda message: schema(**json.loads(message.content)))
+        )
+
+        model = self.model_copy(
+            update={
+                "responder": lambda messages: json.dumps(
+                    self.structured_responder(messages)
+                    if self.structured_responder
+                    else {}
+                )
+            }
+        )
+        return model | build
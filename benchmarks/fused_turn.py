@@ -0,0 +1,158 @@
+"""
+Benchmark of fused extraction and fortune generation against two calls
+
+Runs divination turns (name and date of birth already known) through the
+workflow against FakeChatModel, once with extraction and generation as two
+sequential calls and once with FUSED_TURN_MODE's single structured call.
+Reports turn latency, time to the first chunk and to the end (with product
+recommendations) of streamed turns, and LLM calls and tokens per turn.
+
+Usage:
+    python -m benchmarks.fused_turn [--turns N] [--concurrency C]
+        [--latency-ms MS] [--tokens-per-second TPS]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from agents.fortune_teller import FUSED_SYSTEM_MESSAGE
+from agents.workflow import TurnStream
+from benchmarks.fake_llm import FakeChatModel, LatencyModel
+from benchmarks.load_test import (
+    FORTUNE_TEXT,
+    FakeLLMRegistry,
+    extraction_responder,
+    mystica_responder,
+    summarize,
+)
+from core.models import UserProfile
+from settings import settings
+from utils.color_lexicon import color_lexicon
+from utils.token_accounting import token_accountant
+
+MESSAGES = ["love and wealth", "work", "what does the future hold for me?"]
+
+
+def fused_responder(messages: List[BaseMessage]) -> Dict[str, Any]:
+    """Canned fused turn for fused prompts, ExtractedInfo fields otherwise"""
+    if FUSED_SYSTEM_MESSAGE not in messages:
+        return extraction_responder(messages)
+    return {
+        "user_name": None,
+        "user_dob": None,
+        "colors": color_lexicon.extract(FORTUNE_TEXT).colors,
+        "response": FORTUNE_TEXT,
+    }
+
+
+async def run(args: argparse.Namespace, fused: bool) -> Dict[str, Any]:
+    """Drive the turns through one mode"""
+    llm = FakeChatModel(
+        responder=mystica_responder,
+        structured_responder=fused_responder,
+        latency=LatencyModel(args.latency_ms, "lognormal", args.sigma),
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+    )
+    settings.FUSED_TURN_MODE = fused
+    profile = UserProfile(name="Somchai", date_of_birth="12 March 1990")
+    semaphore = asyncio.Semaphore(args.concurrency)
+    turns: List[float] = []
+    recommended = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        workflow = FakeLLMRegistry(llm, llm, directory).get_workflow()
+
+        async def respond(index: int):
+            nonlocal recommended
+            async with semaphore:
+                start = time.perf_counter()
+                result = await workflow.arespond(
+                    MESSAGES[index % len(MESSAGES)], profile
+                )
+                turns.append(time.perf_counter() - start)
+                recommended += len(result.responses) > 1
+
+        async def stream(index: int) -> Tuple[float, float]:
+            async with semaphore:
+                turn = TurnStream(workflow, MESSAGES[index % len(MESSAGES)], profile)
+                start = time.perf_counter()
+                first_chunk = None
+                async for _ in turn:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                return first_chunk, time.perf_counter() - start
+
+        # Warm up the catalog and reasons outside the measurement
+        await respond(0)
+        turns.clear()
+        recommended = 0
+        token_accountant.reset()
+
+        await asyncio.gather(*(respond(i) for i in range(args.turns)))
+        usage = [
+            u
+            for stage, u in token_accountant.usage().items()
+            if stage in ("extraction", "fortune", "fused")
+        ]
+        calls = sum(u.calls for u in usage)
+        tokens = sum(u.prompt_tokens + u.completion_tokens for u in usage)
+
+        streamed = await asyncio.gather(*(stream(i) for i in range(args.turns)))
+
+    return {
+        "turn": summarize(turns),
+        "first_chunk": summarize([first for first, _ in streamed]),
+        "streamed_turn": summarize([total for _, total in streamed]),
+        "recommended": recommended / args.turns,
+        "calls_per_turn": calls / args.turns,
+        "tokens_per_turn": tokens / args.turns,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """Run the two-call path, then the fused one"""
+    report = {}
+    try:
+        for fused in (False, True):
+            report["fused" if fused else "two_call"] = await run(args, fused)
+    finally:
+        settings.FUSED_TURN_MODE = False
+    return report
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--sigma", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+
+    print(
+        f"{'mode':<10} {'turn p50':>9} {'turn p95':>9} {'1st chunk':>10} "
+        f"{'streamed':>9} {'calls':>6} {'tokens':>7} {'recs':>5}"
+    )
+    for mode, summary in report.items():
+        print(
+            f"{mode:<10} {summary['turn']['p50_ms']:7.0f}ms "
+            f"{summary['turn']['p95_ms']:7.0f}ms "
+            f"{summary['first_chunk']['p50_ms']:8.0f}ms "
+            f"{summary['streamed_turn']['p50_ms']:7.0f}ms "
+            f"{summary['calls_per_turn']:>6.1f} {summary['tokens_per_turn']:>7.0f} "
+            f"{summary['recommended']:>5.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
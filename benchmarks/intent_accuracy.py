@@ -0,0 +1,147 @@
+"""
+Accuracy and speed of the local divination intent classifier
+
+Also compares fortune prompt tokens with the full prompt (every branch and
+the choice list) against the branch-specific prompts.
+
+Usage:
+    python -m benchmarks.intent_accuracy [--number N]
+"""
+
+import argparse
+import timeit
+
+from agents.fortune_teller import MysticaFortuneGenerator
+from agents.intent import DivinationIntentClassifier
+from core.models import FortuneContext, UserProfile
+from settings import settings
+from utils.token_accounting import count_message_tokens
+
+ALL = ["work", "love", "wealth"]
+
+# Sample utterances after Mystica's invitation, with the expected categories
+LABELED_UTTERANCES = [
+    ("work", ["work"]),
+    ("Love", ["love"]),
+    ("wealth", ["wealth"]),
+    ("all", ALL),
+    ("All of them!", ALL),
+    ("everything", ALL),
+    ("general", ALL),
+    ("general vision please", ALL),
+    ("tell me about work", ["work"]),
+    ("Tell me about love.", ["love"]),
+    ("tell me about wealth", ["wealth"]),
+    ("work and love", ["work", "love"]),
+    ("love and wealth", ["love", "wealth"]),
+    ("work and wealth", ["work", "wealth"]),
+    ("work, love, and wealth", ALL),
+    ("yes tell me more", ALL),
+    ("proceed", ALL),
+    ("continue", ALL),
+    ("yes please", ALL),
+    ("What about my career?", ["work"]),
+    ("will I get the promotion", ["work"]),
+    ("my job has been hard lately", ["work"]),
+    ("How is my business going to do", ["work"]),
+    ("is my boss going to notice me", ["work"]),
+    ("I want to know about romance", ["love"]),
+    ("will I find my soulmate?", ["love"]),
+    ("my relationship with my partner", ["love"]),
+    ("is marriage in my future", ["love"]),
+    ("what about my heart", ["love"]),
+    ("money money money", ["wealth"]),
+    ("will I be rich", ["wealth"]),
+    ("my finances are a mess", ["wealth"]),
+    ("should I make this investment", ["wealth"]),
+    ("will I win the lottery", ["wealth"]),
+    ("career and money", ["work", "wealth"]),
+    ("love and my job", ["work", "love"]),
+    ("both work and love", ["work", "love"]),
+    ("everything except love", ["work", "wealth"]),
+    ("all but wealth", ["work", "love"]),
+    ("not love, only work", ["work"]),
+    ("lvoe", ["love"]),
+    ("wrok please", ["work"]),
+    ("wealht", ["wealth"]),
+    ("carreer", ["work"]),
+    ("relationshp", ["love"]),
+    ("ความรัก", ["love"]),
+    ("อยากรู้เรื่องการงาน", ["work"]),
+    ("การเงินของฉัน", ["wealth"]),
+    ("ขอดูทั้งหมด", ALL),
+    ("not interested in love, just work", ["work"]),
+    ("no love or work please", []),
+    ("not love but work", ["work"]),
+    ("all of them, especially love", ALL),
+    ("not everything, just love", ["love"]),
+    ("yes, love please", ["love"]),
+    ("I don't care about money, tell me about love", ["love"]),
+    ("ไม่เอาความรัก ขอเรื่องงาน", ["work"]),
+    ("ไม่เอาความรักแต่ขอเรื่องงาน", ["work"]),
+    ("ทุกด้านยกเว้นความรัก", ["work", "wealth"]),
+    ("welth", ["wealth"]),
+    ("mony", ["wealth"]),
+    ("tell me about my health", []),
+    ("honey, tell me", []),
+    ("hello", []),
+    ("hmm I am not sure", []),
+    ("what can you do?", []),
+    ("who are you", []),
+    ("I am feeling nervous", []),
+    ("what do you see?", []),
+    ("I want to move house", []),
+    ("thank you", []),
+    ("tell me a story", []),
+]
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    classifier = DivinationIntentClassifier()
+    errors = []
+    for utterance, expected in LABELED_UTTERANCES:
+        predicted = classifier.classify(utterance).categories
+        if predicted != expected:
+            errors.append((utterance, expected, predicted))
+
+    correct = len(LABELED_UTTERANCES) - len(errors)
+    print(f"Accuracy: {correct}/{len(LABELED_UTTERANCES)}")
+    for utterance, expected, predicted in errors:
+        print(f"  {utterance!r}: expected {expected}, got {predicted}")
+
+    # Fresh classifier so word lookups are not already memoized
+    cold = DivinationIntentClassifier()
+    utterances = [u for u, _ in LABELED_UTTERANCES]
+    for name, instance in [("cold", cold), ("warm", cold)]:
+        seconds = timeit.timeit(
+            lambda: [instance.classify(u) for u in utterances], number=1
+        )
+        print(f"{name:>5}: {seconds / len(utterances) * 1e6:8.1f} us per utterance")
+    seconds = timeit.timeit(
+        lambda: [classifier.classify(u) for u in utterances], number=args.number
+    )
+    print(f"steady: {seconds / (args.number * len(utterances)) * 1e6:7.1f} us")
+
+    generator = MysticaFortuneGenerator(llm=None)
+    profile = UserProfile(name="Somchai", date_of_birth="12 March 1990")
+    print("\nFortune prompt tokens:")
+    for label, categories in [
+        ("full prompt", None),
+        ("invitation", []),
+        ("one category", ["love"]),
+        ("all categories", ALL),
+    ]:
+        context = FortuneContext(profile, "love", categories=categories)
+        tokens, _ = count_message_tokens(
+            generator._build_prompt(context), settings.LLM_MODEL
+        )
+        print(f"  {label:<15} {tokens:6d}")
+
+
+if __name__ == "__main__":
+    main()
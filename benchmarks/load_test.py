@@ -0,0 +1,306 @@
+"""
+Load test of the full workflow against a latency-injecting fake LLM
+
+Drives concurrent simulated sessions through greeting, name, date of birth,
+category choice and handprint upload via the headless service, with every
+LLM replaced by FakeChatModel. Reports p50/p95/p99 latency per step,
+throughput, CPU time and peak RSS, and optionally writes them as JSON so
+runs can be compared. With --latency-ms 0 --tokens-per-second 0 the fake
+LLM answers instantly and what remains is orchestration overhead.
+
+Usage:
+    python -m benchmarks.load_test [--sessions N] [--concurrency C]
+        [--latency-ms MS] [--vision-latency-ms MS] [--distribution NAME]
+        [--tokens-per-second TPS] [--output report.json]
+"""
+
+import argparse
+import io
+import json
+import platform
+import re
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.messages import BaseMessage
+from PIL import Image
+
+from agents.recommenders import REASONS_SYSTEM_MESSAGE, MysticaProductRecommender
+from api.server import MysticaService
+from benchmarks.fake_llm import FakeChatModel, LatencyModel
+from data.handprint_cache import HandprintAnalysisCache
+from data.reasons_store import ReasonsRefresher, ReasonsStore
+from data.session_store import MemorySessionStore
+from utils.dependencies import AgentRegistry
+from utils.token_accounting import token_accountant
+
+# Scripted seeker turns after the greeting, with what extraction returns
+SCRIPT = [
+    ("name", "My name is Somchai", {"user_name": "Somchai"}),
+    ("dob", "I was born on 12 March 1990", {"user_dob": "12 March 1990"}),
+    ("choice", "love and wealth", {}),
+]
+STEPS = ["greeting"] + [step for step, _, _ in SCRIPT] + ["handprint"]
+
+FORTUNE_TEXT = (
+    "**Love:** Somchai, your heart glows **crimson** as a **rose**-hued dawn "
+    "approaches; an old bond is renewed beneath a patient moon.\n\n"
+    "**Wealth:** **Gold** gathers slowly at your threshold, and a **green** "
+    "shoot of fortune rises where you planted in faith."
+)
+HANDPRINT_TEXT = (
+    "A long, unbroken life line curves wide around the mount of Venus, "
+    "speaking of vitality; the heart line rises toward the index finger."
+)
+
+_MESSAGE = re.compile(r'^Message: "(.*)"$', re.MULTILINE)
+_EXTRACTED = {message: fields for _, message, fields in SCRIPT}
+
+
+def mystica_responder(messages: List[BaseMessage]) -> str:
+    """Canned replies for the reasons, handprint and fortune prompts"""
+    if not isinstance(messages[0].content, str):
+        return HANDPRINT_TEXT
+    if messages[0] == REASONS_SYSTEM_MESSAGE:
+        count = len(messages[1].content.splitlines())
+        return "\n".join(
+            f"{i + 1}. Its color hums in tune with the path the stars lay out."
+            for i in range(count)
+        )
+    return FORTUNE_TEXT
+
+
+def extraction_responder(messages: List[BaseMessage]) -> Dict[str, Any]:
+    """Canned ExtractedInfo fields for the scripted messages"""
+    match = _MESSAGE.search(messages[-1].content)
+    return _EXTRACTED.get(match.group(1), {}) if match else {}
+
+
+class FakeLLMRegistry(AgentRegistry):
+    """AgentRegistry with fake LLMs and throwaway stores"""
+
+    def __init__(self, llm: FakeChatModel, vision_llm: FakeChatModel, directory: str):
+        super().__init__()
+        self._llms = llm, vision_llm
+        self._directory = directory
+
+    def _create_llms(self):
+        return self._llms
+
+    def get_llm_caches(self):
+        # Scripted prompts repeat, so a response cache would hide the LLM
+        return {}
+
+    def _create_reasons_store(self):
+        store = ReasonsStore(path=None)
+        refresher = ReasonsRefresher(
+            store,
+            MysticaProductRecommender(
+                self.get_stage_llm("reasons")
+            ).generate_fresh_reasons,
+        )
+        return store, refresher
+
+    def get_handprint_cache(self):
+        return self._get(
+            "handprint_cache",
+            lambda: HandprintAnalysisCache(
+                path=f"{self._directory}/handprints.sqlite3"
+            ),
+        )
+
+
+def handprint_photo(seed: int) -> bytes:
+    """Distinct JPEG per session so handprint analyses are not cached"""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def run_session(service: MysticaService, index: int) -> Dict[str, float]:
+    """Walk one seeker through the script, timing each step"""
+    timings = {}
+
+    start = time.perf_counter()
+    session_id = service.create_session()["session_id"]
+    timings["greeting"] = time.perf_counter() - start
+
+    for step, message, _ in SCRIPT:
+        start = time.perf_counter()
+        service.send_message(session_id, message)
+        timings[step] = time.perf_counter() - start
+
+    photo = handprint_photo(index)
+    start = time.perf_counter()
+    service.upload_handprint(session_id, photo)
+    timings["handprint"] = time.perf_counter() - start
+
+    service.delete_session(session_id)
+    return timings
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the sessions and build the report"""
+    llm = FakeChatModel(
+        responder=mystica_responder,
+        structured_responder=extraction_responder,
+        latency=LatencyModel(args.latency_ms, args.distribution, args.sigma),
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+    )
+    vision_llm = llm.model_copy(
+        update={
+            "latency": LatencyModel(
+                args.vision_latency_ms, args.distribution, args.sigma
+            ),
+            "model_name": "fake-vision",
+        }
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        registry = FakeLLMRegistry(llm, vision_llm, directory)
+        service = MysticaService(registry, MemorySessionStore())
+
+        # Warm up imports, the catalog and the event loop outside the measurement
+        run_session(service, args.sessions)
+        token_accountant.reset()
+
+        samples: Dict[str, List[float]] = {step: [] for step in STEPS}
+        errors: List[str] = []
+        lock = threading.Lock()
+
+        def worker(index: int):
+            try:
+                timings = run_session(service, index)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                return
+            with lock:
+                for step, seconds in timings.items():
+                    samples[step].append(seconds)
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(worker, range(args.sessions)))
+        wall = time.perf_counter() - start
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    user_cpu = usage_after.ru_utime - usage_before.ru_utime
+    system_cpu = usage_after.ru_stime - usage_before.ru_stime
+    completed = len(samples["handprint"])
+    turns = completed * len(STEPS)
+    return {
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "sessions",
+                "concurrency",
+                "latency_ms",
+                "vision_latency_ms",
+                "distribution",
+                "sigma",
+                "tokens_per_second",
+                "seed",
+            )
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "steps": {step: summarize(v) for step, v in samples.items() if v},
+        "sessions_completed": completed,
+        "errors": errors,
+        "wall_seconds": wall,
+        "throughput": {
+            "sessions_per_second": completed / wall,
+            "turns_per_second": turns / wall,
+        },
+        "cpu_seconds": {"user": user_cpu, "system": system_cpu},
+        "cpu_ms_per_turn": (user_cpu + system_cpu) / max(turns, 1) * 1000,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": usage_after.ru_maxrss / 1024,
+        "llm_tokens": {
+            stage: {
+                "calls": u.calls,
+                "cached_calls": u.cached_calls,
+                "prompt": u.prompt_tokens,
+                "completion": u.completion_tokens,
+            }
+            for stage, u in token_accountant.usage().items()
+        },
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--vision-latency-ms", type=float, default=1500.0)
+    parser.add_argument(
+        "--distribution",
+        choices=["constant", "uniform", "lognormal"],
+        default="lognormal",
+    )
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = run_load_test(args)
+
+    print(f"{'step':<10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for step, summary in report["steps"].items():
+        print(
+            f"{step:<10} {summary['p50_ms']:7.0f}ms {summary['p95_ms']:7.0f}ms "
+            f"{summary['p99_ms']:7.0f}ms"
+        )
+    throughput = report["throughput"]
+    print(
+        f"\n{report['sessions_completed']}/{args.sessions} sessions in "
+        f"{report['wall_seconds']:.1f}s: {throughput['sessions_per_second']:.1f} "
+        f"sessions/s, {throughput['turns_per_second']:.1f} turns/s"
+    )
+    print(
+        f"CPU {report['cpu_ms_per_turn']:.1f} ms/turn, "
+        f"peak RSS {report['peak_rss_mb']:.0f} MB, errors {len(report['errors'])}"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
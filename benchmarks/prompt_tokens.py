@@ -0,0 +1,169 @@
+"""
+Prompt token accounting per stage, legacy single-string prompts vs static prefix
+
+For a scripted conversation, counts the prompt tokens each stage sends and
+how many of them form a byte-identical prefix across calls, i.e. what a
+provider-side prompt cache can reuse.
+
+Usage:
+    python -m benchmarks.prompt_tokens [--model MODEL]
+"""
+
+import argparse
+import os
+from typing import Callable, List, Union
+
+from langchain_core.messages import BaseMessage
+
+from agents.extractors import LLMMessageExtractor
+from agents.fortune_teller import MysticaFortuneGenerator
+from agents.recommenders import MysticaProductRecommender
+from core.models import FortuneContext, UserProfile
+from data.repositories import ProductRepository
+from settings import settings
+from utils.token_accounting import count_message_tokens, count_tokens, message_text
+
+Prompt = Union[str, List[BaseMessage]]
+
+CONVERSATION = [
+    (UserProfile(), "Hello, I wish to know my future!"),
+    (UserProfile(), "My name is Somchai"),
+    (UserProfile(name="Somchai"), "I was born on 12 March 1990"),
+    (UserProfile(name="Somchai", date_of_birth="12 March 1990"), "Tell me"),
+    (UserProfile(name="Somchai", date_of_birth="12 March 1990"), "love"),
+    (UserProfile(name="Somchai", date_of_birth="12 March 1990"), "work and wealth"),
+]
+
+
+def legacy_fortune_prompt(context: FortuneContext) -> str:
+    """Fortune prompt before the static/dynamic split, with data interleaved"""
+    name = context.user_profile.name or "Awaiting Whisper from the Stars"
+    dob = context.user_profile.date_of_birth or "Echoes of a Past Yet Unsung"
+    handprint = context.user_profile.handprint_analysis
+
+    return f"""
+You are **Mystica, the All-Seeing Oracle**. Your voice is ancient, your wisdom vast, your pronouncements both enigmatic and deeply insightful. You peer through the veils of time and fate.
+
+**Seeker Information:**
+* **Name:** {name}
+* **Date of Birth:** {dob}
+* **Handprint Analysis:** {"Palm Lines Revealed: " + handprint if handprint else "Fate's Imprint Optional, Yet Potent"}
+* **Seeker's Latest Utterance:** "{context.latest_message}"
+
+**Your Sacred Duty: Continue the Dialogue**
+Your response MUST be ONLY the direct words of Mystica to the seeker.
+
+**The Unfolding Path of Revelation:**
+
+1.  **If 'Name' is 'Awaiting Whisper from the Stars':**
+    * You MUST beckon forth their name with mystical urgency.
+    * *Example*: "The mists swirl, seeker, but your essence remains shrouded. Whisper to me the name the spirits call you by, that I may part the veils for you."
+
+2.  **Else if 'Date of Birth' is 'Echoes of a Past Yet Unsung':**
+    * Addressing them by their now-known **Name**, you MUST request their birth-sign from the cosmic calendar.
+    * *Example*: "{name}, the celestial spheres align with your presence, yet the exact moment of your arrival upon this earthly coil is needed. Share with me your date of birth, that the stars may illuminate your path."
+
+3.  **Else (Name and Date of Birth are KNOWN):**
+    * **Consider the Seeker's Latest Utterance: "{context.latest_message}".**
+    * **Perform a case-insensitive check. If the user_input_text matches or strongly implies one of the following choices: {settings.DIVINATION_CHOICES}:**
+        * Then assume the Seeker has made a choice. Proceed directly to **Section 4: Main Divination** below.
+    * **Else:**
+        * This is the **Invitation to Choose**. Acknowledge the seeker by **Name**.
+        * **You MUST then invite the seeker to choose their focus of inquiry.**
+        * *Example Query*: "The threads of your destiny are complex, {name}. Do you seek insight into the realm of **Work**, the tender dance of **Love**, or the shifting tides of **Wealth**?"
+        if you does not know just give user all of the choices.
+
+4.  **Main Divination:**
+    * **If the Seeker's Latest Utterance clearly indicates specific categories:**
+        * For EACH category, provide a mystical fortune with a color mention.
+        * Use colors like: **gold**, **silver**, **red**, **pink**, **blue**, **green**, **brown**, **orange**, **yellow**, **black**, **purple**
+        * You may also use poetic variations like **crimson** (for red), **rose** (for pink), **emerald** (for green), etc.
+    * **Else if general fortune:**
+        * Provide an encompassing mystical fortune with color recommendations.
+
+**Guiding Principles:** Be mystical, mention colors in bold (e.g., **gold**, **emerald**, **crimson**, **rose**).
+Your response should be ONLY Mystica's words.
+"""
+
+
+def legacy_extraction_prompt(message: str, profile: UserProfile) -> str:
+    """Extraction prompt before the static/dynamic split"""
+    return (
+        f"Current knowledge: "
+        f"Name: {profile.name or 'Unknown'}, "
+        f"DOB: {profile.date_of_birth or 'Unknown'}, "
+        f"Handprint Analysis: {'Known' if profile.handprint_analysis else 'Unknown'}. "
+        f'User\'s latest message: "{message}". '
+        f"Extract 'user_name', 'user_dob'. "
+        f"If message is textual handprint analysis, extract as 'handprint_analysis'. "
+        f"Output nulls if no new info."
+    )
+
+
+def serialize(prompt: Prompt) -> str:
+    """Prompt as the flat text a provider sees, for prefix comparison"""
+    if isinstance(prompt, str):
+        return prompt
+    return "\n\n".join(f"{m.type}: {message_text(m)}" for m in prompt)
+
+
+def prompt_tokens(prompt: Prompt, model: str) -> int:
+    """Prompt tokens of a single- or multi-message prompt"""
+    if isinstance(prompt, str):
+        return count_tokens(prompt, model)
+    return count_message_tokens(prompt, model)[0]
+
+
+def report(name: str, build: Callable[[], List[Prompt]], model: str):
+    """Print average prompt tokens and the shared prefix across calls"""
+    prompts = build()
+    average = sum(prompt_tokens(p, model) for p in prompts) / len(prompts)
+    prefix = os.path.commonprefix([serialize(p) for p in prompts])
+    prefix_tokens = count_tokens(prefix, model)
+    print(
+        f"  {name:<22} {average:8.0f} {prefix_tokens:10d} {average - prefix_tokens:10.0f}"
+    )
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=settings.LLM_MODEL)
+    args = parser.parse_args()
+
+    fortune = MysticaFortuneGenerator(llm=None)
+    recommender = MysticaProductRecommender(llm=None)
+    extractor_prompt = LLMMessageExtractor._build_prompt
+    contexts = [FortuneContext(p, m) for p, m in CONVERSATION]
+    products = list(ProductRepository().get_all_products())
+    batches = [products[i : i + 3] for i in range(0, len(products) - 2, 3)]
+
+    print(f"{'prompt tokens/call':>33} {'prefix':>10} {'varying':>10}")
+    print("fortune")
+    report("legacy", lambda: [legacy_fortune_prompt(c) for c in contexts], args.model)
+    report(
+        "static + data",
+        lambda: [fortune._build_prompt(c) for c in contexts],
+        args.model,
+    )
+    print("extraction")
+    report(
+        "legacy",
+        lambda: [legacy_extraction_prompt(m, p) for p, m in CONVERSATION],
+        args.model,
+    )
+    report(
+        "static + data",
+        lambda: [extractor_prompt(None, m, p) for p, m in CONVERSATION],
+        args.model,
+    )
+    print("reasons")
+    report(
+        "static + data",
+        lambda: [recommender._build_reasons_prompt(b) for b in batches],
+        args.model,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark of vectorized recommendation ranking on a large synthetic catalog
+
+Builds the ranker of an in-memory and a columnar catalog, then times
+ranking queries (a fortune's color mentions, with and without a budget)
+against the unranked first-in-catalog-order color lookup.
+
+Usage:
+    python -m benchmarks.ranking [--products N] [--queries N] [--top-k K]
+"""
+
+import argparse
+import dataclasses
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.catalog import synthetic_products
+from benchmarks.load_test import percentile
+from core.models import Product
+from data.catalog import CatalogSnapshot
+from data.columnar_catalog import ColumnarCatalog, write_columnar_catalog
+
+BASE_COLORS = ["Gold", "Brown", "Red", "Green", "Blue", "Purple", "Silver"]
+
+
+def promoted_products(count: int, seed: int = 0) -> List[Product]:
+    """Synthetic catalog where some products are discounted or promoted"""
+    rng = random.Random(seed)
+    products = []
+    for product in synthetic_products(count, seed):
+        roll = rng.random()
+        if roll < 0.3:
+            product = dataclasses.replace(
+                product,
+                original_price_baht=round(
+                    product.price_baht * rng.uniform(1.05, 1.6), 2
+                ),
+            )
+        elif roll < 0.45:
+            product = dataclasses.replace(
+                product, promotion_details_thai=f"ลด {rng.randint(5, 40)}%"
+            )
+        products.append(product)
+    return products
+
+
+def fortune_mentions(rng: random.Random) -> List[str]:
+    """Color mentions of a fortune: two to four colors, some repeated"""
+    colors = rng.sample(BASE_COLORS, rng.randint(2, 4))
+    return colors + rng.choices(colors, k=rng.randint(0, 3))
+
+
+def time_queries(query: Callable[[List[str]], object], queries) -> Dict[str, float]:
+    """Per-query latency in microseconds"""
+    samples = []
+    for mentions in queries:
+        start = time.perf_counter()
+        query(mentions)
+        samples.append(time.perf_counter() - start)
+    return {
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    products = promoted_products(args.products, args.seed)
+    rng = random.Random(args.seed + 1)
+    queries = [fortune_mentions(rng) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "products.arrow")
+        write_columnar_catalog(products, path)
+        catalogs = {
+            "in-memory": CatalogSnapshot(products),
+            "columnar": ColumnarCatalog(path),
+        }
+
+        print(f"Ranker build over {args.products} products (once per catalog):")
+        for name, catalog in catalogs.items():
+            start = time.perf_counter()
+            catalog.ranker()
+            print(f"  {name:<10} {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        snapshot = catalogs["in-memory"]
+        ranker = snapshot.ranker()
+        k = args.top_k
+        cases = {
+            "first k in catalog order": lambda m: snapshot.find_by_colors(m, k),
+            "ranked": lambda m: ranker.rank(m, k),
+            "ranked, 50-200 baht": lambda m: ranker.rank(
+                m, k, min_price=50, max_price=200
+            ),
+            "ranked, columnar": lambda m: catalogs["columnar"].ranker().rank(m, k),
+        }
+
+        print(f"\nTop {k} over {args.queries} fortunes:")
+        print(f"  {'query':<26} {'mean':>9} {'p50':>9} {'p99':>9}")
+        for name, query in cases.items():
+            timing = time_queries(query, queries)
+            print(
+                f"  {name:<26} {timing['mean_us']:7.1f}us {timing['p50_us']:7.1f}us "
+                f"{timing['p99_us']:7.1f}us"
+            )
+
+        mentions = queries[0]
+        print(f"\nExample: {mentions}")
+        for position in ranker.rank(mentions, k):
+            product = snapshot[position]
+            print(
+                f"  {product.product_id} {product.inferred_color_association_primary:<7} "
+                f"{product.price_baht:7.2f} (was {product.original_price_baht}) "
+                f"{product.promotion_details_thai or ''}"
+            )
+
+
+if __name__ == "__main__":
+    main()
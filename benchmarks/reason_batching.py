@@ -0,0 +1,167 @@
+"""
+Benchmark of cross-session micro-batching of recommendation reasons
+
+Simulates sessions arriving at a steady rate, each asking for reasons for
+one to three products (popular products more often), against a fake LLM
+behind a requests-per-minute limit. Compares one LLM call per session with
+ReasonBatcher coalescing requests, reporting LLM requests, time spent
+waiting on the rate limit and per-session latency.
+
+Usage:
+    python -m benchmarks.reason_batching [--sessions N] [--rate PER_SECOND]
+        [--rpm LIMIT] [--window-ms MS] [--latency-ms MS]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from agents.recommenders import MysticaProductRecommender
+from benchmarks.catalog import synthetic_products
+from benchmarks.fake_llm import FakeChatModel, LatencyModel
+from benchmarks.load_test import mystica_responder, percentile
+from core.models import Product
+from data.reasons_store import ReasonBatcher
+from utils.resilience import CircuitBreaker, LatencyTracker, LLMCallPolicy
+
+
+class RateLimiter:
+    """Spaces requests evenly at a requests-per-minute limit, as a provider does"""
+
+    def __init__(self, rpm: int):
+        self.interval = 60 / rpm
+        self.waited = 0.0
+        self._next = 0.0
+
+    async def acquire(self):
+        """Wait for the next free slot under the limit"""
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        self.waited += slot - now
+        await asyncio.sleep(slot - now)
+
+
+def session_requests(
+    products: List[Product], sessions: int, seed: int
+) -> List[List[Product]]:
+    """Products each session asks reasons for, skewed toward popular ones"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(products))]
+    return [
+        list(
+            {
+                id(p): p for p in rng.choices(products, weights, k=rng.randint(1, 3))
+            }.values()
+        )
+        for _ in range(sessions)
+    ]
+
+
+async def run(
+    args: argparse.Namespace, requests: List[List[Product]], batched: bool
+) -> Dict[str, Any]:
+    """Drive the sessions through one configuration"""
+    model = FakeChatModel(
+        responder=mystica_responder,
+        latency=LatencyModel(args.latency_ms, "lognormal", 0.3),
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+    )
+    recommender = MysticaProductRecommender(
+        model,
+        policy=LLMCallPolicy(
+            "reasons",
+            None,
+            timeout_seconds=300,
+            hedge=False,
+            breaker=CircuitBreaker("benchmark-reasons"),
+            latencies=LatencyTracker(),
+        ),
+    )
+    limiter = RateLimiter(args.rpm)
+    calls = {"requests": 0, "items": 0}
+
+    async def generate(products: List[Product]) -> List[Optional[str]]:
+        await limiter.acquire()
+        calls["requests"] += 1
+        calls["items"] += len(products)
+        return await recommender.agenerate_fresh_reasons(products)
+
+    batcher = ReasonBatcher(generate, window_ms=args.window_ms) if batched else None
+    latencies: List[float] = []
+
+    async def session(products: List[Product]):
+        start = time.perf_counter()
+        if batcher is not None:
+            await batcher.request(products)
+        else:
+            await generate(products)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    started = time.perf_counter()
+    for products in requests:
+        tasks.append(asyncio.create_task(session(products)))
+        await asyncio.sleep(random.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+
+    return {
+        "llm_requests": calls["requests"],
+        "items_per_request": calls["items"] / max(calls["requests"], 1),
+        "rate_limit_wait_ms": limiter.waited / max(calls["requests"], 1) * 1000,
+        "requests_per_minute": calls["requests"] / wall * 60,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "wall_seconds": wall,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """Run unbatched, then batched, on the same session requests"""
+    products = synthetic_products(args.products, args.seed)
+    requests = session_requests(products, args.sessions, args.seed)
+    report = {}
+    for batched in (False, True):
+        random.seed(args.seed)
+        report["batched" if batched else "per_session"] = await run(
+            args, requests, batched
+        )
+    return report
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=600)
+    parser.add_argument("--rate", type=float, default=60.0, help="Sessions per second")
+    parser.add_argument("--rpm", type=int, default=1500, help="LLM requests per minute")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=25.0)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--tokens-per-second", type=float, default=150.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+
+    print(
+        f"{'mode':<12} {'requests':>9} {'items/req':>10} {'rl wait':>9} "
+        f"{'mean':>8} {'p95':>8}"
+    )
+    for mode, summary in report.items():
+        print(
+            f"{mode:<12} {summary['llm_requests']:>9} "
+            f"{summary['items_per_request']:>10.1f} "
+            f"{summary['rate_limit_wait_ms']:7.0f}ms "
+            f"{summary['mean_ms']:6.0f}ms {summary['p95_ms']:6.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Benchmark of LLM call timeouts, hedging and circuit breaking
+
+Runs three scenarios against FakeChatModel:
+
+* hedging: calls to a model with a long latency tail, with and without a
+  hedged duplicate request after the recent p95
+* circuit breaking: a burst of calls to a model failing most of the time,
+  showing how many still reach it once the breaker opens
+* fallbacks: the agents' canned answers when the model is down or slower
+  than the turn deadline
+
+Usage:
+    python -m benchmarks.resilience [--calls N] [--concurrency C]
+        [--latency-ms MS] [--sigma S] [--error-rate R]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+from langchain_core.messages import HumanMessage
+
+from agents.extractors import LLMMessageExtractor
+from agents.fortune_teller import MysticaFortuneGenerator
+from agents.recommenders import DEFAULT_REASON, MysticaProductRecommender
+from benchmarks.fake_llm import FakeChatModel, LatencyModel
+from benchmarks.load_test import extraction_responder, mystica_responder, percentile
+from core.exceptions import LLMUnavailableError
+from core.models import FortuneContext, Product, UserProfile
+from settings import settings
+from utils.resilience import CircuitBreaker, LatencyTracker, LLMCallPolicy, deadline
+
+PROMPT = [HumanMessage(content="How long will this take?")]
+
+
+class CountingModel(FakeChatModel):
+    """FakeChatModel that counts the calls that reach it"""
+
+    calls: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def fake_model(args: argparse.Namespace, **fields: Any) -> CountingModel:
+    """Fake model with the benchmark's latency distribution"""
+    fields.setdefault("latency", LatencyModel(args.latency_ms, "lognormal", args.sigma))
+    return CountingModel(
+        responder=mystica_responder,
+        structured_responder=extraction_responder,
+        tokens_per_second=0,
+        seed=args.seed,
+        **fields,
+    )
+
+
+def fresh_policy(stage: str, **kwargs: Any) -> LLMCallPolicy:
+    """Policy with its own breaker and latency window, unaffected by other runs"""
+    kwargs.setdefault("breaker", CircuitBreaker(f"benchmark-{stage}"))
+    return LLMCallPolicy(stage, None, latencies=LatencyTracker(), **kwargs)
+
+
+async def run_calls(
+    policy: LLMCallPolicy, model: FakeChatModel, calls: int, concurrency: int
+) -> Dict[str, Any]:
+    """Make calls through a policy, recording latency and outcome of each"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "failed": 0, "unavailable": 0}
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await policy.ainvoke(lambda: model.ainvoke(PROMPT))
+                outcomes["ok"] += 1
+            except LLMUnavailableError:
+                outcomes["unavailable"] += 1
+            except Exception:
+                outcomes["failed"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return {
+        "outcomes": outcomes,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+async def hedging(args: argparse.Namespace) -> Dict[str, Any]:
+    """Tail latency with and without hedged requests"""
+    report = {}
+    for hedge in (False, True):
+        model = fake_model(args)
+        policy = fresh_policy("extraction", hedge=hedge, timeout_seconds=60)
+
+        # Fill the latency window so the hedge delay is known
+        await run_calls(policy, model, settings.LLM_HEDGE_MIN_SAMPLES, args.concurrency)
+        model.calls = 0
+
+        summary = await run_calls(policy, model, args.calls, args.concurrency)
+        summary["model_calls"] = model.calls
+        report["hedged" if hedge else "plain"] = summary
+    return report
+
+
+async def circuit_breaking(args: argparse.Namespace) -> Dict[str, Any]:
+    """Calls reaching a failing model once the breaker opens"""
+    report = {}
+    for label, breaker in (
+        ("no_breaker", CircuitBreaker("benchmark-off", failure_rate=2.0)),
+        ("breaker", CircuitBreaker("benchmark-on")),
+    ):
+        model = fake_model(args, error_rate=args.error_rate)
+        policy = fresh_policy("fortune", breaker=breaker)
+        summary = await run_calls(policy, model, args.calls, args.concurrency)
+        summary["model_calls"] = model.calls
+        summary["breaker_state"] = breaker.state
+        report[label] = summary
+    return report
+
+
+async def fallbacks(args: argparse.Namespace) -> Dict[str, Any]:
+    """What each agent answers when its model is down or too slow"""
+    down = fake_model(args, error_rate=1.0)
+    slow = fake_model(args, latency=LatencyModel(5000, "constant"))
+    broken = CircuitBreaker("benchmark-down", min_calls=1)
+    broken.record_failure()
+
+    profile = UserProfile(name="Somchai", date_of_birth="12 March 1990")
+    context = FortuneContext(
+        user_profile=profile, latest_message="love", categories=["love"]
+    )
+    product = Product(
+        item_name_thai="สร้อยข้อมือหยก",
+        item_name_english_approximation="Jade bracelet",
+        inferred_color_association_primary="green",
+    )
+
+    extractor = LLMMessageExtractor(
+        down, policy=fresh_policy("extraction", breaker=broken)
+    )
+    fortune = MysticaFortuneGenerator(
+        down, policy=fresh_policy("fortune", breaker=broken)
+    )
+    recommender = MysticaProductRecommender(
+        down, policy=fresh_policy("reasons", breaker=broken)
+    )
+    slow_fortune = MysticaFortuneGenerator(slow, policy=fresh_policy("fortune"))
+
+    start = time.perf_counter()
+    with deadline(0.5):
+        slow_text, _ = await slow_fortune.agenerate(context)
+    deadline_ms = (time.perf_counter() - start) * 1000
+
+    extracted = await extractor.aextract("My name is Nok", profile)
+    fortune_text, colors = await fortune.agenerate(context)
+    streamed = "".join([chunk async for chunk in fortune.agenerate_stream(context)])
+    reasons = await recommender.arecommend(["Green"], [product])
+
+    return {
+        "extraction_kept_profile": extracted == profile,
+        "fortune_fallback": fortune_text == settings.FORTUNE_FALLBACK and not colors,
+        "stream_fallback": streamed == settings.FORTUNE_FALLBACK,
+        "default_reason": [reason for _, reason in reasons] == [DEFAULT_REASON],
+        "deadline_fallback": slow_text == settings.FORTUNE_FALLBACK,
+        "deadline_elapsed_ms": deadline_ms,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run all scenarios"""
+    return {
+        "hedging": await hedging(args),
+        "circuit_breaking": await circuit_breaking(args),
+        "fallbacks": await fallbacks(args),
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--sigma", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+
+    print(f"{'hedging':<12} {'p50':>8} {'p95':>8} {'p99':>8} {'model calls':>12}")
+    for label, summary in report["hedging"].items():
+        print(
+            f"{label:<12} {summary['p50_ms']:6.0f}ms {summary['p95_ms']:6.0f}ms "
+            f"{summary['p99_ms']:6.0f}ms {summary['model_calls']:>12}"
+        )
+
+    print(f"\n{'circuit':<12} {'model calls':>12} {'fast fails':>11} {'mean':>8}")
+    for label, summary in report["circuit_breaking"].items():
+        print(
+            f"{label:<12} {summary['model_calls']:>12} "
+            f"{summary['outcomes']['unavailable']:>11} {summary['mean_ms']:6.0f}ms"
+        )
+
+    print("\nfallbacks")
+    for key, value in report["fallbacks"].items():
+        print(f"  {key}: {value if isinstance(value, bool) else f'{value:.0f}'}")
+
+
+if __name__ == "__main__":
+    main()
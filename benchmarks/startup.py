@@ -0,0 +1,139 @@
+"""
+Benchmark of cold start and per-rerun wiring cost of the app
+
+Each run starts a fresh interpreter (in a scratch directory, so caches
+start empty) that imports the app, builds the process-wide registry and
+then rebuilds the session-bound container the way every Streamlit rerun
+does. Reruns are timed twice: against the shared registry, and against a
+registry that keeps only what used to be cached across reruns (LLM
+clients, caches and stores) and so rebuilds every agent and the workflow.
+
+Usage:
+    python -m benchmarks.startup [--runs N] [--reruns N]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# Modules the app should only import once they are needed
+HEAVY_MODULES = ["langchain_openai", "openai", "PIL", "altair", "pyarrow"]
+
+# Registry entries that were st.cache_resource'd before the registry existed
+PREVIOUSLY_CACHED = [
+    "llms",
+    "llm_caches",
+    "reasons_store",
+    "reason_batcher",
+    "handprint_cache",
+    "blob_store",
+    "session_store",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(reruns: int) -> Dict[str, Any]:
+    """Time import, first build and reruns in this (fresh) process"""
+    start = time.perf_counter()
+    importlib.import_module("main")
+    import_seconds = time.perf_counter() - start
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    from data.session_store import MemorySessionStore
+    from ui.state import StateManager
+    from utils.dependencies import AgentRegistry, DIContainer, get_registry
+
+    def rerun(registry: AgentRegistry):
+        state_manager = StateManager(MemorySessionStore(), "benchmark", {})
+        container = DIContainer(state_manager, registry)
+        container.get_workflow()
+        container.get_chat_interface()
+        container.get_control_panel()
+
+    registry = get_registry()
+    start = time.perf_counter()
+    rerun(registry)
+    first_build_seconds = time.perf_counter() - start
+
+    def rerun_rebuilding():
+        legacy = AgentRegistry()
+        for name in PREVIOUSLY_CACHED:
+            if name in registry._instances:
+                legacy._instances[name] = registry._instances[name]
+        rerun(legacy)
+
+    timings = {}
+    for label, run in (
+        ("shared", lambda: rerun(registry)),
+        ("rebuilt", rerun_rebuilding),
+    ):
+        samples = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+        timings[label] = statistics.median(samples)
+
+    return {
+        "import_ms": import_seconds * 1000,
+        "heavy_modules_at_import": loaded,
+        "first_build_ms": first_build_seconds * 1000,
+        "rerun_shared_ms": timings["shared"] * 1000,
+        "rerun_rebuilt_ms": timings["rebuilt"] * 1000,
+    }
+
+
+def run_child(reruns: int) -> Dict[str, Any]:
+    """Measure in a fresh interpreter with empty caches"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # Building the OpenAI clients needs a key, though no request is made
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    with tempfile.TemporaryDirectory() as directory:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child", str(reruns)],
+            cwd=directory,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child)))
+        return
+
+    runs: List[Dict[str, Any]] = [run_child(args.reruns) for _ in range(args.runs)]
+
+    def median(key: str) -> float:
+        return statistics.median(run[key] for run in runs)
+
+    print(f"import main          {median('import_ms'):8.1f} ms")
+    print(f"first build          {median('first_build_ms'):8.1f} ms")
+    print(f"rerun, shared        {median('rerun_shared_ms'):8.3f} ms")
+    print(f"rerun, rebuilt       {median('rerun_rebuilt_ms'):8.3f} ms")
+    print(
+        "heavy modules at import: "
+        + (", ".join(runs[0]["heavy_modules_at_import"]) or "none")
+    )
+
+
+if __name__ == "__main__":
+    main()
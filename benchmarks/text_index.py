@@ -0,0 +1,167 @@
+"""
+Benchmark of the product text index at large catalog sizes
+
+For each catalog size, builds the character n-gram BM25 index of a
+synthetic catalog with mixed Thai and English product text, memory-maps
+it, and times queries made of a fortune and the seeker's focus: scoring
+on every query n-gram, scoring on the --max-terms rarest
+(with the recall of the exhaustive top k), top-k search, and ranking with
+the text relevance.
+
+Usage:
+    python -m benchmarks.text_index [--sizes N,N,...] [--queries N]
+"""
+
+import argparse
+import dataclasses
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List, Set
+
+import numpy as np
+
+from benchmarks.load_test import FORTUNE_TEXT, percentile
+from benchmarks.ranking import fortune_mentions, promoted_products
+from core.models import Product
+from data.catalog import CatalogSnapshot
+from data.text_index import TextIndex, build_text_index
+from settings import settings
+
+ENGLISH_WORDS = (
+    "milk soy chocolate malt coffee tea green jasmine rice snack chips seaweed "
+    "honey lemon ginger vitamin gold formula organic sugar free original "
+    "strawberry banana mango coconut oat almond protein energy drink juice "
+    "orange grape cocoa vanilla caramel cream cheese butter yogurt noodle "
+    "spicy sweet salty crispy family pack value premium classic fresh"
+).split()
+THAI_WORDS = (
+    "นม ถั่วเหลือง ช็อกโกแลต กาแฟ ชา เขียว ข้าว ขนม สาหร่าย น้ำผึ้ง มะนาว ขิง "
+    "วิตามิน ทอง ออร์แกนิก หวาน น้อย สตรอว์เบอร์รี่ กล้วย มะม่วง มะพร้าว "
+    "ข้าวโอ๊ต อัลมอนด์ โปรตีน พลังงาน เครื่องดื่ม น้ำผลไม้ ส้ม องุ่น โกโก้ "
+    "ครีม ชีส เนย โยเกิร์ต บะหมี่ เผ็ด เค็ม กรอบ ครอบครัว แพ็ค พรีเมียม สด"
+).split()
+QUERY_FOCUS = [["love"], ["wealth"], ["work"], ["love", "wealth", "work"]]
+
+
+def worded_products(count: int, seed: int = 0) -> List[Product]:
+    """Synthetic catalog with varied Thai and English names and attributes"""
+    rng = random.Random(seed)
+    return [
+        dataclasses.replace(
+            product,
+            item_name_thai=" ".join(rng.sample(THAI_WORDS, rng.randint(2, 4))),
+            item_name_english_approximation=" ".join(
+                rng.sample(ENGLISH_WORDS, rng.randint(2, 4))
+            ).title(),
+            textual_attributes_for_recommendation=[
+                rng.choice(ENGLISH_WORDS),
+                "".join(rng.sample(THAI_WORDS, 2)),
+            ],
+        )
+        for product in promoted_products(count, seed)
+    ]
+
+
+def fortune_query(rng: random.Random) -> str:
+    """A fortune and the seeker's focus, as the workflow queries the index"""
+    focus = rng.choice(QUERY_FOCUS)
+    extra = " ".join(rng.sample(ENGLISH_WORDS, 3))
+    terms = [settings.TEXT_QUERY_FOCUS_TERMS[category] for category in focus]
+    return " ".join([FORTUNE_TEXT, extra, *terms])
+
+
+def top_positions(scores: np.ndarray, limit: int) -> Set[int]:
+    """Positions of the `limit` best scoring products that match at all"""
+    best = np.argsort(-scores, kind="stable")[:limit]
+    return {int(position) for position in best if scores[position] > 0}
+
+
+def time_queries(run: Callable[[int], object], count: int) -> Dict[str, float]:
+    """Latency of count calls, in microseconds"""
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        run(i)
+        samples.append(time.perf_counter() - start)
+    return {
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-terms", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed + 1)
+    queries = [fortune_query(rng) for _ in range(args.queries)]
+    mentions = [fortune_mentions(rng) for _ in range(args.queries)]
+    k, pruned = args.top_k, args.max_terms
+
+    print(
+        f"{'products':>9} {'build':>8} {'disk':>8} {'load':>8} "
+        f"{'all terms':>10} {'pruned':>8} {'p99':>8} {'recall':>7} "
+        f"{'search':>8} {'rank':>8} {'p99':>8}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        products = worded_products(size, args.seed)
+        catalog = CatalogSnapshot(products)
+        ranker = catalog.ranker()
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            build_text_index(products, directory)
+            build_seconds = time.perf_counter() - start
+            disk_mb = (
+                sum(
+                    os.path.getsize(os.path.join(directory, n))
+                    for n in os.listdir(directory)
+                )
+                / 1e6
+            )
+
+            start = time.perf_counter()
+            index = TextIndex(directory)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            # Touch the pages once, as a warm server would have
+            index.scores(queries[0])
+
+            exhaustive = time_queries(
+                lambda i: index.scores(queries[i], max_terms=0), args.queries
+            )
+            scoring = time_queries(
+                lambda i: index.scores(queries[i], pruned), args.queries
+            )
+            found = expected = 0
+            for query in queries:
+                truth = top_positions(index.scores(query, max_terms=0), k)
+                found += len(truth & top_positions(index.scores(query, pruned), k))
+                expected += len(truth)
+            search = time_queries(lambda i: index.search(queries[i], k), args.queries)
+            ranking = time_queries(
+                lambda i: ranker.rank(
+                    mentions[i], k, relevance=index.scores(queries[i])
+                ),
+                args.queries,
+            )
+
+        print(
+            f"{size:>9} {build_seconds:7.2f}s {disk_mb:6.1f}MB {load_ms:6.2f}ms "
+            f"{exhaustive['p50_us']:8.0f}us "
+            f"{scoring['p50_us']:6.0f}us {scoring['p99_us']:6.0f}us "
+            f"{found / max(expected, 1):7.1%} {search['p50_us']:6.0f}us "
+            f"{ranking['p50_us']:7.0f}us {ranking['p99_us']:6.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -32,3 +32,9 @@ class WorkflowError(MysticaException):
     """Error in workflow orchestration"""
 
     pass
+
+
+class LLMUnavailableError(MysticaException):
+    """LLM call skipped or abandoned: circuit open, timed out or out of time"""
+
+    pass
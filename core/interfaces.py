@@ -1,6 +1,16 @@
-from typing import List, Protocol, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    runtime_checkable,
+)
 
-from core.models import FortuneContext, Product, UserProfile
+from core.models import FortuneContext, FusedTurn, Product, UserProfile
 
 
 class MessageExtractor(Protocol):
@@ -19,6 +29,14 @@ class FortuneGenerator(Protocol):
         ...
 
 
+class FusedTurnGenerator(Protocol):
+    """Interface for extracting profile updates and replying in one call"""
+
+    def generate(self, context: FortuneContext) -> FusedTurn:
+        """Generate the reply and the profile merged with what the message adds"""
+        ...
+
+
 class HandprintAnalyzer(Protocol):
     """Interface for analyzing handprint images"""
 
@@ -27,11 +45,94 @@ class HandprintAnalyzer(Protocol):
         ...
 
 
+@runtime_checkable
+class ProductCatalog(Protocol):
+    """Interface for indexed product catalogs"""
+
+    def find_by_colors(self, colors: Iterable[str], limit: int) -> Sequence[Product]:
+        """Return the first products in catalog order matching any of the colors"""
+        ...
+
+    def get(self, product_id: str) -> Optional[Product]:
+        """Get a product by id"""
+        ...
+
+    def ranker(self) -> Any:
+        """Vectorized scorer of the catalog (a data.ranking.CatalogRanker)"""
+        ...
+
+
 class ProductRecommender(Protocol):
     """Interface for recommending products"""
 
     def recommend(
-        self, colors: List[str], products: List[Product]
+        self, colors: List[str], products: List[Product], query: Optional[str] = None
     ) -> List[Tuple[Product, str]]:
         """Recommend products based on colors and return list of (product, reason) tuples"""
         ...
+
+
+class AsyncMessageExtractor(Protocol):
+    """Async interface for extracting information from messages"""
+
+    async def aextract(self, message: str, current_profile: UserProfile) -> UserProfile:
+        """Extract user information from message"""
+        ...
+
+
+class AsyncFortuneGenerator(Protocol):
+    """Async interface for generating fortunes"""
+
+    async def agenerate(self, context: FortuneContext) -> Tuple[str, List[str]]:
+        """Generate fortune and return (fortune_text, color_associations)"""
+        ...
+
+
+class AsyncFusedTurnGenerator(Protocol):
+    """Async interface for extracting profile updates and replying in one call"""
+
+    async def agenerate(self, context: FortuneContext) -> FusedTurn:
+        """Generate the reply and the profile merged with what the message adds"""
+        ...
+
+
+class AsyncHandprintAnalyzer(Protocol):
+    """Async interface for analyzing handprint images"""
+
+    async def aanalyze(self, image_base64: str) -> str:
+        """Analyze handprint image and return analysis text"""
+        ...
+
+
+class AsyncProductRecommender(Protocol):
+    """Async interface for recommending products"""
+
+    async def arecommend(
+        self, colors: List[str], products: List[Product], query: Optional[str] = None
+    ) -> List[Tuple[Product, str]]:
+        """Recommend products based on colors and return list of (product, reason) tuples"""
+        ...
+
+
+class SessionStore(Protocol):
+    """Interface for per-session key/value state shared by app workers"""
+
+    def get(self, session_id: str, key: str, default: Any = None) -> Any:
+        """Get a session value"""
+        ...
+
+    def set(self, session_id: str, key: str, value: Any):
+        """Set a session value"""
+        ...
+
+    def append(self, session_id: str, key: str, value: Any):
+        """Append a value to a session list, read back whole with get"""
+        ...
+
+    def items(self, session_id: str) -> Dict[str, Any]:
+        """Get every value of a session"""
+        ...
+
+    def delete(self, session_id: str):
+        """Forget a session"""
+        ...
@@ -1,3 +1,4 @@
+import base64
 from dataclasses import dataclass, field
 from typing import List, Optional
 
@@ -14,6 +15,7 @@ class Product:
     quantity_size_thai: Optional[str] = None
     textual_attributes_for_recommendation: List[str] = field(default_factory=list)
     inferred_color_association_primary: str = ""
+    product_id: str = ""
 
 
 @dataclass
@@ -23,7 +25,22 @@ class UserProfile:
     name: Optional[str] = None
     date_of_birth: Optional[str] = None
     handprint_analysis: Optional[str] = None
-    handprint_image_base64: Optional[str] = None
+    handprint_image_ref: Optional[str] = None
+
+
+# Kinds of chat records, decided once when a message is stored
+MESSAGE_KIND_USER = "user"
+MESSAGE_KIND_ASSISTANT = "assistant"
+MESSAGE_KIND_RECOMMENDATION = "recommendation"
+
+
+@dataclass(frozen=True)
+class ChatRecord:
+    """Chat message as kept in session state"""
+
+    id: int
+    kind: str
+    content: str
 
 
 @dataclass
@@ -33,3 +50,31 @@ class FortuneContext:
     user_profile: UserProfile
     latest_message: str
     color_associations: List[str] = field(default_factory=list)
+    # Chosen divination categories; [] invites a choice, None leaves it to the LLM
+    categories: Optional[List[str]] = None
+
+
+@dataclass
+class FusedTurn:
+    """Profile update and reply produced by a single structured LLM call"""
+
+    profile: UserProfile
+    text: str
+    colors: List[str] = field(default_factory=list)
+
+
+@dataclass
+class HandprintImage:
+    """Preprocessed handprint image ready for the vision model"""
+
+    data: bytes
+    detail: str = "high"
+    width: int = 0
+    height: int = 0
+    content_hash: str = ""
+    perceptual_hash: Optional[int] = None
+
+    @property
+    def base64(self) -> str:
+        """Base64 encoded JPEG payload"""
+        return base64.b64encode(self.data).decode()
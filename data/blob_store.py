@@ -0,0 +1,284 @@
+"""
+Content-addressed storage for large binary payloads such as handprint images
+
+Session state keeps only the SHA-256 reference of a blob. Sessions pin the
+blobs they use with a BlobLease; blobs nobody has leased for a grace period
+are evicted by collect(). A store only collects blobs it put itself; on a
+directory shared by several workers, LocalDiskBlobStore also keeps blobs
+that another worker leases or has used within the grace period.
+"""
+
+import hashlib
+import os
+import socket
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from settings import settings
+
+
+def blob_ref(data: bytes) -> str:
+    """Content address of a blob"""
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class BlobStats:
+    """Size and reference counters of a blob store"""
+
+    blobs: int = 0
+    size_bytes: int = 0
+    leased: int = 0
+    evicted: int = 0
+
+
+class BlobLease:
+    """Keeps a blob alive for as long as the lease object is referenced"""
+
+    __slots__ = ("ref", "_finalizer", "__weakref__")
+
+    def __init__(self, store: "BlobStore", ref: str):
+        self.ref = ref
+        store.acquire(ref)
+        # Released when the holder (e.g. an expired session) drops the lease
+        self._finalizer = weakref.finalize(self, store.release, ref)
+
+    def release(self):
+        """Release the blob now rather than when the lease is garbage collected"""
+        self._finalizer()
+
+
+class BlobStore(ABC):
+    """Reference-counted content-addressed blob store"""
+
+    def __init__(
+        self,
+        max_bytes: int = settings.BLOB_STORE_MAX_BYTES,
+        grace_seconds: int = settings.BLOB_STORE_GRACE_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._refcounts: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._evicted = 0
+        self._last_collect = time.time()
+        self._lock = threading.RLock()
+
+    def put(self, data: bytes) -> str:
+        """Store a blob (deduplicated by content) and return its reference"""
+        ref = blob_ref(data)
+        with self._lock:
+            if ref not in self._sizes:
+                self._write(ref, data)
+                self._sizes[ref] = len(data)
+            now = time.time()
+            self._last_used[ref] = now
+
+            over_budget = sum(self._sizes.values()) > self.max_bytes
+            if over_budget or now - self._last_collect > self.grace_seconds:
+                self.collect()
+        return ref
+
+    def get(self, ref: str) -> Optional[bytes]:
+        """Get a blob by reference, or None if it was evicted"""
+        with self._lock:
+            if ref in self._sizes:
+                self._last_used[ref] = time.time()
+        return self._read(ref)
+
+    def lease(self, ref: str) -> BlobLease:
+        """Pin a blob until the returned lease is released or dropped"""
+        return BlobLease(self, ref)
+
+    def acquire(self, ref: str):
+        """Add a reference to a blob"""
+        with self._lock:
+            count = self._refcounts.get(ref, 0) + 1
+            self._refcounts[ref] = count
+            self._last_used[ref] = time.time()
+            if count == 1:
+                self._pin(ref)
+
+    def release(self, ref: str):
+        """Drop a reference to a blob"""
+        with self._lock:
+            count = self._refcounts.get(ref, 0) - 1
+            if count > 0:
+                self._refcounts[ref] = count
+            elif self._refcounts.pop(ref, None) is not None:
+                self._unpin(ref)
+            self._last_used[ref] = time.time()
+
+    def collect(self) -> int:
+        """Evict blobs put here, unreferenced and not used within the grace period"""
+        with self._lock:
+            self._last_collect = time.time()
+            cutoff = self._last_collect - self.grace_seconds
+            unreferenced = [
+                ref
+                for ref in self._sizes
+                if ref not in self._refcounts and self._last_used.get(ref, 0.0) < cutoff
+            ]
+            in_use = (
+                self._used_elsewhere(unreferenced, cutoff) if unreferenced else set()
+            )
+            unreferenced = [ref for ref in unreferenced if ref not in in_use]
+            for ref in unreferenced:
+                self._delete(ref)
+                del self._sizes[ref]
+                self._last_used.pop(ref, None)
+            self._evicted += len(unreferenced)
+        return len(unreferenced)
+
+    @property
+    def stats(self) -> BlobStats:
+        """Current size and reference counters"""
+        with self._lock:
+            return BlobStats(
+                blobs=len(self._sizes),
+                size_bytes=sum(self._sizes.values()),
+                leased=len(self._refcounts),
+                evicted=self._evicted,
+            )
+
+    @abstractmethod
+    def _write(self, ref: str, data: bytes):
+        """Persist a new blob"""
+
+    @abstractmethod
+    def _read(self, ref: str) -> Optional[bytes]:
+        """Load a blob"""
+
+    @abstractmethod
+    def _delete(self, ref: str):
+        """Remove a blob"""
+
+    def _pin(self, ref: str):
+        """Record outside the process that this store leases a blob"""
+
+    def _unpin(self, ref: str):
+        """Drop the record of this store's lease on a blob"""
+
+    def _used_elsewhere(self, refs: List[str], cutoff: float) -> Set[str]:
+        """Blobs among refs that another process leases or used after cutoff"""
+        return set()
+
+
+class MemoryBlobStore(BlobStore):
+    """Blob store holding raw bytes in process memory"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._blobs: Dict[str, bytes] = {}
+
+    def _write(self, ref: str, data: bytes):
+        self._blobs[ref] = data
+
+    def _read(self, ref: str) -> Optional[bytes]:
+        return self._blobs.get(ref)
+
+    def _delete(self, ref: str):
+        self._blobs.pop(ref, None)
+
+
+class LocalDiskBlobStore(BlobStore):
+    """
+    Blob store writing one file per blob under a local directory
+
+    Workers may share the directory. Each worker marks the blobs its
+    sessions lease with an empty file under leases/, and touches a blob's
+    file whenever it puts or reads it; a worker deletes a blob only when no
+    marker of another worker exists and the file is older than the grace
+    period. Markers of a worker that crashed keep their blobs until removed.
+    """
+
+    LEASES_DIR = "leases"
+
+    def __init__(self, path: str = settings.BLOB_STORE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        os.makedirs(os.path.join(path, self.LEASES_DIR), exist_ok=True)
+
+    def _file(self, ref: str) -> str:
+        return os.path.join(self.path, ref[:2], ref)
+
+    def _lease_file(self, ref: str) -> str:
+        # Computed per call: forked workers get their own markers
+        owner = f"{socket.gethostname()}-{os.getpid()}"
+        return os.path.join(self.path, self.LEASES_DIR, f"{ref}.{owner}")
+
+    def _write(self, ref: str, data: bytes):
+        file_path = self._file(ref)
+        if os.path.exists(file_path):
+            # Another worker wrote it; mark it as recently used
+            self._touch(file_path)
+            return
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Write atomically so concurrent readers never see a partial blob
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+    def _read(self, ref: str) -> Optional[bytes]:
+        file_path = self._file(ref)
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch(file_path)
+        return data
+
+    def _delete(self, ref: str):
+        try:
+            os.remove(self._file(ref))
+        except FileNotFoundError:
+            pass
+
+    def _pin(self, ref: str):
+        with open(self._lease_file(ref), "wb"):
+            pass
+
+    def _unpin(self, ref: str):
+        try:
+            os.remove(self._lease_file(ref))
+        except FileNotFoundError:
+            pass
+
+    def _used_elsewhere(self, refs: List[str], cutoff: float) -> Set[str]:
+        leased = {
+            name.split(".", 1)[0]
+            for name in os.listdir(os.path.join(self.path, self.LEASES_DIR))
+        }
+        in_use = set()
+        for ref in refs:
+            if ref in leased:
+                in_use.add(ref)
+                continue
+            try:
+                if os.path.getmtime(self._file(ref)) >= cutoff:
+                    in_use.add(ref)
+            except FileNotFoundError:
+                pass
+        return in_use
+
+    def _touch(self, file_path: str):
+        """Set a blob file's modification time to now"""
+        try:
+            os.utime(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def create_blob_store(backend: str = settings.BLOB_STORE_BACKEND) -> BlobStore:
+    """Create the configured blob store"""
+    if backend == "disk":
+        return LocalDiskBlobStore()
+    return MemoryBlobStore()
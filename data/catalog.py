@@ -0,0 +1,207 @@
+"""
+Immutable, indexed product catalog snapshots for Mystica Oracle
+"""
+
+import csv
+import json
+import os
+import threading
+from dataclasses import fields
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    overload,
+)
+
+from core.interfaces import ProductCatalog
+from core.models import Product
+
+if TYPE_CHECKING:
+    from data.ranking import CatalogRanker
+
+# Separator for list-valued columns in CSV catalogs
+CSV_LIST_SEPARATOR = "|"
+
+_PRODUCT_FIELDS = {f.name for f in fields(Product)}
+_FLOAT_FIELDS = {"price_baht", "original_price_baht"}
+
+
+class CatalogSnapshot(Sequence[Product]):
+    """
+    Read-only product catalog, indexed by product id and by color
+
+    Its CatalogRanker, built once on first use and shared by every session,
+    ranks recommendations and holds the color inverted index: products
+    grouped by color, so color lookups touch only the products of the
+    requested colors rather than the whole catalog.
+    """
+
+    def __init__(self, products: Iterable[Product]):
+        self._products: Tuple[Product, ...] = tuple(products)
+        self._positions: Dict[str, int] = {
+            p.product_id: i for i, p in enumerate(self._products) if p.product_id
+        }
+        self._ranker: Optional["CatalogRanker"] = None
+        self._ranker_lock = threading.Lock()
+
+    @overload
+    def __getitem__(self, index: int) -> Product: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Product]: ...
+
+    def __getitem__(self, index):
+        return self._products[index]
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def get(self, product_id: str) -> Optional[Product]:
+        """Get a product by id"""
+        position = self._positions.get(product_id)
+        return None if position is None else self._products[position]
+
+    def colors(self) -> List[str]:
+        """All normalized colors present in the catalog"""
+        return self.ranker().colors()
+
+    def product_ids_for_color(self, color: str) -> List[str]:
+        """Ids of the products associated with a normalized color"""
+        return [
+            self._products[row].product_id
+            for row in self.ranker().rows_for_colors([color])
+        ]
+
+    def find_by_colors(self, colors: Iterable[str], limit: int) -> List[Product]:
+        """First products in catalog order whose color is one of colors"""
+        return [
+            self._products[row] for row in self.ranker().rows_for_colors(colors, limit)
+        ]
+
+    def ranker(self) -> "CatalogRanker":
+        """Vectorized scorer of the catalog, built on first use"""
+        with self._ranker_lock:
+            if self._ranker is None:
+                from data.ranking import CatalogRanker
+
+                # Rank on the colors as tagged: "Emerald" is nearer some
+                # fortune colors than "Green"
+                self._ranker = CatalogRanker.from_products(
+                    self._products,
+                    [p.inferred_color_association_primary for p in self._products],
+                )
+        return self._ranker
+
+
+def product_from_record(record: Dict) -> Product:
+    """Build a Product from a catalog record, ignoring unknown columns"""
+    values = {k: v for k, v in record.items() if k in _PRODUCT_FIELDS}
+
+    for name in _FLOAT_FIELDS:
+        if values.get(name) in ("", None):
+            values[name] = None
+        else:
+            values[name] = float(values[name])
+
+    attributes = values.get("textual_attributes_for_recommendation")
+    if isinstance(attributes, str):
+        values["textual_attributes_for_recommendation"] = [
+            a for a in attributes.split(CSV_LIST_SEPARATOR) if a
+        ]
+    elif attributes is None:
+        values["textual_attributes_for_recommendation"] = []
+    else:
+        values["textual_attributes_for_recommendation"] = list(attributes)
+
+    for name in ("promotion_details_thai", "quantity_size_thai"):
+        if values.get(name) == "":
+            values[name] = None
+
+    values["product_id"] = str(values.get("product_id") or "")
+    return Product(**values)
+
+
+def read_catalog_records(path: str) -> List[Dict]:
+    """Read raw catalog records from a JSON, CSV or Parquet file"""
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    if extension == ".csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            return list(csv.DictReader(f))
+
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path).to_pylist()
+
+    raise ValueError(f"Unsupported catalog format: {path}")
+
+
+def write_catalog_records(records: List[Dict], path: str):
+    """Write raw catalog records to a JSON, CSV or Parquet file, atomically"""
+    extension = os.path.splitext(path)[1].lower()
+    tmp_path = f"{path}.tmp"
+
+    if extension == ".json":
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    elif extension == ".csv":
+        columns = list(dict.fromkeys(name for r in records for name in r))
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(
+                    {
+                        name: CSV_LIST_SEPARATOR.join(value)
+                        if isinstance(value, list)
+                        else value
+                        for name, value in record.items()
+                    }
+                )
+    elif extension == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(records), tmp_path)
+    else:
+        raise ValueError(f"Unsupported catalog format: {path}")
+
+    os.replace(tmp_path, path)
+
+
+def load_catalog(path: str) -> ProductCatalog:
+    """Load a catalog file; Arrow IPC files are memory-mapped, others indexed in memory"""
+    if os.path.splitext(path)[1].lower() == ".arrow":
+        from data.columnar_catalog import ColumnarCatalog
+
+        return ColumnarCatalog(path)
+
+    return CatalogSnapshot(product_from_record(r) for r in read_catalog_records(path))
+
+
+_snapshots: Dict[str, ProductCatalog] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_catalog_snapshot(path: str) -> ProductCatalog:
+    """Get the process-wide snapshot of a catalog file, loading it on first use"""
+    key = os.path.abspath(path)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(key)
+            if snapshot is None:
+                snapshot = load_catalog(path)
+                _snapshots[key] = snapshot
+    return snapshot
@@ -0,0 +1,166 @@
+"""
+Memory-mapped columnar product catalog for Mystica Oracle
+
+The catalog is stored as a single-batch Arrow IPC file. Opening it maps the
+file into memory instead of reading it, so every worker process shares the
+same physical pages and only the rows that are actually recommended are
+turned into Python objects, as lightweight ProductView rows.
+"""
+
+import threading
+from dataclasses import fields
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from core.models import Product
+from data.ranking import CatalogRanker, promotion_scores
+
+PRODUCT_FIELDS = [f.name for f in fields(Product)]
+
+SCHEMA = pa.schema(
+    [
+        ("product_id", pa.string()),
+        ("item_name_thai", pa.string()),
+        ("item_name_english_approximation", pa.string()),
+        ("price_baht", pa.float64()),
+        ("original_price_baht", pa.float64()),
+        ("promotion_details_thai", pa.string()),
+        ("quantity_size_thai", pa.string()),
+        ("textual_attributes_for_recommendation", pa.list_(pa.string())),
+        ("inferred_color_association_primary", pa.string()),
+    ]
+)
+
+
+class ProductView:
+    """Read-only view of one catalog row, with the same attributes as Product"""
+
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog: "ColumnarCatalog", row: int):
+        self._catalog = catalog
+        self._row = row
+
+    def to_product(self) -> Product:
+        """Copy the row into a regular Product"""
+        return Product(**{name: getattr(self, name) for name in PRODUCT_FIELDS})
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ProductView):
+            return self._catalog is other._catalog and self._row == other._row
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._catalog), self._row))
+
+    def __repr__(self) -> str:
+        return f"ProductView({self.product_id!r}, {self.item_name_thai!r})"
+
+
+def _column_property(name: str) -> property:
+    """Attribute that reads one column of the viewed row"""
+
+    def getter(view: ProductView):
+        return view._catalog.value(name, view._row)
+
+    return property(getter)
+
+
+for _name in PRODUCT_FIELDS:
+    setattr(ProductView, _name, _column_property(_name))
+
+
+class ColumnarCatalog(Sequence[ProductView]):
+    """
+    Product catalog backed by a memory-mapped Arrow IPC file
+
+    Neither loading nor building the ranker allocates per-product Python
+    objects; color lookups slice the ranker's rows grouped by color.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # The mapping stays open for the catalog's lifetime; columns point into it
+        self._source = pa.memory_map(path)
+        table = pa.ipc.open_file(self._source).read_all()
+
+        # A single-batch file gives single-chunk columns that are zero-copy views
+        self._columns: Dict[str, pa.Array] = {
+            name: column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+            for name, column in zip(table.column_names, table.columns)
+        }
+        self._length = table.num_rows
+        self._ranker: Optional[CatalogRanker] = None
+        self._ranker_lock = threading.Lock()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ProductView(self, row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("catalog index out of range")
+        return ProductView(self, index)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def value(self, name: str, row: int):
+        """Python value of one cell"""
+        return self._columns[name][row].as_py()
+
+    def get(self, product_id: str) -> Optional[ProductView]:
+        """Get a product by id"""
+        row = pc.index(self._columns["product_id"], product_id).as_py()
+        return None if row < 0 else ProductView(self, row)
+
+    def colors(self) -> List[str]:
+        """All normalized colors present in the catalog"""
+        return self.ranker().colors()
+
+    def product_ids_for_color(self, color: str) -> List[str]:
+        """Ids of the products associated with a normalized color"""
+        rows = self.ranker().rows_for_colors([color])
+        return self._columns["product_id"].take(rows).to_pylist()
+
+    def find_by_colors(self, colors: Iterable[str], limit: int) -> List[ProductView]:
+        """First products in catalog order whose color is one of colors"""
+        rows = self.ranker().rows_for_colors(colors, limit)
+        return [ProductView(self, int(row)) for row in rows]
+
+    def ranker(self) -> CatalogRanker:
+        """Vectorized scorer of the catalog, built on first use"""
+        with self._ranker_lock:
+            if self._ranker is None:
+                color = self._columns[
+                    "inferred_color_association_primary"
+                ].dictionary_encode()
+                prices = self._columns["price_baht"].to_numpy(zero_copy_only=False)
+                promotion = promotion_scores(
+                    prices,
+                    self._columns["original_price_baht"].to_numpy(zero_copy_only=False),
+                    self._columns["promotion_details_thai"].to_pylist(),
+                )
+                self._ranker = CatalogRanker(
+                    color.indices.to_numpy(),
+                    color.dictionary.to_pylist(),
+                    prices,
+                    promotion,
+                )
+        return self._ranker
+
+
+def write_columnar_catalog(products: Iterable[Product], path: str):
+    """Write products to an Arrow IPC file readable by ColumnarCatalog"""
+    products = list(products)
+    arrays = [
+        pa.array([getattr(product, field.name) for product in products], field.type)
+        for field in SCHEMA
+    ]
+    table = pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table)
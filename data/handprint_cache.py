@@ -0,0 +1,153 @@
+"""
+Cross-session cache of handprint analyses for Mystica Oracle
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from settings import settings
+
+
+def hamming_distances(hashes: np.ndarray, target: int) -> np.ndarray:
+    """Bit distance between every 64-bit hash in an array and a target hash"""
+    xor = np.bitwise_xor(hashes, np.uint64(target))
+    return np.bitwise_count(xor)
+
+
+class HandprintAnalysisCache:
+    """
+    SQLite-backed cache of handprint analyses shared by every session
+
+    Entries are keyed by the SHA-256 of the uploaded bytes. A 64-bit
+    perceptual hash lets re-encoded, resized or re-photographed copies of
+    the same palm reuse an analysis when within max_distance bits.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.HANDPRINT_CACHE_PATH,
+        max_distance: int = settings.HANDPRINT_CACHE_MAX_DISTANCE,
+        max_entries: int = settings.HANDPRINT_CACHE_MAX_ENTRIES,
+    ):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS handprint_analyses ("
+            "content_hash TEXT PRIMARY KEY, perceptual_hash TEXT NOT NULL, "
+            "analysis TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS handprint_analyses_created "
+            "ON handprint_analyses (created_at)"
+        )
+        self._conn.commit()
+
+        # Perceptual hashes are scanned in memory for near-duplicate lookups.
+        # Slots grow geometrically up to max_entries, then the oldest is reused.
+        self._content_hashes: List[str] = []
+        self._perceptual_hashes = np.empty(0, dtype=np.uint64)
+        self._slots: Dict[str, int] = {}
+        self._analyses: Dict[str, str] = {}
+        self._oldest = 0
+        self._load()
+
+    def get(
+        self, content_hash: str, perceptual_hash: Optional[int] = None
+    ) -> Optional[str]:
+        """Get the analysis for an identical or near-identical image"""
+        with self._lock:
+            analysis = self._analyses.get(content_hash)
+            if analysis is not None:
+                return analysis
+
+            # Another process may have analyzed this exact image
+            row = self._conn.execute(
+                "SELECT perceptual_hash, analysis FROM handprint_analyses "
+                "WHERE content_hash = ?",
+                (content_hash,),
+            ).fetchone()
+            if row is not None:
+                self._remember(content_hash, int(row[0], 16), row[1])
+                return row[1]
+
+            if perceptual_hash is None or not self._content_hashes:
+                return None
+
+            count = len(self._content_hashes)
+            distances = hamming_distances(
+                self._perceptual_hashes[:count], perceptual_hash
+            )
+            nearest = int(np.argmin(distances))
+            if distances[nearest] <= self.max_distance:
+                return self._analyses[self._content_hashes[nearest]]
+
+        return None
+
+    def put(self, content_hash: str, perceptual_hash: int, analysis: str):
+        """Store an analysis for an image"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO handprint_analyses VALUES (?, ?, ?, ?)",
+                (content_hash, f"{perceptual_hash:016x}", analysis, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM handprint_analyses WHERE content_hash IN ("
+                "SELECT content_hash FROM handprint_analyses "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self._remember(content_hash, perceptual_hash, analysis)
+
+    def _load(self):
+        """Load the most recent entries into memory"""
+        rows = self._conn.execute(
+            "SELECT content_hash, perceptual_hash, analysis FROM ("
+            "SELECT * FROM handprint_analyses ORDER BY created_at DESC LIMIT ?"
+            ") ORDER BY created_at",
+            (self.max_entries,),
+        ).fetchall()
+        for content_hash, perceptual_hash, analysis in rows:
+            self._remember(content_hash, int(perceptual_hash, 16), analysis)
+
+    def _remember(self, content_hash: str, perceptual_hash: int, analysis: str):
+        """Add or update an entry in the in-memory index"""
+        if self.max_entries < 1:
+            return
+
+        slot = self._slots.get(content_hash)
+        if slot is None:
+            count = len(self._content_hashes)
+            if count < self.max_entries:
+                if count == len(self._perceptual_hashes):
+                    grown = np.empty(
+                        min(max(2 * count, 16), self.max_entries), dtype=np.uint64
+                    )
+                    grown[:count] = self._perceptual_hashes
+                    self._perceptual_hashes = grown
+                slot = count
+                self._content_hashes.append(content_hash)
+            else:
+                # Over capacity: overwrite the oldest entry
+                slot = self._oldest
+                self._oldest = (slot + 1) % self.max_entries
+                evicted = self._content_hashes[slot]
+                del self._slots[evicted]
+                del self._analyses[evicted]
+                self._content_hashes[slot] = content_hash
+            self._slots[content_hash] = slot
+
+        self._perceptual_hashes[slot] = np.uint64(perceptual_hash)
+        self._analyses[content_hash] = analysis
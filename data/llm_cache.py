@@ -0,0 +1,293 @@
+"""
+LLM response caching for Mystica Oracle
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Protocol
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from settings import settings
+from utils.tracing import tracer
+
+_WHITESPACE = re.compile(r"(?:\\[nrt]|\s)+")
+
+# generation_info flag of generations served from the cache rather than a model
+CACHE_HIT_INFO = "llm_cache_hit"
+
+
+def make_cache_key(stage: str, prompt: str, llm_string: str) -> str:
+    """Build an exact-match key from the normalized prompt and model parameters"""
+    normalized_prompt = _WHITESPACE.sub(" ", prompt).strip()
+    digest = hashlib.sha256(
+        f"{normalized_prompt}\x00{llm_string}".encode("utf-8")
+    ).hexdigest()
+    return f"{stage}:{digest}"
+
+
+@dataclass
+class CacheEntry:
+    """Cached generations for one prompt, one list per sampled variant"""
+
+    variants: List[RETURN_VAL_TYPE] = field(default_factory=list)
+    created_at: float = 0.0
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a cache stage"""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CacheBackend(Protocol):
+    """Interface for LLM cache storage"""
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get an entry by key"""
+        ...
+
+    def set(self, key: str, entry: CacheEntry):
+        """Store an entry, evicting the least recently used entries if full"""
+        ...
+
+    def delete(self, key: str):
+        """Delete an entry"""
+        ...
+
+    def clear(self):
+        """Delete all entries"""
+        ...
+
+
+class MemoryCacheBackend:
+    """Size-bounded in-process LRU cache backend"""
+
+    def __init__(self, max_entries: int = settings.LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get an entry by key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        """Store an entry, evicting the least recently used entries if full"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        """Delete an entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Delete all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """Size-bounded SQLite cache backend shared by all processes on a host"""
+
+    def __init__(
+        self,
+        path: str = settings.LLM_CACHE_PATH,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get an entry by key"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+
+        return CacheEntry(variants=loads(row[0]), created_at=row[1])
+
+    def set(self, key: str, entry: CacheEntry):
+        """Store an entry, evicting the least recently used entries if full"""
+        value = dumps(entry.variants)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, value, entry.created_at, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        """Delete an entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        """Delete all entries"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Per-stage LangChain cache over a shared backend
+
+    With variants > 1 the first N calls for a prompt go to the model and
+    later calls sample one of the N cached responses, which suits stages
+    that run at temperature 1.0.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        stage: str,
+        ttl_seconds: Optional[float] = None,
+        variants: int = 1,
+    ):
+        self.backend = backend
+        self.stage = stage
+        self.ttl_seconds = ttl_seconds
+        self.variants = max(1, variants)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Look up cached generations for a prompt"""
+        key = make_cache_key(self.stage, prompt, llm_string)
+        entry = self.backend.get(key)
+
+        if entry is not None and self._is_expired(entry):
+            self.backend.delete(key)
+            entry = None
+
+        with self._lock:
+            hit = entry is not None and len(entry.variants) >= self.variants
+            if hit:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+
+        tracer.annotate(cache_hit=hit)
+        if not hit:
+            return None
+
+        # Copies, so the flag is not written back into a shared entry
+        return [
+            generation.model_copy(
+                update={
+                    "generation_info": {
+                        **(generation.generation_info or {}),
+                        CACHE_HIT_INFO: True,
+                    }
+                }
+            )
+            for generation in random.choice(entry.variants)
+        ]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        """Store generations for a prompt as another variant"""
+        key = make_cache_key(self.stage, prompt, llm_string)
+
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is None or self._is_expired(entry):
+                entry = CacheEntry(created_at=time.time())
+            if len(entry.variants) < self.variants:
+                entry.variants.append(return_val)
+            self.backend.set(key, entry)
+
+    def clear(self, **kwargs: Any):
+        """Clear the whole backend"""
+        self.backend.clear()
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        """Check whether an entry has outlived the stage TTL"""
+        if self.ttl_seconds is None:
+            return False
+        return time.time() - entry.created_at > self.ttl_seconds
+
+
+def create_cache_backend(
+    backend: str = settings.LLM_CACHE_BACKEND,
+) -> Optional[CacheBackend]:
+    """Create the configured cache backend, or None when caching is disabled"""
+    if backend == "memory":
+        return MemoryCacheBackend()
+    if backend == "sqlite":
+        return SQLiteCacheBackend()
+    return None
+
+
+def create_stage_caches(
+    backend: Optional[CacheBackend],
+    stages: Dict[str, Dict[str, Any]] = settings.LLM_CACHE_STAGES,
+) -> Dict[str, LLMResponseCache]:
+    """Create caches for the stages that opted in"""
+    if backend is None:
+        return {}
+
+    return {
+        stage: LLMResponseCache(
+            backend,
+            stage,
+            ttl_seconds=config.get("ttl_seconds"),
+            variants=config.get("variants", 1),
+        )
+        for stage, config in stages.items()
+        if config.get("enabled")
+    }
@@ -0,0 +1,274 @@
+"""
+Vectorized product ranking for Mystica Oracle
+
+CatalogRanker keeps what recommendation scoring needs from every product
+as NumPy arrays, built once per catalog: a color code, the price and a
+promotion score, and the perceptual similarity of every vocabulary color
+to every catalog color (utils/color_space.py). A query weighs the
+fortune's colors by how often and how early they were mentioned, spreads
+each weight over the catalog colors near it, takes the best products of
+each matched color with argpartition (by promotion and, if given, text
+match score), and picks the top k from those candidates with a penalty
+for repeating a color.
+
+The products grouped by color double as the catalog's color inverted
+index: rows_for_colors finds the products of normalized colors without
+touching the rest of the catalog.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from core.models import Product
+from settings import settings
+from utils.color_lexicon import color_lexicon
+from utils.color_space import color_space
+
+# A promotion stating no percentage counts as this fraction off
+PROMOTION_WITHOUT_DISCOUNT = 0.05
+
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+
+def color_weights(
+    mentions: Sequence[str], decay: float = settings.RANKING_POSITION_DECAY
+) -> Dict[str, float]:
+    """
+    Weight of each mentioned color, the heaviest scaled to 1
+
+    Args:
+        mentions: Canonical colors in order of mention, repeated per mention
+        decay: Factor applied per rank of a color's first mention
+
+    Returns:
+        Mention count times decay ** rank, per color
+    """
+    counts = Counter(mentions)
+    weights = {
+        color: counts[color] * decay**rank
+        for rank, color in enumerate(dict.fromkeys(mentions))
+    }
+    if not weights:
+        return {}
+    top = max(weights.values())
+    return {color: weight / top for color, weight in weights.items()}
+
+
+def promotion_scores(
+    prices: np.ndarray,
+    original_prices: np.ndarray,
+    promotions: Iterable[Optional[str]],
+) -> np.ndarray:
+    """Fraction off per product, from the prices or else the promotion text"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discount = (original_prices - prices) / original_prices
+    discount = np.nan_to_num(discount, nan=0.0, posinf=0.0, neginf=0.0)
+
+    stated = np.array([stated_discount(text) for text in promotions], dtype=np.float64)
+    return np.clip(np.maximum(discount, stated), 0.0, 1.0)
+
+
+def stated_discount(promotion: Optional[str]) -> float:
+    """Largest percentage off stated in a promotion text, as a fraction"""
+    if not promotion:
+        return 0.0
+    percents = [float(p) for p in _PERCENT.findall(promotion)]
+    return max(percents) / 100 if percents else PROMOTION_WITHOUT_DISCOUNT
+
+
+class CatalogRanker:
+    """
+    Scores and top-k selection over a whole catalog
+
+    A product's score is RANKING_COLOR_WEIGHT times the weight of its color
+    (the largest mention weight times similarity to a mentioned color),
+    plus RANKING_PROMOTION_WEIGHT times its promotion score, plus
+    RANKING_TEXT_WEIGHT times its text relevance if given. Ties go to the
+    product earlier in the catalog.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        colors: Sequence[str],
+        prices: np.ndarray,
+        promotion: np.ndarray,
+    ):
+        """
+        Args:
+            codes: Color code of every product
+            colors: Color of every code, free text such as "Emerald" or
+                "Brown (for chocolate variant)"
+            prices: Price of every product, NaN if unknown
+            promotion: Promotion score of every product, 0 to 1
+        """
+        # Codes of colors with the same color term ("Gold", "gold") are merged
+        terms = [color_space.term(color) for color in colors]
+        self._color_codes = {
+            term: code for code, term in enumerate(dict.fromkeys(terms))
+        }
+        merged = np.array([self._color_codes[term] for term in terms], dtype=np.int64)
+        codes = merged[np.asarray(codes, dtype=np.int64)]
+        self._codes = codes
+        self._similarity = color_space.match_matrix(list(self._color_codes))
+        self._prices = np.asarray(prices, dtype=np.float64)
+
+        # A tiny per-position handicap breaks ties toward catalog order
+        count = len(codes)
+        self._promotion = np.asarray(promotion, dtype=np.float64) - np.arange(count) * (
+            1e-9 / max(count, 1)
+        )
+
+        # Rows grouped by color, ascending within each group, and group offsets
+        self._order = np.argsort(codes, kind="stable").astype(np.int32)
+        self._offsets = np.searchsorted(
+            codes[self._order], np.arange(len(self._color_codes) + 1)
+        )
+
+        # Color codes per normalized color ("Emerald" and "Green" are Green)
+        self._normalized: Dict[str, List[int]] = {}
+        for term, code in self._color_codes.items():
+            self._normalized.setdefault(color_lexicon.normalize(term), []).append(code)
+
+    @classmethod
+    def from_products(
+        cls, products: Sequence[Product], colors: Sequence[str]
+    ) -> "CatalogRanker":
+        """Build from products and their colors, free text or normalized"""
+        codes_by_color: Dict[str, int] = {}
+        codes = np.fromiter(
+            (codes_by_color.setdefault(c, len(codes_by_color)) for c in colors),
+            dtype=np.int64,
+            count=len(colors),
+        )
+        prices = np.array(
+            [np.nan if p.price_baht is None else p.price_baht for p in products],
+            dtype=np.float64,
+        )
+        original_prices = np.array(
+            [
+                np.nan if p.original_price_baht is None else p.original_price_baht
+                for p in products
+            ],
+            dtype=np.float64,
+        )
+        promotion = promotion_scores(
+            prices, original_prices, (p.promotion_details_thai for p in products)
+        )
+        return cls(codes, list(codes_by_color), prices, promotion)
+
+    def colors(self) -> List[str]:
+        """All normalized colors present in the catalog"""
+        return list(self._normalized)
+
+    def rows_for_colors(
+        self, colors: Iterable[str], limit: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Ascending catalog rows of the products of any of the colors
+
+        Args:
+            colors: Colors, normalized or free text
+            limit: Number of rows to return at most, the first in catalog order
+
+        Returns:
+            Rows; the cost depends on the colors' products, or on the limit
+            if given, not on the catalog size
+        """
+        codes = {
+            code
+            for color in set(colors)
+            for code in self._normalized.get(color_lexicon.normalize(color), ())
+        }
+        groups = [
+            self._order[self._offsets[code] : self._offsets[code + 1]][:limit]
+            for code in codes
+        ]
+        if not groups:
+            return self._order[:0]
+        return np.sort(np.concatenate(groups))[:limit]
+
+    def rank(
+        self,
+        mentions: Sequence[str],
+        limit: int,
+        min_price: float = settings.RECOMMENDATION_MIN_PRICE_BAHT,
+        max_price: float = settings.RECOMMENDATION_MAX_PRICE_BAHT,
+        relevance: Optional[np.ndarray] = None,
+    ) -> List[int]:
+        """
+        Catalog positions of the best products for a fortune's colors
+
+        Args:
+            mentions: Colors in order of mention, repeated per mention; terms
+                such as "coral" match more precisely than canonical colors
+            limit: Number of products to return at most
+            min_price: Lowest price in the budget
+            max_price: Highest price in the budget
+            relevance: Text match score of every product (TextIndex.scores);
+                it orders the products of the matched colors, and only those
+
+        Returns:
+            Positions, best first
+        """
+        if limit <= 0:
+            return []
+
+        # Relevance is scaled so the best match scores 1, without copying it
+        text_weight = 0.0
+        if relevance is not None and len(relevance):
+            top = relevance.max()
+            if top > 0:
+                text_weight = settings.RANKING_TEXT_WEIGHT / top
+
+        def own_score(rows: np.ndarray) -> np.ndarray:
+            """Score of products apart from their color"""
+            score = settings.RANKING_PROMOTION_WEIGHT * self._promotion[rows]
+            if text_weight:
+                score += text_weight * relevance[rows]
+            return score
+
+        def best(rows: np.ndarray) -> np.ndarray:
+            """The `limit` best products in budget among rows of equal color weight"""
+            if min_price > 0 or max_price < np.inf:
+                prices = self._prices[rows]
+                # NaN compares false, so unpriced products stay in
+                rows = rows[~((prices < min_price) | (prices > max_price))]
+            if len(rows) > limit:
+                rows = rows[np.argpartition(-own_score(rows), limit - 1)[:limit]]
+            return rows
+
+        # Each catalog color weighs its best match among the mentioned colors
+        weights = np.zeros(len(self._color_codes))
+        terms = [color_space.term(color) for color in mentions]
+        for term, weight in color_weights(terms).items():
+            row = color_space.row(term)
+            if row is not None:
+                np.maximum(weights, weight * self._similarity[row], out=weights)
+            elif term in self._color_codes:
+                code = self._color_codes[term]
+                weights[code] = max(weights[code], weight)
+
+        # Within a color only a product's own score differs, so the best
+        # `limit` of each color are the only candidates it can contribute
+        candidates = [
+            best(self._order[self._offsets[code] : self._offsets[code + 1]])
+            for code in np.flatnonzero(weights)
+        ]
+        rows = np.concatenate(candidates) if candidates else []
+        if len(rows) == 0:
+            return []
+        groups = self._codes[rows]
+        scores = settings.RANKING_COLOR_WEIGHT * weights[groups] + own_score(rows)
+
+        # Greedy pick, penalizing the remaining products of each picked color
+        picked = []
+        for _ in range(min(limit, len(rows))):
+            chosen = int(np.argmax(scores))
+            picked.append(int(rows[chosen]))
+            scores[groups == groups[chosen]] -= settings.RANKING_DIVERSITY_PENALTY
+            scores[chosen] = -np.inf
+        return picked
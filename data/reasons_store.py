@@ -0,0 +1,303 @@
+"""
+Precomputed recommendation reasons for Mystica Oracle
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from cachetools import LRUCache
+
+from core.models import Product
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def product_key(product: Product) -> str:
+    """Get the key reasons are stored under for a product"""
+    return product.product_id or product.item_name_thai
+
+
+@dataclass
+class ReasonPool:
+    """Variants of the recommendation reason for a single product"""
+
+    reasons: List[str] = field(default_factory=list)
+    updated_at: float = 0.0
+
+
+class ReasonsStore:
+    """LRU/TTL store holding a pool of reason variants per product"""
+
+    def __init__(
+        self,
+        path: Optional[str] = settings.REASONS_STORE_PATH,
+        variants_per_product: int = settings.REASONS_VARIANTS_PER_PRODUCT,
+        max_products: int = settings.REASONS_STORE_MAX_PRODUCTS,
+        ttl_seconds: int = settings.REASONS_TTL_SECONDS,
+        refresh_after_seconds: int = settings.REASONS_REFRESH_AFTER_SECONDS,
+    ):
+        self.path = path
+        self.variants_per_product = variants_per_product
+        self.ttl_seconds = ttl_seconds
+        self.refresh_after_seconds = refresh_after_seconds
+        self._pools: LRUCache = LRUCache(maxsize=max_products)
+        self._lock = threading.RLock()
+        self.load()
+
+    def sample(self, products: List[Product]) -> List[Optional[str]]:
+        """Pick one reason variant per product, or None where none is stored"""
+        now = time.time()
+        reasons = []
+
+        with self._lock:
+            for product in products:
+                key = product_key(product)
+                pool = self._pools.get(key)
+
+                if pool is not None and now - pool.updated_at > self.ttl_seconds:
+                    del self._pools[key]
+                    pool = None
+
+                reasons.append(random.choice(pool.reasons) if pool else None)
+
+        return reasons
+
+    def add(self, product: Product, reasons: List[str]):
+        """Add freshly generated reasons, keeping only the newest variants"""
+        reasons = [reason for reason in reasons if reason]
+        if not reasons:
+            return
+
+        with self._lock:
+            key = product_key(product)
+            pool = self._pools.get(key) or ReasonPool()
+            pool.reasons = (pool.reasons + reasons)[-self.variants_per_product :]
+            pool.updated_at = time.time()
+            self._pools[key] = pool
+
+    def needs_refresh(self, product: Product) -> bool:
+        """Check whether a product's pool is missing, short or stale"""
+        with self._lock:
+            pool = self._pools.get(product_key(product))
+
+        if pool is None or len(pool.reasons) < self.variants_per_product:
+            return True
+        return time.time() - pool.updated_at > self.refresh_after_seconds
+
+    def load(self):
+        """Load persisted reason pools from disk"""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            data: Dict[str, dict] = json.load(f)
+
+        with self._lock:
+            for key, entry in data.items():
+                self._pools[key] = ReasonPool(
+                    reasons=entry["reasons"], updated_at=entry["updated_at"]
+                )
+
+    def save(self):
+        """Persist reason pools to disk"""
+        if not self.path:
+            return
+
+        with self._lock:
+            data = {
+                key: {"reasons": pool.reasons, "updated_at": pool.updated_at}
+                for key, pool in self._pools.items()
+            }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write atomically so readers in other processes never see a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class ReasonsRefresher:
+    """
+    Background thread that keeps reason pools full and fresh
+
+    Only products recommended recently are tracked, at most max_products of
+    them, so a refresh pass is bounded whatever the catalog size. A turn
+    that misses the store generates its reasons itself; the refresher tops
+    the pool up to its variants on a later pass.
+    """
+
+    def __init__(
+        self,
+        store: ReasonsStore,
+        generate: Callable[[List[Product]], List[str]],
+        interval_seconds: int = settings.REASONS_REFRESH_INTERVAL_SECONDS,
+        batch_size: int = settings.MAX_PRODUCT_RECOMMENDATIONS,
+        max_products: int = settings.REASONS_STORE_MAX_PRODUCTS,
+    ):
+        self.store = store
+        self.generate = generate
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._known: LRUCache = LRUCache(maxsize=max_products)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, products: List[Product]):
+        """Register recommended products whose pools should be kept fresh"""
+        with self._lock:
+            for product in products:
+                self._known[product_key(product)] = product
+
+    def start(self):
+        """Start the background refresh thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="mystica-reasons-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def refresh_once(self) -> int:
+        """Regenerate reasons for stale products and return how many were refreshed"""
+        with self._lock:
+            stale = [p for p in self._known.values() if self.store.needs_refresh(p)]
+
+        for start in range(0, len(stale), self.batch_size):
+            batch = stale[start : start + self.batch_size]
+            reasons = self.generate(batch)
+            for product, reason in zip(batch, reasons):
+                self.store.add(product, [reason])
+
+        if stale:
+            self.store.save()
+        return len(stale)
+
+    def _run(self):
+        """Refresh loop"""
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                self.refresh_once()
+            except Exception:
+                # Keep serving the existing pools; try again next interval
+                logger.exception(
+                    "Refreshing reasons failed; retrying in %ss",
+                    self.interval_seconds,
+                )
+
+
+class ReasonBatcher:
+    """
+    Coalesces reason requests from concurrent sessions into shared LLM calls
+
+    Requests arriving within a short window are deduplicated by product and
+    sent as one numbered prompt; each caller gets the reasons for its own
+    products back. Products already in a batch that is being generated are
+    not sent again; their callers wait on the same result. Runs on a single
+    event loop (the shared one in the app), so its queues need no locks.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[List[Product]], Awaitable[List[Optional[str]]]],
+        window_ms: float = settings.REASONS_BATCH_WINDOW_MS,
+        max_items: int = settings.REASONS_BATCH_MAX_ITEMS,
+    ):
+        self.generate = generate
+        self.window_seconds = window_ms / 1000
+        self.max_items = max_items
+        self.batches = 0
+        self.items = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Dict[str, Product] = {}
+        # Queued and in-flight products' futures, until their batch resolves
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop keeps only weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def request(
+        self, products: List[Product], timeout: Optional[float] = None
+    ) -> List[Optional[str]]:
+        """Reasons for products (None where unparsed), from the next batch"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._queue, self._futures, self._timer = {}, {}, None
+            self._tasks = set()
+
+        futures = []
+        for product in products:
+            key = product_key(product)
+            if key not in self._futures:
+                self._futures[key] = loop.create_future()
+                self._queue[key] = product
+            futures.append(self._futures[key])
+
+        if len(self._queue) >= self.max_items:
+            self._flush()
+        elif self._queue and self._timer is None:
+            # The batch call belongs to no single session's trace or deadline
+            self._timer = loop.call_later(
+                self.window_seconds, self._flush, context=contextvars.Context()
+            )
+
+        # Shield the shared futures so one caller giving up leaves the others
+        waiting = asyncio.gather(*(asyncio.shield(f) for f in futures))
+        return await asyncio.wait_for(waiting, timeout)
+
+    def _flush(self):
+        """Send queued products as batches of at most max_items"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            keys = list(self._queue)[: self.max_items]
+            batch = {key: self._queue.pop(key) for key in keys}
+            futures = {key: self._futures[key] for key in keys}
+            self.batches += 1
+            self.items += len(batch)
+            task = self._loop.create_task(
+                self._run(batch, futures), context=contextvars.Context()
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, Product], futures: Dict[str, asyncio.Future]):
+        """Generate one batch and fan the reasons out to the waiting callers"""
+        try:
+            reasons = await self.generate(list(batch.values()))
+        except asyncio.CancelledError:
+            for future in futures.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Callers that already gave up never retrieve it; don't log
+                    future.exception()
+            return
+        finally:
+            # Later requests for these products start a new batch
+            for key, future in futures.items():
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+
+        reasons = list(reasons) + [None] * (len(batch) - len(reasons))
+        for key, reason in zip(batch, reasons):
+            if not futures[key].done():
+                futures[key].set_result(reason)
@@ -0,0 +1,378 @@
+"""
+Session state stores for running Mystica Oracle outside a single Streamlit process
+
+Shared stores keep values as JSON. The dataclasses in SESSION_TYPES are
+tagged with their name and rebuilt on read, and anything else that is not
+plain JSON is refused on write. Reading a tampered store therefore cannot
+run code. The store still holds the seekers' names, birth dates and
+conversations, so only the app's workers should be able to reach it.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, List, Optional
+
+from core.models import ChatRecord, UserProfile
+from settings import settings
+
+# Dataclasses that may be kept in session state
+SESSION_TYPES = {cls.__name__: cls for cls in (UserProfile, ChatRecord)}
+
+_TYPE_TAG = "__type__"
+
+
+def encode_value(value: Any) -> str:
+    """JSON text of a session value"""
+
+    def tag(obj: Any) -> Dict[str, Any]:
+        name = type(obj).__name__
+        if not is_dataclass(obj) or SESSION_TYPES.get(name) is not type(obj):
+            raise TypeError(f"{name} cannot be kept in a shared session store")
+        return {_TYPE_TAG: name, **{f.name: getattr(obj, f.name) for f in fields(obj)}}
+
+    return json.dumps(value, default=tag, ensure_ascii=False)
+
+
+def decode_value(raw: Any) -> Any:
+    """Session value of JSON text written by encode_value"""
+
+    def untag(obj: Dict[str, Any]) -> Any:
+        name = obj.pop(_TYPE_TAG, None)
+        return obj if name is None else SESSION_TYPES[name](**obj)
+
+    return json.loads(raw, object_hook=untag)
+
+
+def _list_elements(value: Any) -> Optional[List[str]]:
+    """Encoded elements of a non-empty list, stored so later appends extend it"""
+    if isinstance(value, list) and value:
+        return [encode_value(element) for element in value]
+    return None
+
+
+class MemorySessionStore:
+    """Session store in process memory, for a single worker or tests"""
+
+    def __init__(self, ttl_seconds: int = settings.SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, key: str, default: Any = None) -> Any:
+        """Get a session value"""
+        with self._lock:
+            self._expire()
+            return self._sessions.get(session_id, {}).get(key, default)
+
+    def set(self, session_id: str, key: str, value: Any):
+        """Set a session value"""
+        with self._lock:
+            self._sessions.setdefault(session_id, {})[key] = value
+            self._touched[session_id] = time.time()
+
+    def append(self, session_id: str, key: str, value: Any):
+        """Append a value to a session list"""
+        with self._lock:
+            self._sessions.setdefault(session_id, {}).setdefault(key, []).append(value)
+            self._touched[session_id] = time.time()
+
+    def items(self, session_id: str) -> Dict[str, Any]:
+        """Get every value of a session"""
+        with self._lock:
+            self._expire()
+            return dict(self._sessions.get(session_id, {}))
+
+    def delete(self, session_id: str):
+        """Forget a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+    def _expire(self):
+        """Drop sessions not written to within the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        for session_id in [s for s, t in self._touched.items() if t < cutoff]:
+            self._sessions.pop(session_id, None)
+            del self._touched[session_id]
+
+
+class SQLiteSessionStore:
+    """
+    Session store in a SQLite file shared by the workers of one host
+
+    A session's last write time is one row of the sessions table, so a
+    write touches that row only. Expired sessions are deleted at most once
+    per SESSION_EXPIRE_INTERVAL_SECONDS, through an index on that time.
+    List values (chat history) are kept one element per row, so appending
+    a message does not rewrite the conversation.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.SESSION_STORE_PATH,
+        ttl_seconds: int = settings.SESSION_TTL_SECONDS,
+        expire_interval: float = settings.SESSION_EXPIRE_INTERVAL_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.expire_interval = expire_interval
+        self._last_expire = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            -- Pickled values of earlier versions; sessions are short-lived
+            DROP TABLE IF EXISTS session_state;
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+            CREATE TABLE IF NOT EXISTS session_values (
+                session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (session_id, key));
+            CREATE TABLE IF NOT EXISTS session_lists (
+                session_id TEXT NOT NULL, key TEXT NOT NULL,
+                position INTEGER NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (session_id, key, position));
+            """
+        )
+        self._conn.commit()
+
+    def get(self, session_id: str, key: str, default: Any = None) -> Any:
+        """Get a session value"""
+        with self._lock:
+            if not self._is_live(session_id):
+                return default
+            row = self._conn.execute(
+                "SELECT value FROM session_values WHERE session_id = ? AND key = ?",
+                (session_id, key),
+            ).fetchone()
+            if row is not None:
+                return decode_value(row[0])
+            elements = self._list(session_id, key)
+        return elements if elements else default
+
+    def set(self, session_id: str, key: str, value: Any):
+        """Set a session value; a non-empty list is stored as appendable rows"""
+        elements = _list_elements(value)
+        encoded = encode_value(value) if elements is None else None
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM session_lists WHERE session_id = ? AND key = ?",
+                (session_id, key),
+            )
+            if elements is None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO session_values VALUES (?, ?, ?)",
+                    (session_id, key, encoded),
+                )
+            else:
+                self._conn.execute(
+                    "DELETE FROM session_values WHERE session_id = ? AND key = ?",
+                    (session_id, key),
+                )
+                self._conn.executemany(
+                    "INSERT INTO session_lists VALUES (?, ?, ?, ?)",
+                    [(session_id, key, i, e) for i, e in enumerate(elements)],
+                )
+            self._touch(session_id)
+
+    def append(self, session_id: str, key: str, value: Any):
+        """Append a value to a session list"""
+        encoded = encode_value(value)
+        with self._lock:
+            # A value set earlier (such as an empty list) gives way to the list
+            self._conn.execute(
+                "DELETE FROM session_values WHERE session_id = ? AND key = ?",
+                (session_id, key),
+            )
+            self._conn.execute(
+                "INSERT INTO session_lists SELECT ?, ?, "
+                "COALESCE(MAX(position) + 1, 0), ? FROM session_lists "
+                "WHERE session_id = ? AND key = ?",
+                (session_id, key, encoded, session_id, key),
+            )
+            self._touch(session_id)
+
+    def items(self, session_id: str) -> Dict[str, Any]:
+        """Get every value of a session"""
+        with self._lock:
+            if not self._is_live(session_id):
+                return {}
+            values = {
+                key: decode_value(value)
+                for key, value in self._conn.execute(
+                    "SELECT key, value FROM session_values WHERE session_id = ?",
+                    (session_id,),
+                )
+            }
+            for (key,) in self._conn.execute(
+                "SELECT DISTINCT key FROM session_lists WHERE session_id = ?",
+                (session_id,),
+            ).fetchall():
+                values[key] = self._list(session_id, key)
+        return values
+
+    def delete(self, session_id: str):
+        """Forget a session"""
+        with self._lock:
+            self._delete_where("session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def _is_live(self, session_id: str) -> bool:
+        """Whether a session was written to within the TTL"""
+        row = self._conn.execute(
+            "SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row is not None and row[0] >= time.time() - self.ttl_seconds
+
+    def _list(self, session_id: str, key: str) -> List[Any]:
+        """Elements of a session list, in order"""
+        return [
+            decode_value(value)
+            for (value,) in self._conn.execute(
+                "SELECT value FROM session_lists WHERE session_id = ? AND key = ? "
+                "ORDER BY position",
+                (session_id, key),
+            )
+        ]
+
+    def _touch(self, session_id: str):
+        """Keep the whole session alive, expire old ones now and then, and commit"""
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?)", (session_id, now)
+        )
+        if now - self._last_expire >= self.expire_interval:
+            self._last_expire = now
+            self._delete_where(
+                "session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+                (now - self.ttl_seconds,),
+            )
+        self._conn.commit()
+
+    def _delete_where(self, condition: str, parameters: tuple):
+        """Delete the sessions matching a condition on session_id"""
+        for table in ("session_values", "session_lists", "sessions"):
+            self._conn.execute(f"DELETE FROM {table} WHERE {condition}", parameters)
+
+
+class RedisSessionStore:
+    """Session store in Redis (or a Redis-compatible server) shared by all hosts"""
+
+    # Hash value standing for a list kept in its own Redis list
+    LIST_MARKER = b"[list]"
+
+    def __init__(
+        self,
+        url: str = settings.SESSION_STORE_URL,
+        ttl_seconds: int = settings.SESSION_TTL_SECONDS,
+        key_prefix: str = "mystica:session:",
+    ):
+        # Imported lazily so the other backends never load the client
+        import redis
+
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._client = redis.Redis.from_url(url)
+        # Refreshes the TTL of the hash and of every list it marks, server-side
+        self._touch_script = self._client.register_script(
+            """
+            redis.call('EXPIRE', KEYS[1], ARGV[1])
+            local values = redis.call('HGETALL', KEYS[1])
+            for i = 1, #values, 2 do
+                if values[i + 1] == ARGV[2] then
+                    redis.call('EXPIRE', KEYS[1] .. ':list:' .. values[i], ARGV[1])
+                end
+            end
+            """
+        )
+
+    def get(self, session_id: str, key: str, default: Any = None) -> Any:
+        """Get a session value"""
+        name = self.key_prefix + session_id
+        value = self._client.hget(name, key)
+        if value is None:
+            return default
+        if value == self.LIST_MARKER:
+            return self._list(name, key)
+        return decode_value(value)
+
+    def set(self, session_id: str, key: str, value: Any):
+        """Set a session value; a non-empty list is stored as an appendable list"""
+        name = self.key_prefix + session_id
+        elements = _list_elements(value)
+        pipeline = self._client.pipeline()
+        pipeline.delete(self._list_name(name, key))
+        if elements is None:
+            pipeline.hset(name, key, encode_value(value))
+        else:
+            pipeline.hset(name, key, self.LIST_MARKER)
+            pipeline.rpush(self._list_name(name, key), *elements)
+        self._expire(pipeline, name)
+        pipeline.execute()
+
+    def append(self, session_id: str, key: str, value: Any):
+        """Append a value to a session list"""
+        name = self.key_prefix + session_id
+        pipeline = self._client.pipeline()
+        pipeline.hset(name, key, self.LIST_MARKER)
+        pipeline.rpush(self._list_name(name, key), encode_value(value))
+        self._expire(pipeline, name)
+        pipeline.execute()
+
+    def items(self, session_id: str) -> Dict[str, Any]:
+        """Get every value of a session"""
+        name = self.key_prefix + session_id
+        values = {}
+        for key, value in self._client.hgetall(name).items():
+            key = key.decode()
+            if value == self.LIST_MARKER:
+                values[key] = self._list(name, key)
+            else:
+                values[key] = decode_value(value)
+        return values
+
+    def delete(self, session_id: str):
+        """Forget a session"""
+        name = self.key_prefix + session_id
+        lists = [
+            self._list_name(name, key.decode())
+            for key, value in self._client.hgetall(name).items()
+            if value == self.LIST_MARKER
+        ]
+        self._client.delete(name, *lists)
+
+    def _list_name(self, name: str, key: str) -> str:
+        """Redis key of a session list"""
+        return f"{name}:list:{key}"
+
+    def _list(self, name: str, key: str) -> List[Any]:
+        """Elements of a session list, in order"""
+        return [
+            decode_value(v)
+            for v in self._client.lrange(self._list_name(name, key), 0, -1)
+        ]
+
+    def _expire(self, pipeline, name: str):
+        """Keep the whole session, lists included, alive for the TTL"""
+        self._touch_script(
+            keys=[name], args=[self.ttl_seconds, self.LIST_MARKER], client=pipeline
+        )
+
+
+def create_session_store(backend: str = settings.SESSION_STORE_BACKEND):
+    """Create the configured session store"""
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    return MemorySessionStore()
@@ -0,0 +1,311 @@
+"""
+Character n-gram BM25 index over product text for Mystica Oracle
+
+Product names (Thai and English) and recommendation attributes are cut
+into overlapping character n-grams, so Thai, written without spaces
+between words, matches without a word segmenter. N-grams are hashed into
+a fixed number of buckets, which leaves no vocabulary to store or load.
+
+The index is built offline (scripts/build_text_index.py) into a directory
+of .npy files: a CSR posting matrix from bucket to products holding the
+BM25 term-frequency part of every posting, and the idf of every bucket.
+Loading memory-maps them, so start-up reads next to nothing and worker
+processes share the pages. A rebuild writes a new directory and swaps it
+in, so the files a running worker has mapped are never rewritten. A query gathers the postings of its buckets
+and sums them per product with a single bincount.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.interfaces import ProductCatalog
+from core.models import Product
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+ARRAY_FILES = ("indptr", "doc_ids", "weights", "idf")
+
+# Multiplier of the polynomial n-gram hash (a large prime, as uint64)
+_HASH_PRIME = np.uint64(1_000_003)
+
+# Products hashed at a time while building
+_BUILD_CHUNK = 50_000
+
+# Runs of anything but word characters and the Thai block (whose vowel and
+# tone marks are not word characters) become a single space
+_SEPARATORS = re.compile(r"[^\w฀-๿]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text with punctuation collapsed to spaces, padded with spaces"""
+    return f" {_SEPARATORS.sub(' ', text.lower()).strip()} "
+
+
+def product_text(product: Product) -> str:
+    """Indexed text of a product: both names and the recommendation attributes"""
+    return " ".join(
+        [
+            product.item_name_thai or "",
+            product.item_name_english_approximation or "",
+            *product.textual_attributes_for_recommendation,
+        ]
+    )
+
+
+def ngram_buckets(codes: np.ndarray, ngram: int, buckets: int) -> np.ndarray:
+    """Hash bucket of every n-gram of a code point array"""
+    count = len(codes) - ngram + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    codes = codes.astype(np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(ngram):
+        # uint64 arithmetic wraps around, which is what a hash wants
+        hashes = hashes * _HASH_PRIME + codes[offset : offset + count]
+    return (hashes % np.uint64(buckets)).astype(np.int64)
+
+
+def catalog_fingerprint(product_ids: Iterable[str]) -> str:
+    """Hash of a catalog's product ids, in catalog order"""
+    digest = hashlib.sha256()
+    for product_id in product_ids:
+        digest.update(product_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _code_points(text: str) -> np.ndarray:
+    """Unicode code points of text"""
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+class TextIndex:
+    """BM25 scorer over the products of one catalog, in catalog order"""
+
+    def __init__(self, directory: str, mmap: bool = True):
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.documents: int = meta["documents"]
+        self.ngram: int = meta["ngram"]
+        self.buckets: int = meta["buckets"]
+        # Indexes written before fingerprints existed match no catalog
+        self.fingerprint: Optional[str] = meta.get("catalog_fingerprint")
+        # Last catalog checked by covers(), and the outcome
+        self._checked: Optional[Tuple[Any, bool]] = None
+
+        mode = "r" if mmap else None
+        self._indptr, self._doc_ids, self._weights, self._idf = (
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+            for name in ARRAY_FILES
+        )
+
+    def __len__(self) -> int:
+        return self.documents
+
+    def covers(self, products: Sequence[Product]) -> bool:
+        """Whether the index was built from these products, in this order"""
+        if len(products) != self.documents:
+            return False
+        checked = self._checked
+        if checked is not None and checked[0] is products:
+            return checked[1]
+
+        covered = (
+            catalog_fingerprint(p.product_id for p in products) == self.fingerprint
+        )
+        # Catalogs are read-only, so hashing their ids once is enough
+        if isinstance(products, ProductCatalog):
+            self._checked = (products, covered)
+        return covered
+
+    def scores(
+        self, text: str, max_terms: int = settings.TEXT_INDEX_MAX_QUERY_TERMS
+    ) -> np.ndarray:
+        """BM25 score of every product for a query text"""
+        terms = np.unique(
+            ngram_buckets(_code_points(normalize_text(text)), self.ngram, self.buckets)
+        )
+        starts = self._indptr[terms]
+        lengths = self._indptr[terms + 1] - starts
+
+        # A fortune has hundreds of n-grams; the rarest that occur at all
+        # carry the ranking, the common ones most of the postings
+        present = np.flatnonzero(lengths)
+        if 0 < max_terms < len(present):
+            present = present[
+                np.argpartition(lengths[present], max_terms - 1)[:max_terms]
+            ]
+        terms, starts, lengths = terms[present], starts[present], lengths[present]
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(self.documents, dtype=np.float64)
+
+        # Positions of every posting of every query term, without a Python loop
+        offsets = np.cumsum(lengths) - lengths
+        postings = np.arange(total) - np.repeat(offsets - starts, lengths)
+        return np.bincount(
+            self._doc_ids[postings],
+            weights=self._weights[postings] * np.repeat(self._idf[terms], lengths),
+            minlength=self.documents,
+        )
+
+    def search(self, text: str, limit: int) -> List[Tuple[int, float]]:
+        """Catalog positions and scores of the best matching products"""
+        scores = self.scores(text)
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(position), float(scores[position])) for position in matched]
+
+
+def _term_frequencies(
+    texts: List[str], first: int, ngram: int, buckets: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Products, buckets and counts of the n-grams of texts, and text lengths"""
+    # Hash the texts at once, NUL-separated, and drop n-grams crossing a
+    # separator
+    codes = _code_points("\0".join(texts) + "\0")
+    doc_of = np.repeat(
+        np.arange(first, first + len(texts)), [len(t) + 1 for t in texts]
+    )
+    hashes = ngram_buckets(codes, ngram, buckets)
+    separators = np.concatenate([[0], np.cumsum(codes == 0)])
+    valid = separators[ngram : ngram + len(hashes)] == separators[: len(hashes)]
+    doc_of, hashes = doc_of[: len(hashes)][valid], hashes[valid]
+
+    pairs, tf = np.unique(doc_of * buckets + hashes, return_counts=True)
+    lengths = np.bincount(doc_of - first, minlength=len(texts))
+    return (
+        (pairs // buckets).astype(np.int32),
+        (pairs % buckets).astype(np.int32),
+        tf.astype(np.int32),
+        lengths,
+    )
+
+
+def build_text_index(
+    products: Iterable[Product],
+    directory: str,
+    ngram: int = settings.TEXT_INDEX_NGRAM,
+    buckets: int = settings.TEXT_INDEX_BUCKETS,
+    max_df: float = settings.TEXT_INDEX_MAX_DF,
+    k1: float = settings.BM25_K1,
+    b: float = settings.BM25_B,
+) -> TextIndex:
+    """
+    Build the index of a catalog and write it to a directory
+
+    The files are written to a new directory next to it, which then
+    replaces it; workers that mapped the previous files keep reading them
+    until they reload.
+
+    Args:
+        products: Products in catalog order
+        directory: Directory the .npy files and metadata are written to
+        ngram: Characters per n-gram
+        buckets: Number of hash buckets n-grams are counted in
+        max_df: Fraction of products above which an n-gram is too common to
+            be indexed (it would only slow queries down)
+        k1: BM25 term frequency saturation
+        b: BM25 document length normalization
+
+    Returns:
+        The written index, loaded
+    """
+    products = list(products)
+    texts = [normalize_text(product_text(p)) for p in products]
+    documents = len(texts)
+
+    # Term frequency of every (product, bucket) pair, a chunk of products at
+    # a time to bound memory; chunks hold ascending products, so their
+    # pairs concatenate in order
+    chunks = [
+        _term_frequencies(texts[start : start + _BUILD_CHUNK], start, ngram, buckets)
+        for start in range(0, documents, _BUILD_CHUNK)
+    ]
+    docs, terms, tf, lengths = (
+        np.concatenate([chunk[i] for chunk in chunks])
+        if chunks
+        else np.empty(0, dtype=np.int64)
+        for i in range(4)
+    )
+    del chunks
+    average_length = lengths.mean() if documents else 0.0
+
+    df = np.bincount(terms, minlength=buckets)
+    idf = np.log1p((documents - df + 0.5) / (df + 0.5)).astype(np.float32)
+    common = df > max_df * documents
+    idf[common] = 0
+
+    keep = ~common[terms]
+    docs, terms, tf = docs[keep], terms[keep], tf[keep]
+    norm = k1 * (1 - b + b * lengths[docs] / max(average_length, 1e-9))
+    weights = (tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    # CSR by bucket; the stable sort keeps products ascending within a bucket
+    order = np.argsort(terms, kind="stable")
+    indptr = np.zeros(buckets + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=buckets), out=indptr[1:])
+
+    directory = os.path.abspath(directory)
+    parent, base = os.path.split(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{base}.", dir=parent)
+    arrays = {
+        "indptr": indptr,
+        "doc_ids": docs[order].astype(np.int32),
+        "weights": weights[order],
+        "idf": idf,
+    }
+    meta = {
+        "documents": documents,
+        "catalog_fingerprint": catalog_fingerprint(p.product_id for p in products),
+        "ngram": ngram,
+        "buckets": buckets,
+        "max_df": max_df,
+        "k1": k1,
+        "b": b,
+        "dropped_buckets": int(common.sum()),
+    }
+    try:
+        for name in ARRAY_FILES:
+            np.save(os.path.join(staging, f"{name}.npy"), arrays[name])
+        with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.chmod(staging, 0o755)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # A directory cannot replace a non-empty one, so move the old one aside
+    # first; it is unlinked, not truncated, so existing mappings stay valid
+    previous = None
+    if os.path.exists(directory):
+        previous = tempfile.mkdtemp(prefix=f".{base}.old.", dir=parent)
+        os.replace(directory, previous)
+    os.replace(staging, directory)
+    if previous is not None:
+        shutil.rmtree(previous)
+
+    return TextIndex(directory)
+
+
+def load_text_index(directory: str) -> Optional[TextIndex]:
+    """Memory-map the index in a directory, or None if it has not been built"""
+    if not os.path.exists(os.path.join(directory, META_FILE)):
+        logger.info("No product text index at %s; ranking by color only", directory)
+        return None
+    return TextIndex(directory)
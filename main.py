@@ -1,5 +1,6 @@
 import streamlit as st
 from langchain_core.messages import AIMessage, HumanMessage
+from utils.async_runner import run_coroutine
 from utils.dependencies import DIContainer
 
 
@@ -17,9 +18,7 @@ class MysticaOracleApp:
         """Initialize the application"""
         if not self.state_manager.is_initialized():
             # Process initial greeting
-            initial_messages = self.workflow.process_message(
-                "Hello, I wish to know my future!"
-            )
+            initial_messages = self._respond("Hello, I wish to know my future!")
 
             self.state_manager.add_message(
                 HumanMessage(content="Hello, I wish to know my future!")
@@ -46,21 +45,30 @@ class MysticaOracleApp:
         """Handle user input"""
         self.state_manager.add_message(HumanMessage(content=user_input))
 
-        with st.spinner("The Oracle contemplates..."):
-            try:
-                responses = self.workflow.process_message(user_input)
-                for response in responses:
-                    self.state_manager.add_message(response)
+        try:
+            stream = self.workflow.stream_message(user_input)
+            self.chat_interface.render_stream(user_input, stream)
+
+            self.workflow.apply_turn(stream.result)
+            for response in stream.result.responses:
+                self.state_manager.add_message(response)
 
-            except Exception as e:
-                error_msg = AIMessage(
-                    content="The threads of fate are tangled. The Oracle needs a moment. Please try your query again."
-                )
-                self.state_manager.add_message(error_msg)
-                st.error(f"An error occurred: {e}")
+        except Exception as e:
+            error_msg = AIMessage(
+                content="The threads of fate are tangled. The Oracle needs a moment. Please try your query again."
+            )
+            self.state_manager.add_message(error_msg)
+            st.error(f"An error occurred: {e}")
 
         st.rerun()
 
+    def _respond(self, user_input: str):
+        """Run a turn on the shared event loop and apply it to session state"""
+        profile = self.state_manager.get_user_profile()
+        result = run_coroutine(self.workflow.arespond(user_input, profile))
+        self.workflow.apply_turn(result)
+        return result.responses
+
 
 def main():
     """Main entry point"""
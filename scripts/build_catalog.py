@@ -0,0 +1,32 @@
+"""
+Convert a JSON, CSV or Parquet product catalog into a memory-mapped Arrow file
+
+Usage:
+    python -m scripts.build_catalog [--source PATH] [--output PATH]
+
+Point CATALOG_PATH at the output to serve the catalog from the columnar backend.
+"""
+
+import argparse
+import os
+
+from data.catalog import load_catalog
+from data.columnar_catalog import write_columnar_catalog
+from settings import settings
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", default=settings.CATALOG_PATH)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.source)[0] + ".arrow"
+    catalog = load_catalog(args.source)
+    write_columnar_catalog(catalog, output)
+    print(f"Wrote {len(catalog)} products -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Build the character n-gram BM25 index of a product catalog's text
+
+Usage:
+    python -m scripts.build_text_index [--source PATH] [--output DIR]
+
+Rebuild the index whenever the catalog changes; the recommender ignores an
+index built from other product ids or another product order. Running
+workers keep the index they loaded until they restart.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from data.catalog import load_catalog
+from data.text_index import META_FILE, build_text_index
+from settings import settings
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", default=settings.CATALOG_PATH)
+    parser.add_argument("--output", default=settings.TEXT_INDEX_PATH)
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.source)
+    start = time.perf_counter()
+    build_text_index(catalog, args.output)
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(args.output, META_FILE), encoding="utf-8") as f:
+        dropped = json.load(f)["dropped_buckets"]
+    size_mb = (
+        sum(
+            os.path.getsize(os.path.join(args.output, name))
+            for name in os.listdir(args.output)
+        )
+        / 1e6
+    )
+    print(
+        f"Indexed {len(catalog)} products in {elapsed:.1f}s -> {args.output} "
+        f"({size_mb:.1f} MB, {dropped} too common n-grams dropped)"
+    )
+
+
+if __name__ == "__main__":
+    main()
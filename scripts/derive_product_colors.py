@@ -0,0 +1,181 @@
+"""
+Derive product colors from product packshots and write them into the catalog
+
+Usage:
+    python -m scripts.derive_product_colors --images DIR [--catalog PATH]
+        [--workers N] [--clusters K] [--sample-side PX] [--force]
+
+Images are matched to products by file name: P0001.jpg is the packshot of
+product P0001. Each image is downsampled, its background dropped and its
+pixels clustered with k-means in CIELAB; the heaviest cluster's nearest
+color vocabulary term becomes the product's inferred_color_association_primary,
+and its sRGB value derived_color_hex. Images run in parallel in a process
+pool. Results are cached by file hash, so a weekly run only decodes new or
+changed packshots; the cache is saved as results come in, so an interrupted
+run resumes where it stopped. Images that fail are reported and retried on
+the next run. Rebuild an Arrow catalog (scripts/build_catalog.py) from
+the updated file if that is what CATALOG_PATH points at.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from data.catalog import read_catalog_records, write_catalog_records
+from settings import settings
+from utils.image_processing import compute_content_hash, dominant_colors
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# Bump when the derivation changes, so cached results are recomputed
+DERIVATION_VERSION = 1
+
+# Results between saves of the cache during a run
+SAVE_EVERY = 2000
+
+
+def derive_color(path: str, clusters: int, sample_side: int) -> Dict:
+    """Dominant color of one packshot, or the error reading it"""
+    from PIL import Image
+
+    from utils.color_space import color_space
+
+    # Any failure stays with its image; raising would abort the whole pool map
+    try:
+        with Image.open(path) as image:
+            colors = dominant_colors(image, clusters, sample_side)
+    except OSError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    if not colors:
+        return {"error": "no foreground pixels"}
+
+    term, distance = color_space.nearest(colors[0].lab)
+    return {
+        "color": term.capitalize(),
+        "hex": "#{:02X}{:02X}{:02X}".format(*colors[0].rgb),
+        "weight": round(colors[0].weight, 3),
+        "distance": round(distance, 1),
+    }
+
+
+def load_cache(path: str, params: Dict) -> Dict[str, Dict]:
+    """Cached results by image hash, empty if missing or derived differently"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["images"] if data.get("params") == params else {}
+
+
+def save_cache(path: str, params: Dict, images: Dict[str, Dict]):
+    """Write the cache atomically, without failed images"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "params": params,
+                "images": {h: r for h, r in images.items() if "error" not in r},
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--catalog", default=settings.CATALOG_PATH)
+    parser.add_argument("--cache", default=settings.PRODUCT_COLOR_CACHE_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--clusters", type=int, default=settings.PRODUCT_COLOR_CLUSTERS)
+    parser.add_argument(
+        "--sample-side", type=int, default=settings.PRODUCT_COLOR_SAMPLE_SIDE
+    )
+    parser.add_argument("--force", action="store_true", help="ignore the cache")
+    args = parser.parse_args()
+
+    records = read_catalog_records(args.catalog)
+    by_id = {str(r.get("product_id")): r for r in records}
+
+    paths: Dict[str, str] = {}
+    for name in sorted(os.listdir(args.images)):
+        product_id, extension = os.path.splitext(name)
+        if extension.lower() in IMAGE_EXTENSIONS:
+            paths[product_id] = os.path.join(args.images, name)
+    unmatched = sorted(set(paths) - set(by_id))
+
+    params = {
+        "version": DERIVATION_VERSION,
+        "clusters": args.clusters,
+        "sample_side": args.sample_side,
+        "rgb": settings.COLOR_RGB,
+    }
+    cache = {} if args.force else load_cache(args.cache, params)
+
+    start = time.perf_counter()
+    hashes: Dict[str, str] = {}
+    for product_id in set(paths) & set(by_id):
+        with open(paths[product_id], "rb") as f:
+            hashes[product_id] = compute_content_hash(f.read())
+    # Images not derived before, once per distinct content
+    pending = sorted({h: p for p, h in hashes.items() if h not in cache}.items())
+    hashed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = executor.map(
+            derive_color,
+            [paths[product_id] for _, product_id in pending],
+            [args.clusters] * len(pending),
+            [args.sample_side] * len(pending),
+            chunksize=max(1, len(pending) // (4 * (args.workers or 1))),
+        )
+        for done, ((content_hash, _), result) in enumerate(zip(pending, results), 1):
+            cache[content_hash] = result
+            if done % SAVE_EVERY == 0:
+                save_cache(args.cache, params, cache)
+    derived = time.perf_counter() - start
+
+    updated, failed = 0, []
+    for product_id, content_hash in sorted(hashes.items()):
+        result = cache[content_hash]
+        if "error" in result:
+            failed.append(f"{product_id}: {result['error']}")
+            continue
+        record = by_id[product_id]
+        if (
+            record.get("inferred_color_association_primary") != result["color"]
+            or record.get("derived_color_hex") != result["hex"]
+        ):
+            record["inferred_color_association_primary"] = result["color"]
+            record["derived_color_hex"] = result["hex"]
+            updated += 1
+
+    if updated:
+        write_catalog_records(records, args.catalog)
+    save_cache(args.cache, params, cache)
+
+    rate = len(pending) / derived if derived > 0 and pending else 0.0
+    print(
+        f"Derived {len(pending)} images in {derived:.2f}s ({rate:.1f} images/s, "
+        f"{args.workers} workers); {len(hashes) - len(pending)} unchanged, "
+        f"hashed in {hashed:.2f}s"
+    )
+    print(f"Updated {updated} of {len(records)} products -> {args.catalog}")
+    if unmatched:
+        print(f"{len(unmatched)} images match no product: {', '.join(unmatched[:10])}")
+    for failure in failed:
+        print(f"Failed {failure}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Offline warm-up job that fills the recommendation reasons store
+
+Usage:
+    python -m scripts.warm_reasons [--variants N] [--path PATH]
+"""
+
+import argparse
+from typing import List
+
+from langchain_openai import ChatOpenAI
+
+from agents.recommenders import MysticaProductRecommender
+from core.models import Product
+from data.reasons_store import ReasonsStore
+from data.repositories import ProductRepository
+from settings import settings
+
+
+def warm_reasons(
+    recommender: MysticaProductRecommender,
+    store: ReasonsStore,
+    products: List[Product],
+    variants: int,
+    batch_size: int = settings.MAX_PRODUCT_RECOMMENDATIONS,
+) -> int:
+    """
+    Generate reason variants for every product and persist them
+
+    Args:
+        recommender: Recommender used to call the LLM
+        store: Store the reasons are written to
+        products: Products to generate reasons for
+        variants: Number of variants to generate per product
+        batch_size: Number of products per LLM call
+
+    Returns:
+        Number of reasons generated
+    """
+    generated = 0
+
+    for _ in range(variants):
+        for start in range(0, len(products), batch_size):
+            batch = products[start : start + batch_size]
+            reasons = recommender.generate_fresh_reasons(batch)
+            for product, reason in zip(batch, reasons):
+                if reason:
+                    store.add(product, [reason])
+                    generated += 1
+
+        # Save after every round so an interrupted run keeps its progress
+        store.save()
+
+    return generated
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--variants", type=int, default=settings.REASONS_VARIANTS_PER_PRODUCT
+    )
+    parser.add_argument("--path", default=settings.REASONS_STORE_PATH)
+    args = parser.parse_args()
+
+    llm = ChatOpenAI(
+        model=settings.LLM_MODEL,
+        temperature=settings.LLM_TEMPERATURE,
+        max_tokens=settings.LLM_MAX_TOKENS,
+    )
+    store = ReasonsStore(path=args.path)
+    products = ProductRepository().get_all_products()
+
+    generated = warm_reasons(
+        MysticaProductRecommender(llm), store, products, args.variants
+    )
+    print(f"Generated {generated} reasons for {len(products)} products -> {args.path}")
+
+
+if __name__ == "__main__":
+    main()
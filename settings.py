@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Any, Dict, List
 
 
 class Settings:
@@ -9,17 +9,176 @@ class Settings:
     LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
     LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "1.0"))
     LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1200"))
+    # Extract profile updates and reply in one structured call once the
+    # seeker's name and date of birth are known (falls back to two calls)
+    FUSED_TURN_MODE = os.getenv("FUSED_TURN_MODE", "false").lower() == "true"
 
     # Vision LLM Settings
     VISION_LLM_MODEL = os.getenv("VISION_LLM_MODEL", "gpt-4o-mini")
     VISION_LLM_TEMPERATURE = float(os.getenv("VISION_LLM_TEMPERATURE", "1.0"))
     VISION_LLM_MAX_TOKENS = int(os.getenv("VISION_LLM_MAX_TOKENS", "1200"))
 
+    # Vision Image Preprocessing Settings
+    VISION_IMAGE_DETAIL = os.getenv("VISION_IMAGE_DETAIL", "high")  # low or high
+    VISION_IMAGE_MAX_TILES = int(os.getenv("VISION_IMAGE_MAX_TILES", "4"))
+    VISION_IMAGE_TARGET_BYTES = int(os.getenv("VISION_IMAGE_TARGET_BYTES", "150000"))
+    VISION_IMAGE_MIN_QUALITY = 40
+    VISION_IMAGE_MAX_QUALITY = 90
+    VISION_IMAGE_CROP_TO_HAND = os.getenv("VISION_IMAGE_CROP_TO_HAND", "1") == "1"
+
+    # Handprint Analysis Cache Settings
+    HANDPRINT_CACHE_PATH = os.getenv(
+        "HANDPRINT_CACHE_PATH", ".cache/handprint_analyses.sqlite3"
+    )
+    HANDPRINT_CACHE_MAX_DISTANCE = int(os.getenv("HANDPRINT_CACHE_MAX_DISTANCE", "4"))
+    HANDPRINT_CACHE_MAX_ENTRIES = int(os.getenv("HANDPRINT_CACHE_MAX_ENTRIES", "50000"))
+
+    # Blob Store Settings (handprint images and other large payloads)
+    BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "memory")  # memory, disk
+    BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", ".cache/blobs")
+    BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(256 * 1024**2)))
+    BLOB_STORE_GRACE_SECONDS = int(os.getenv("BLOB_STORE_GRACE_SECONDS", "300"))
+    SHOW_SESSION_MEMORY = os.getenv("SHOW_SESSION_MEMORY", "false").lower() == "true"
+
+    # Tracing Settings
+    SHOW_TRACE_WATERFALL = os.getenv("SHOW_TRACE_WATERFALL", "false").lower() == "true"
+    TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "100"))
+    TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")
+    TRACE_BUCKETS: List[float] = [
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+    ]
+
+    # LLM Response Cache Settings
+    LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # memory, sqlite, none
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    LLM_CACHE_STAGES: Dict[str, Dict[str, Any]] = {
+        "extraction": {"enabled": True, "ttl_seconds": 24 * 3600, "variants": 1},
+        "fortune": {"enabled": True, "ttl_seconds": 3600, "variants": 5},
+        "reasons": {"enabled": False, "ttl_seconds": 24 * 3600, "variants": 5},
+        "handprint": {"enabled": False, "ttl_seconds": 24 * 3600, "variants": 1},
+        "fused": {"enabled": True, "ttl_seconds": 3600, "variants": 5},
+    }
+
+    # LLM Call Resilience Settings
+    TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "45"))
+    LLM_CALL_STAGES: Dict[str, Dict[str, Any]] = {
+        "extraction": {"timeout_seconds": 10.0, "hedge": True},
+        "fortune": {"timeout_seconds": 30.0, "hedge": False},
+        "reasons": {"timeout_seconds": 20.0, "hedge": True},
+        "handprint": {"timeout_seconds": 30.0, "hedge": False},
+        "fused": {"timeout_seconds": 30.0, "hedge": False},
+    }
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+    CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+    CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+    CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
     # UI Settings
     CHAT_HEIGHT = 550
+    CHAT_WINDOW_TURNS = int(os.getenv("CHAT_WINDOW_TURNS", "20"))
     HANDPRINT_IMAGE_WIDTH = 150
     MAX_PRODUCT_RECOMMENDATIONS = 3
 
+    # Recommendation Ranking Settings
+    RANKING_COLOR_WEIGHT = float(os.getenv("RANKING_COLOR_WEIGHT", "1.0"))
+    RANKING_PROMOTION_WEIGHT = float(os.getenv("RANKING_PROMOTION_WEIGHT", "0.5"))
+    # Weight kept by each color relative to the one first mentioned before it
+    RANKING_POSITION_DECAY = float(os.getenv("RANKING_POSITION_DECAY", "0.8"))
+    # Score taken off a product per already recommended product of its color
+    RANKING_DIVERSITY_PENALTY = float(os.getenv("RANKING_DIVERSITY_PENALTY", "0.5"))
+    # Weight of the product text match (see TEXT_INDEX_PATH), scaled so the
+    # best matching product scores 1
+    RANKING_TEXT_WEIGHT = float(os.getenv("RANKING_TEXT_WEIGHT", "0.5"))
+    # Budget in baht; products without a price are not filtered out
+    RECOMMENDATION_MIN_PRICE_BAHT = float(
+        os.getenv("RECOMMENDATION_MIN_PRICE_BAHT", "0")
+    )
+    RECOMMENDATION_MAX_PRICE_BAHT = float(
+        os.getenv("RECOMMENDATION_MAX_PRICE_BAHT", "inf")
+    )
+
+    # Recommendation Reasons Store Settings
+    REASONS_STORE_PATH = os.getenv("REASONS_STORE_PATH", ".cache/reasons.json")
+    REASONS_VARIANTS_PER_PRODUCT = int(os.getenv("REASONS_VARIANTS_PER_PRODUCT", "5"))
+    REASONS_STORE_MAX_PRODUCTS = int(os.getenv("REASONS_STORE_MAX_PRODUCTS", "10000"))
+    REASONS_TTL_SECONDS = int(os.getenv("REASONS_TTL_SECONDS", str(7 * 24 * 3600)))
+    REASONS_REFRESH_AFTER_SECONDS = int(
+        os.getenv("REASONS_REFRESH_AFTER_SECONDS", str(24 * 3600))
+    )
+    REASONS_REFRESH_INTERVAL_SECONDS = int(
+        os.getenv("REASONS_REFRESH_INTERVAL_SECONDS", "300")
+    )
+    # Reason requests from concurrent sessions share one LLM call per window
+    REASONS_BATCHING = os.getenv("REASONS_BATCHING", "true").lower() == "true"
+    REASONS_BATCH_WINDOW_MS = float(os.getenv("REASONS_BATCH_WINDOW_MS", "25"))
+    REASONS_BATCH_MAX_ITEMS = int(os.getenv("REASONS_BATCH_MAX_ITEMS", "12"))
+
+    # Product Catalog Settings (JSON, CSV, Parquet, or memory-mapped Arrow IPC)
+    CATALOG_PATH = os.getenv(
+        "CATALOG_PATH",
+        os.path.join(os.path.dirname(__file__), "data", "catalog", "products.json"),
+    )
+
+    # Product Color Derivation Settings (scripts/derive_product_colors.py)
+    PRODUCT_COLOR_CACHE_PATH = os.getenv(
+        "PRODUCT_COLOR_CACHE_PATH", ".cache/product_colors.json"
+    )
+    PRODUCT_COLOR_CLUSTERS = 5
+    PRODUCT_COLOR_SAMPLE_SIDE = 64
+
+    # Product Text Index Settings (built by scripts/build_text_index.py)
+    TEXT_INDEX_PATH = os.getenv(
+        "TEXT_INDEX_PATH",
+        os.path.join(os.path.dirname(__file__), "data", "catalog", "text_index"),
+    )
+    TEXT_INDEX_NGRAM = 3
+    TEXT_INDEX_BUCKETS = 1 << 18
+    # N-grams in more than this fraction of products are not indexed
+    TEXT_INDEX_MAX_DF = 0.2
+    # Score a query on only its this many rarest n-grams (0: all of them),
+    # trading exactness for latency on very large catalogs
+    TEXT_INDEX_MAX_QUERY_TERMS = int(os.getenv("TEXT_INDEX_MAX_QUERY_TERMS", "0"))
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    # Words added to the text query for each divination category
+    TEXT_QUERY_FOCUS_TERMS: Dict[str, str] = {
+        "work": "work energy focus coffee ทำงาน พลังงาน",
+        "love": "love heart sweet rose ความรัก หัวใจ หวาน",
+        "wealth": "wealth gold money luck ทอง โชค รวย",
+    }
+
+    # Session Store Settings (headless service; Streamlit uses st.session_state)
+    SESSION_STORE_BACKEND = os.getenv(
+        "SESSION_STORE_BACKEND", "memory"
+    )  # memory, sqlite, redis
+    SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", ".cache/sessions.sqlite3")
+    SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "redis://localhost:6379/0")
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+    # Shortest time between sweeps for expired sessions in the SQLite store
+    SESSION_EXPIRE_INTERVAL_SECONDS = float(
+        os.getenv("SESSION_EXPIRE_INTERVAL_SECONDS", "60")
+    )
+    SESSION_LOCAL_STATE_SIZE = int(os.getenv("SESSION_LOCAL_STATE_SIZE", "10000"))
+    SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+    SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+    # Largest request body the headless service reads (handprint uploads)
+    SERVICE_MAX_BODY_BYTES = int(os.getenv("SERVICE_MAX_BODY_BYTES", str(20 * 1024**2)))
+
     # Session State Settings
     STATE_KEY_PREFIX = "mystica_"
 
@@ -76,6 +235,76 @@ class Settings:
         "lavender",
     ]
 
+    # Canonical base color for each vocabulary term (terms not listed map to
+    # their own capitalized form)
+    COLOR_CANONICAL: Dict[str, str] = {
+        "golden": "Gold",
+        "bronze": "Brown",
+        "amber": "Orange",
+        "copper": "Orange",
+        "ivory": "Yellow",
+        "emerald": "Green",
+        "jade": "Green",
+        "rose": "Pink",
+        "coral": "Pink",
+        "azure": "Blue",
+        "sapphire": "Blue",
+        "turquoise": "Blue",
+        "crimson": "Red",
+        "scarlet": "Red",
+        "ruby": "Red",
+        "ebony": "Black",
+        "onyx": "Black",
+        "silvery": "Silver",
+        "pearl": "Silver",
+        "violet": "Purple",
+        "lavender": "Purple",
+    }
+
+    # sRGB of each vocabulary term, placed in CIELAB for perceptual matching
+    # (see utils/color_space.py)
+    COLOR_RGB: Dict[str, str] = {
+        "gold": "#FFD700",
+        "golden": "#DAA520",
+        "brown": "#8B4513",
+        "bronze": "#CD7F32",
+        "orange": "#FFA500",
+        "amber": "#FFBF00",
+        "copper": "#B87333",
+        "yellow": "#FFFF00",
+        "ivory": "#FFFFF0",
+        "green": "#008000",
+        "emerald": "#50C878",
+        "jade": "#00A86B",
+        "pink": "#FFC0CB",
+        "rose": "#FF007F",
+        "coral": "#FF7F50",
+        "blue": "#0000FF",
+        "azure": "#007FFF",
+        "sapphire": "#0F52BA",
+        "turquoise": "#40E0D0",
+        "red": "#FF0000",
+        "crimson": "#DC143C",
+        "scarlet": "#FF2400",
+        "ruby": "#E0115F",
+        "black": "#000000",
+        "ebony": "#555D50",
+        "onyx": "#353839",
+        "silver": "#C0C0C0",
+        "silvery": "#C0C0C0",
+        "pearl": "#EAE0C8",
+        "violet": "#8F00FF",
+        "purple": "#800080",
+        "lavender": "#E6E6FA",
+    }
+    # Product colors within this CIELAB distance (CIE76 delta E) of a
+    # fortune color match it, the nearer the better
+    COLOR_MATCH_MAX_DISTANCE = float(os.getenv("COLOR_MATCH_MAX_DISTANCE", "50"))
+    # Least match of a product color sharing a fortune color's canonical color
+    COLOR_MATCH_CANONICAL_SIMILARITY = float(
+        os.getenv("COLOR_MATCH_CANONICAL_SIMILARITY", "0.5")
+    )
+
     # Divination Choices
     DIVINATION_CHOICES: List[str] = [
         "work",
@@ -99,6 +328,79 @@ class Settings:
         "yes please",
     ]
 
+    # Divination categories and the words that select them; "all" selects every
+    # category. Used by the local intent classifier instead of the prompt.
+    DIVINATION_CATEGORIES: List[str] = ["work", "love", "wealth"]
+    DIVINATION_SYNONYMS: Dict[str, List[str]] = {
+        "work": [
+            "work",
+            "job",
+            "career",
+            "office",
+            "business",
+            "boss",
+            "colleague",
+            "promotion",
+            "profession",
+            "study",
+            "studies",
+            "งาน",
+            "การงาน",
+        ],
+        "love": [
+            "love",
+            "romance",
+            "relationship",
+            "partner",
+            "heart",
+            "marriage",
+            "dating",
+            "crush",
+            "soulmate",
+            "boyfriend",
+            "girlfriend",
+            "husband",
+            "wife",
+            "ความรัก",
+            "คู่",
+        ],
+        "wealth": [
+            "wealth",
+            "money",
+            "finance",
+            "finances",
+            "financial",
+            "rich",
+            "riches",
+            "income",
+            "salary",
+            "investment",
+            "luck",
+            "lottery",
+            "การเงิน",
+            "เงิน",
+            "โชคลาภ",
+        ],
+        "all": [
+            "all",
+            "everything",
+            "general",
+            "overall",
+            "whole",
+            "both",
+            "every",
+            "proceed",
+            "continue",
+            "yes",
+            "sure",
+            "ok",
+            "okay",
+            "more",
+            "ทั้งหมด",
+            "ทุกด้าน",
+        ],
+    }
+
     # File Upload Settings
     ALLOWED_IMAGE_TYPES = ["jpg", "jpeg", "png"]
 
@@ -106,6 +408,10 @@ class Settings:
     INITIAL_GREETING = "Hello, I wish to know my future!"
     ERROR_MESSAGE = "The threads of fate are tangled. The Oracle needs a moment. Please try your query again."
     HANDPRINT_ERROR = "The lines of fate are momentarily obscured for this image."
+    FORTUNE_FALLBACK = (
+        "The veils grow thick and the stars fall silent for a moment, seeker. "
+        "Ask again, and I shall peer once more into the mists of your fate."
+    )
 
     # Styling
     CHAT_USER_AVATAR = "user"
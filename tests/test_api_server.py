@@ -0,0 +1,147 @@
+"""
+Tests for the HTTP API's routes and error codes
+"""
+
+import http.client
+import io
+import json
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+from api.server import MysticaService, create_server
+from benchmarks.fake_llm import FakeChatModel, LatencyModel
+from benchmarks.load_test import (
+    FakeLLMRegistry,
+    extraction_responder,
+    mystica_responder,
+)
+from data.session_store import MemorySessionStore
+from settings import settings
+
+
+class MysticaAPITest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        llm = FakeChatModel(
+            responder=mystica_responder,
+            structured_responder=extraction_responder,
+            latency=LatencyModel(0, "constant"),
+        )
+        registry = FakeLLMRegistry(llm, llm, tempfile.mkdtemp())
+        cls.server = create_server(
+            "127.0.0.1", 0, MysticaService(registry, MemorySessionStore())
+        )
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def request(self, method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection(*self.server.server_address)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            raw = response.read()
+            return response.status, json.loads(raw) if raw else None
+        finally:
+            connection.close()
+
+    def create_session(self):
+        status, payload = self.request("POST", "/sessions")
+        self.assertEqual(status, 201)
+        return payload["session_id"]
+
+    def test_message_turn(self):
+        session_id = self.create_session()
+
+        status, payload = self.request(
+            "POST",
+            f"/sessions/{session_id}/messages",
+            json.dumps({"message": "My name is Somchai"}),
+        )
+
+        self.assertEqual(status, 200)
+        self.assertTrue(payload["messages"])
+        _, session = self.request("GET", f"/sessions/{session_id}")
+        self.assertEqual(session["profile"]["name"], "Somchai")
+
+    def test_handprint_is_added_to_the_chat(self):
+        session_id = self.create_session()
+        image = io.BytesIO()
+        Image.new("RGB", (320, 400), (200, 150, 120)).save(image, "JPEG")
+
+        status, payload = self.request(
+            "POST", f"/sessions/{session_id}/handprint", image.getvalue()
+        )
+
+        self.assertEqual(status, 200)
+        _, session = self.request("GET", f"/sessions/{session_id}")
+        self.assertEqual(
+            session["messages"][-1]["content"], payload["messages"][0]["content"]
+        )
+        self.assertIn(payload["analysis"], payload["messages"][0]["content"])
+
+    def test_unknown_session_is_404(self):
+        message = json.dumps({"message": "hello"})
+        self.assertEqual(self.request("GET", "/sessions/missing")[0], 404)
+        self.assertEqual(
+            self.request("POST", "/sessions/missing/messages", message)[0], 404
+        )
+
+    def test_deleted_session_is_404(self):
+        session_id = self.create_session()
+
+        self.assertEqual(self.request("DELETE", f"/sessions/{session_id}")[0], 204)
+        self.assertEqual(self.request("GET", f"/sessions/{session_id}")[0], 404)
+
+    def test_unknown_route_is_404(self):
+        self.assertEqual(self.request("GET", "/nowhere")[0], 404)
+        self.assertEqual(self.request("POST", "/sessions/a/b/c")[0], 404)
+        self.assertEqual(self.request("DELETE", "/sessions")[0], 404)
+
+    def test_bad_message_body_is_400(self):
+        session_id = self.create_session()
+        path = f"/sessions/{session_id}/messages"
+
+        for body in (
+            "not json",
+            "[]",
+            '{"text": "hi"}',
+            '{"message": 3}',
+            '{"message": " "}',
+        ):
+            with self.subTest(body=body):
+                status, payload = self.request("POST", path, body)
+                self.assertEqual(status, 400)
+                self.assertIn("message", payload["error"])
+
+    def test_bad_handprint_is_400(self):
+        session_id = self.create_session()
+
+        status, _ = self.request(
+            "POST", f"/sessions/{session_id}/handprint", b"not an image"
+        )
+
+        self.assertEqual(status, 400)
+
+    def test_oversized_body_is_413(self):
+        session_id = self.create_session()
+        length = settings.SERVICE_MAX_BODY_BYTES + 1
+
+        # The body is refused on its Content-Length, before it is read
+        status, _ = self.request(
+            "POST",
+            f"/sessions/{session_id}/handprint",
+            headers={"Content-Length": str(length)},
+        )
+
+        self.assertEqual(status, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
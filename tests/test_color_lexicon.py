@@ -0,0 +1,66 @@
+"""
+Tests for the shared color lexicon and its streaming scanner
+"""
+
+import unittest
+
+from utils.color_lexicon import ColorLexicon, color_lexicon
+
+TEXT = "A golden glow and crimson rose await you; redeem the navy blue night."
+
+
+class ColorLexiconTest(unittest.TestCase):
+    def test_matches_whole_words_only(self):
+        scan = color_lexicon.extract(TEXT)
+
+        self.assertEqual(
+            [m.term for m in scan.mentions], ["golden", "crimson", "rose", "blue"]
+        )
+        self.assertEqual(scan.colors, ["Gold", "Red", "Pink", "Blue"])
+
+    def test_offsets_point_into_the_text(self):
+        for mention in color_lexicon.scan(TEXT):
+            self.assertEqual(TEXT[mention.start : mention.end].lower(), mention.term)
+
+    def test_longest_term_wins(self):
+        lexicon = ColorLexicon(["gold", "golden"], {"golden": "Gold"})
+
+        self.assertEqual(
+            [m.term for m in lexicon.scan("golden gold")], ["golden", "gold"]
+        )
+
+
+class IncrementalColorScannerTest(unittest.TestCase):
+    def stream(self, chunks):
+        scanner = color_lexicon.scanner()
+        new = [scanner.feed(chunk) for chunk in chunks] + [scanner.finish()]
+        return scanner, new
+
+    def test_any_chunking_matches_a_full_scan(self):
+        expected = color_lexicon.scan(TEXT)
+        for size in range(1, 12):
+            chunks = [TEXT[i : i + size] for i in range(0, len(TEXT), size)]
+            scanner, _ = self.stream(chunks)
+            self.assertEqual(scanner.scan.mentions, expected, f"chunk size {size}")
+
+    def test_word_split_across_chunks_is_not_misread(self):
+        # "red" alone is a color, but it is the start of "redeem"
+        scanner, new = self.stream(["we red", "eem the gol", "den hour"])
+
+        self.assertEqual(new, [[], [], ["Gold"], []])
+        self.assertEqual([m.term for m in scanner.scan.mentions], ["golden"])
+
+    def test_reports_each_color_once(self):
+        scanner, new = self.stream(["red roses, ", "crimson skies, ", "and red"])
+
+        self.assertEqual(new, [["Red"], [], [], []])
+        self.assertEqual(scanner.scan.counts, {"Red": 3})
+
+    def test_finish_scans_the_trailing_word(self):
+        scanner, new = self.stream(["under a silver"])
+
+        self.assertEqual(new, [[], ["Silver"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Tests for the local divination intent classifier
+"""
+
+import unittest
+
+from agents.intent import DivinationIntentClassifier
+from benchmarks.intent_accuracy import LABELED_UTTERANCES
+
+ALL = ["work", "love", "wealth"]
+
+
+class DivinationIntentClassifierTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.classifier = DivinationIntentClassifier()
+
+    def assertClassifies(self, utterance, expected):
+        self.assertEqual(self.classifier.classify(utterance).categories, expected)
+
+    def test_negation_drops_categories(self):
+        self.assertClassifies("not love, only work", ["work"])
+        self.assertClassifies("no love or work please", [])
+        self.assertClassifies("I don't care about money, tell me about love", ["love"])
+
+    def test_negation_ends_with_the_clause(self):
+        self.assertClassifies("not interested in love, just work", ["work"])
+        self.assertClassifies("never mind wealth. love please", ["love"])
+
+    def test_but_negates_only_after_all(self):
+        self.assertClassifies("all but wealth", ["work", "love"])
+        self.assertClassifies("everything except love", ["work", "wealth"])
+        self.assertClassifies("not love but work", ["work"])
+
+    def test_negated_all_keeps_the_named_category(self):
+        self.assertClassifies("not everything, just love", ["love"])
+
+    def test_thai_negation(self):
+        self.assertClassifies("ไม่เอาความรัก ขอเรื่องงาน", ["work"])
+        self.assertClassifies("ทุกด้านยกเว้นความรัก", ["work", "wealth"])
+
+    def test_affirmation_selects_all_unless_a_category_is_named(self):
+        self.assertClassifies("yes please", ALL)
+        self.assertClassifies("yes, love please", ["love"])
+
+    def test_everyday_words_are_not_typos(self):
+        self.assertClassifies("tell me about my health", [])
+        self.assertClassifies("honey, tell me", [])
+
+    def test_labeled_utterances(self):
+        for utterance, expected in LABELED_UTTERANCES:
+            with self.subTest(utterance=utterance):
+                self.assertClassifies(utterance, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
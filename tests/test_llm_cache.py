@@ -0,0 +1,93 @@
+"""
+Tests for the per-stage LLM response cache
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+from data.llm_cache import (
+    CACHE_HIT_INFO,
+    LLMResponseCache,
+    MemoryCacheBackend,
+    SQLiteCacheBackend,
+    make_cache_key,
+)
+
+
+class LLMResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = LLMResponseCache(MemoryCacheBackend(), "fortune")
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.lookup("prompt", "model"))
+        self.cache.update("prompt", "model", [Generation(text="reply")])
+
+        cached = self.cache.lookup("prompt", "model")
+
+        self.assertEqual([g.text for g in cached], ["reply"])
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.misses), (1, 1))
+        self.assertEqual(self.cache.stats.hit_rate, 0.5)
+
+    def test_hits_are_tagged_without_touching_the_entry(self):
+        self.cache.update("prompt", "model", [Generation(text="reply")])
+
+        self.assertTrue(
+            self.cache.lookup("prompt", "model")[0].generation_info[CACHE_HIT_INFO]
+        )
+        stored = self.cache.backend.get(make_cache_key("fortune", "prompt", "model"))
+        self.assertIsNone(stored.variants[0][0].generation_info)
+
+    def test_key_ignores_whitespace_but_not_model(self):
+        self.cache.update("a  prompt\n", "model", [Generation(text="reply")])
+
+        self.assertIsNotNone(self.cache.lookup("a prompt", "model"))
+        self.assertIsNone(self.cache.lookup("a prompt", "other-model"))
+
+    def test_expired_entries_miss(self):
+        cache = LLMResponseCache(MemoryCacheBackend(), "fortune", ttl_seconds=0.01)
+        cache.update("prompt", "model", [Generation(text="reply")])
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.lookup("prompt", "model"))
+
+    def test_variants_miss_until_all_are_generated(self):
+        cache = LLMResponseCache(MemoryCacheBackend(), "fortune", variants=2)
+        cache.update("prompt", "model", [Generation(text="first")])
+        self.assertIsNone(cache.lookup("prompt", "model"))
+
+        cache.update("prompt", "model", [Generation(text="second")])
+        texts = {cache.lookup("prompt", "model")[0].text for _ in range(50)}
+
+        self.assertEqual(texts, {"first", "second"})
+
+    def test_chat_model_is_called_once_per_prompt(self):
+        model = FakeListChatModel(responses=["first", "second"], cache=self.cache)
+
+        self.assertEqual(model.invoke("hello").content, "first")
+        self.assertEqual(model.invoke("hello").content, "first")
+        self.assertEqual(model.invoke("goodbye").content, "second")
+        self.assertEqual(self.cache.stats.hits, 1)
+
+
+class SQLiteCacheBackendTest(unittest.TestCase):
+    def test_entries_survive_reopening_and_evict_least_recent(self):
+        path = os.path.join(tempfile.mkdtemp(), "cache.db")
+        cache = LLMResponseCache(SQLiteCacheBackend(path, max_entries=2), "fortune")
+        for prompt in ("a", "b", "c"):
+            generation = ChatGeneration(message=AIMessage(content=prompt))
+            cache.update(prompt, "model", [generation])
+
+        reopened = LLMResponseCache(SQLiteCacheBackend(path, max_entries=2), "fortune")
+
+        self.assertIsNone(reopened.lookup("a", "model"))
+        self.assertEqual(reopened.lookup("c", "model")[0].text, "c")
+
+
+if __name__ == "__main__":
+    unittest.main()
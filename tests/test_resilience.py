@@ -0,0 +1,143 @@
+"""
+Tests for circuit breaking, timeouts and hedging of LLM calls
+"""
+
+import asyncio
+import time
+import unittest
+
+from core.exceptions import LLMUnavailableError
+from utils.async_runner import run_coroutine
+from utils.resilience import CircuitBreaker, LatencyTracker, LLMCallPolicy, deadline
+
+
+def make_breaker(**kwargs):
+    options = dict(failure_rate=0.5, min_calls=4, window_seconds=60, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker("model", **options)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_stays_closed_below_min_calls(self):
+        breaker = make_breaker()
+        for _ in range(3):
+            breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_opens_at_the_failure_rate(self):
+        breaker = make_breaker()
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = make_breaker(min_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_trial_success_closes(self):
+        breaker = make_breaker(min_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.allow()
+
+        breaker.record_success()
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_trial_failure_reopens(self):
+        breaker = make_breaker(min_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.allow()
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_abandoned_trial_frees_the_slot(self):
+        breaker = make_breaker(min_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.allow()
+
+        breaker.record_abandoned()
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+
+class LLMCallPolicyTest(unittest.TestCase):
+    def make_policy(self, **kwargs):
+        options = dict(breaker=make_breaker(), latencies=LatencyTracker())
+        options.update(kwargs)
+        return LLMCallPolicy("test", "model", **options)
+
+    def test_timeout_raises_unavailable_and_counts_as_failure(self):
+        policy = self.make_policy(timeout_seconds=0.01)
+
+        with self.assertRaises(LLMUnavailableError):
+            policy.invoke(lambda: asyncio.sleep(1))
+        self.assertEqual(len(policy.breaker._outcomes), 1)
+
+    def test_open_circuit_fails_fast(self):
+        policy = self.make_policy(breaker=make_breaker(min_calls=1))
+        policy.breaker.record_failure()
+        calls = []
+
+        async def call():
+            calls.append(1)
+
+        with self.assertRaises(LLMUnavailableError):
+            policy.invoke(call)
+        self.assertEqual(calls, [])
+
+    def test_spent_deadline_skips_the_call(self):
+        policy = self.make_policy()
+
+        with deadline(0):
+            with self.assertRaises(LLMUnavailableError):
+                policy.invoke(lambda: asyncio.sleep(0))
+
+    def test_hedge_returns_the_faster_duplicate(self):
+        latencies = LatencyTracker()
+        for _ in range(20):
+            latencies.record(0.01)
+        policy = self.make_policy(hedge=True, latencies=latencies)
+        delays = iter([1.0, 0.0])
+
+        async def call():
+            delay = next(delays)
+            await asyncio.sleep(delay)
+            return delay
+
+        start = time.perf_counter()
+        self.assertEqual(policy.invoke(call), 0.0)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_sync_call_on_the_loop_thread_raises(self):
+        policy = self.make_policy()
+
+        async def nested():
+            return policy.invoke(lambda: asyncio.sleep(0))
+
+        with self.assertRaises(RuntimeError):
+            run_coroutine(nested(), timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for session value encoding and the shared session stores
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from core.models import ChatRecord, UserProfile
+from data.session_store import (
+    MemorySessionStore,
+    SQLiteSessionStore,
+    decode_value,
+    encode_value,
+)
+
+
+class Unregistered:
+    pass
+
+
+class SessionValueEncodingTest(unittest.TestCase):
+    def test_session_types_round_trip(self):
+        value = {
+            "profile": UserProfile(name="Somchai", date_of_birth="12 March 1990"),
+            "messages": [ChatRecord(id=1, kind="assistant", content="สวัสดี")],
+            "step": 2,
+        }
+
+        self.assertEqual(decode_value(encode_value(value)), value)
+
+    def test_text_is_plain_json(self):
+        raw = encode_value(ChatRecord(id=1, kind="human", content="ความรัก"))
+
+        self.assertIn('"__type__": "ChatRecord"', raw)
+        self.assertIn("ความรัก", raw)
+
+    def test_other_objects_are_refused(self):
+        with self.assertRaises(TypeError):
+            encode_value(Unregistered())
+        with self.assertRaises(TypeError):
+            encode_value({1, 2})
+
+    def test_unknown_tags_are_refused(self):
+        with self.assertRaises(KeyError):
+            decode_value('{"__type__": "Unregistered"}')
+
+
+class SessionStoreContract:
+    """Behaviour every store shares; subclasses provide make_store"""
+
+    def make_store(self, ttl_seconds=60):
+        raise NotImplementedError
+
+    def test_set_get_and_defaults(self):
+        store = self.make_store()
+        profile = UserProfile(name="Somchai")
+        store.set("s1", "profile", profile)
+
+        self.assertEqual(store.get("s1", "profile"), profile)
+        self.assertEqual(store.get("s1", "missing", "default"), "default")
+        self.assertIsNone(store.get("s2", "profile"))
+
+    def test_append_builds_a_list(self):
+        store = self.make_store()
+        records = [ChatRecord(id=i, kind="human", content=str(i)) for i in range(3)]
+        for record in records:
+            store.append("s1", "messages", record)
+
+        self.assertEqual(store.get("s1", "messages"), records)
+        self.assertEqual(store.items("s1"), {"messages": records})
+
+    def test_set_replaces_an_appended_list(self):
+        store = self.make_store()
+        store.append("s1", "messages", "old")
+        store.set("s1", "messages", ["new"])
+        store.append("s1", "messages", "newer")
+
+        self.assertEqual(store.get("s1", "messages"), ["new", "newer"])
+
+    def test_delete(self):
+        store = self.make_store()
+        store.set("s1", "step", 1)
+        store.set("s2", "step", 2)
+        store.delete("s1")
+
+        self.assertEqual(store.items("s1"), {})
+        self.assertEqual(store.get("s2", "step"), 2)
+
+    def test_sessions_expire(self):
+        store = self.make_store(ttl_seconds=0.05)
+        store.set("s1", "step", 1)
+        time.sleep(0.1)
+
+        self.assertIsNone(store.get("s1", "step"))
+
+
+class MemorySessionStoreTest(SessionStoreContract, unittest.TestCase):
+    def make_store(self, ttl_seconds=60):
+        return MemorySessionStore(ttl_seconds=ttl_seconds)
+
+
+class SQLiteSessionStoreTest(SessionStoreContract, unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "sessions.sqlite3")
+
+    def make_store(self, ttl_seconds=60):
+        return SQLiteSessionStore(self.path, ttl_seconds=ttl_seconds)
+
+    def test_unsupported_values_are_refused(self):
+        with self.assertRaises(TypeError):
+            self.make_store().set("s1", "thing", Unregistered())
+
+    def test_values_are_shared_between_connections(self):
+        self.make_store().append("s1", "messages", ChatRecord(1, "human", "hi"))
+
+        self.assertEqual(
+            self.make_store().get("s1", "messages"), [ChatRecord(1, "human", "hi")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
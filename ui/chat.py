@@ -2,11 +2,14 @@
 Chat interface component for Mystica Oracle
 """
 
+from typing import Iterable
+
 import streamlit as st
-from langchain_core.messages import AIMessage, HumanMessage
 
+from core.models import MESSAGE_KIND_RECOMMENDATION, MESSAGE_KIND_USER, ChatRecord
 from settings import settings
 from ui.state import StateManager
+from utils.tracing import tracer
 
 
 class ChatInterface:
@@ -14,6 +17,7 @@ class ChatInterface:
 
     def __init__(self, state_manager: StateManager):
         self.state_manager = state_manager
+        self._chat_container = None
 
     def render(self):
         """Render the chat interface and return user input"""
@@ -21,35 +25,52 @@ class ChatInterface:
 
         # Create chat container with fixed height
         chat_container = st.container(height=settings.CHAT_HEIGHT)
+        self._chat_container = chat_container
 
-        # Get messages from state
-        messages = self.state_manager.get_messages()
-
-        # Render messages
+        # Render the latest turns
         with chat_container:
-            for msg in messages:
-                if isinstance(msg, HumanMessage):
-                    self._render_user_message(msg)
-                elif isinstance(msg, AIMessage):
-                    self._render_assistant_message(msg)
+            self._render_history()
 
         # Return chat input
         return st.chat_input("Whisper your query to Mystica...")
 
-    def _render_user_message(self, message: HumanMessage):
-        """Render a user message"""
-        st.chat_message(settings.CHAT_USER_AVATAR).write(message.content)
+    @st.fragment
+    def _render_history(self):
+        """Render the latest turns; "load earlier" reruns only this fragment"""
+        records = self.state_manager.get_chat_records()
+        turn_starts = self.state_manager.get_turn_starts()
+        window_turns = self.state_manager.get_chat_window_turns()
+
+        start = 0
+        if len(turn_starts) > window_turns:
+            start = turn_starts[-window_turns]
+            st.button(
+                "Load earlier messages",
+                key="load_earlier_messages",
+                on_click=self.state_manager.set_chat_window_turns,
+                args=(window_turns + settings.CHAT_WINDOW_TURNS,),
+            )
+
+        with tracer.span("ui.render_history", messages=len(records) - start):
+            for record in records[start:]:
+                if record.kind == MESSAGE_KIND_USER:
+                    st.chat_message(settings.CHAT_USER_AVATAR).markdown(record.content)
+                else:
+                    st.chat_message("assistant", avatar=self._avatar(record)).markdown(
+                        record.content
+                    )
 
-    def _render_assistant_message(self, message: AIMessage):
-        """Render an assistant message"""
-        # Check if this is a recommendation message
-        if self._is_recommendation_message(message.content):
-            avatar = settings.CHAT_RECOMMENDATION_AVATAR
-        else:
-            avatar = settings.CHAT_ASSISTANT_AVATAR
+    def render_stream(self, user_input: str, chunks: Iterable[str]) -> str:
+        """Render the pending user message and stream Mystica's reply into the chat"""
+        container = self._chat_container or st.container(height=settings.CHAT_HEIGHT)
 
-        st.chat_message("assistant", avatar=avatar).write(message.content)
+        with container:
+            st.chat_message(settings.CHAT_USER_AVATAR).write(user_input)
+            with st.chat_message("assistant", avatar=settings.CHAT_ASSISTANT_AVATAR):
+                return st.write_stream(chunks)
 
-    def _is_recommendation_message(self, content: str) -> bool:
-        """Check if message contains product recommendations"""
-        return "🎁" in content and "Mystica also senses" in content
+    def _avatar(self, record: ChatRecord) -> str:
+        """Avatar of an assistant chat record"""
+        if record.kind == MESSAGE_KIND_RECOMMENDATION:
+            return settings.CHAT_RECOMMENDATION_AVATAR
+        return settings.CHAT_ASSISTANT_AVATAR
@@ -3,8 +3,11 @@ Control panel component for Mystica Oracle
 """
 
 import streamlit as st
-from langchain_core.messages import AIMessage
-from utils.image_processing import convert_image_to_base64
+from utils.image_processing import (
+    compute_content_hash,
+    prepare_handprint_image,
+    read_upload_bytes,
+)
 
 from agents.workflow import MysticaWorkflow
 from settings import settings
@@ -28,6 +31,12 @@ class ControlPanel:
         # Oracle's knowledge section
         self._render_oracle_knowledge()
 
+        if settings.SHOW_SESSION_MEMORY:
+            self._render_session_memory()
+
+        if settings.SHOW_TRACE_WATERFALL:
+            self._render_trace_waterfall()
+
     def _render_handprint_upload(self):
         """Render handprint upload section"""
         uploaded_file = st.file_uploader(
@@ -41,16 +50,15 @@ class ControlPanel:
 
     def _handle_handprint_upload(self, uploaded_file):
         """Handle handprint image upload"""
-        # Check if it's a new file
-        last_filename = self.state_manager.get_handprint_state("last_uploaded_filename")
+        # Check if it's a new image (by content, not filename)
+        content_hash = compute_content_hash(read_upload_bytes(uploaded_file))
+        last_hash = self.state_manager.get_handprint_state("last_uploaded_hash")
 
-        if last_filename != uploaded_file.name:
+        if last_hash != content_hash:
             self.state_manager.set_handprint_state(
                 "handprint_analyzed_for_current_file", False
             )
-            self.state_manager.set_handprint_state(
-                "last_uploaded_filename", uploaded_file.name
-            )
+            self.state_manager.set_handprint_state("last_uploaded_hash", content_hash)
 
         # Display image
         st.image(
@@ -72,11 +80,11 @@ class ControlPanel:
         if st.button("Analyze Handprint with Mystica", key="analyze_handprint_btn"):
             with st.spinner("Mystica consults the lines of your hand..."):
                 try:
-                    # Convert image to base64
-                    image_base64 = convert_image_to_base64(uploaded_file)
+                    # Orient, crop and downscale the photo for the vision model
+                    handprint_image = prepare_handprint_image(uploaded_file)
 
                     # Analyze handprint
-                    analysis = self.workflow.process_handprint(image_base64)
+                    analysis = self.workflow.process_handprint(handprint_image)
 
                     # Mark as analyzed
                     self.state_manager.set_handprint_state(
@@ -84,11 +92,9 @@ class ControlPanel:
                     )
 
                     # Add message about analysis
-                    message = AIMessage(
-                        content=f'Mystica has gleaned from your palm: "{analysis}" '
-                        f"This insight will guide our session."
+                    self.state_manager.add_message(
+                        self.workflow.handprint_message(analysis)
                     )
-                    self.state_manager.add_message(message)
 
                     st.rerun()
 
@@ -101,6 +107,12 @@ class ControlPanel:
         if profile.handprint_analysis:
             st.success("Palm analysis incorporated.")
 
+            # The uploader forgets the file on the next page load; the
+            # session's leased copy in the blob store does not
+            image = self.workflow.get_handprint_image(profile)
+            if image is not None:
+                st.image(image, caption="Your palm", width=160)
+
     def _render_oracle_knowledge(self):
         """Display Oracle's current knowledge"""
         st.markdown("---")
@@ -119,3 +131,58 @@ class ControlPanel:
             st.caption(f"Handprint: {profile.handprint_analysis}")
         else:
             st.caption("Handprint: Not yet offered")
+
+    def _render_session_memory(self):
+        """Display how much server memory this session holds"""
+        report = self.state_manager.get_memory_report()
+        total_kb = sum(report.values()) / 1024
+
+        with st.expander(f"Session memory: {total_kb:.1f} KB"):
+            for key, size in sorted(report.items(), key=lambda item: -item[1]):
+                st.caption(f"{key}: {size / 1024:.1f} KB")
+
+            blob_store = self.workflow.blob_store
+            if blob_store is not None:
+                stats = blob_store.stats
+                st.caption(
+                    f"Blob store (shared): {stats.blobs} blobs, "
+                    f"{stats.size_bytes / 1024**2:.1f} MB, {stats.leased} leased"
+                )
+
+    def _render_trace_waterfall(self):
+        """Display when each stage of the latest turn started and how long it took"""
+        trace = self.state_manager.get_last_trace()
+        if trace is None:
+            return
+
+        # Only this debug view needs altair, which is slow to import
+        import altair as alt
+
+        records = trace.to_records()
+        bars = [
+            {
+                "span": f"{r['name']} ({r['duration_ms']:.0f} ms)",
+                "start": r["offset_ms"],
+                "end": r["offset_ms"] + r["duration_ms"],
+            }
+            for r in records
+        ]
+        with st.expander(f"Last {trace.name}: {records[0]['duration_ms']:.0f} ms"):
+            chart = (
+                alt.Chart(alt.Data(values=bars))
+                .mark_bar()
+                .encode(
+                    x=alt.X("start:Q", title="ms"),
+                    x2="end:Q",
+                    y=alt.Y("span:N", sort=None, title=None),
+                )
+            )
+            st.altair_chart(chart, use_container_width=True)
+
+            # Model, tokens, cache hits and retries recorded on each span
+            for r in records:
+                details = [f"{k}={v}" for k, v in r["attributes"].items()]
+                if r["error"]:
+                    details.append(f"error={r['error']}")
+                if details:
+                    st.caption(f"{r['name']}: {', '.join(details)}")
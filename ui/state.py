@@ -2,66 +2,181 @@
 State management for Mystica Oracle UI
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, MutableMapping, Optional
 
 import streamlit as st
-from langchain_core.messages import BaseMessage
-
-from core.models import UserProfile
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from core.interfaces import SessionStore
+from core.models import (
+    MESSAGE_KIND_ASSISTANT,
+    MESSAGE_KIND_RECOMMENDATION,
+    MESSAGE_KIND_USER,
+    ChatRecord,
+    UserProfile,
+)
+from data.blob_store import BlobLease
 from settings import settings
+from utils.memory import deep_sizeof
+from utils.tracing import Trace
 
 
-class StateManager:
-    """Manages application state"""
+class StreamlitSessionStore:
+    """Session store over st.session_state; Streamlit keeps one per browser session"""
+
+    def get(self, session_id: str, key: str, default: Any = None) -> Any:
+        """Get a session value"""
+        return st.session_state.get(key, default)
+
+    def set(self, session_id: str, key: str, value: Any):
+        """Set a session value"""
+        st.session_state[key] = value
+
+    def append(self, session_id: str, key: str, value: Any):
+        """Append a value to a session list"""
+        st.session_state.setdefault(key, []).append(value)
+
+    def items(self, session_id: str) -> Dict[str, Any]:
+        """Get every value of the session"""
+        return {str(key): value for key, value in st.session_state.items()}
 
-    def __init__(self):
+    def delete(self, session_id: str):
+        """Forget the session"""
+        st.session_state.clear()
+
+
+class StateManager:
+    """
+    Manages application state
+
+    State lives in a SessionStore, st.session_state by default. Values only
+    meaningful to this process (blob leases, render caches) are kept in a
+    separate local mapping, since they cannot be shared between workers.
+    """
+
+    def __init__(
+        self,
+        store: Optional[SessionStore] = None,
+        session_id: str = "streamlit",
+        local: Optional[MutableMapping[str, Any]] = None,
+    ):
         self.key_prefix = settings.STATE_KEY_PREFIX
+        self.store = store or StreamlitSessionStore()
+        self.session_id = session_id
+        self.local = st.session_state if local is None else local
+
+    def _get(self, name: str, default: Any = None) -> Any:
+        """Get a prefixed value from the session store"""
+        return self.store.get(self.session_id, f"{self.key_prefix}{name}", default)
+
+    def _set(self, name: str, value: Any):
+        """Set a prefixed value in the session store"""
+        self.store.set(self.session_id, f"{self.key_prefix}{name}", value)
+
+    def _append(self, name: str, value: Any):
+        """Append to a prefixed list in the session store"""
+        self.store.append(self.session_id, f"{self.key_prefix}{name}", value)
 
     def get_user_profile(self) -> UserProfile:
         """Get current user profile from session state"""
-        key = f"{self.key_prefix}user_profile"
-        if key not in st.session_state:
-            return UserProfile()
-        return st.session_state[key]
+        profile = self._get("user_profile")
+        return UserProfile() if profile is None else profile
 
     def set_user_profile(self, profile: UserProfile):
         """Set user profile in session state"""
-        st.session_state[f"{self.key_prefix}user_profile"] = profile
+        self._set("user_profile", profile)
 
     def get_messages(self) -> List[BaseMessage]:
         """Get conversation messages"""
-        key = f"{self.key_prefix}messages"
-        if key not in st.session_state:
-            return []
-        return st.session_state[key]
+        messages: List[BaseMessage] = []
+        for record in self.get_chat_records():
+            if record.kind == MESSAGE_KIND_USER:
+                messages.append(HumanMessage(content=record.content))
+            elif record.kind == MESSAGE_KIND_RECOMMENDATION:
+                messages.append(AIMessage(content=record.content, name=record.kind))
+            else:
+                messages.append(AIMessage(content=record.content))
+        return messages
+
+    def get_chat_records(self) -> List[ChatRecord]:
+        """Get conversation messages as stored chat records"""
+        return self._get("chat_records", [])
+
+    def get_turn_starts(self) -> List[int]:
+        """Get the record index at which each user turn starts"""
+        return self._get("turn_starts", [])
 
     def add_message(self, message: BaseMessage):
         """Add a message to the conversation"""
-        key = f"{self.key_prefix}messages"
-        if key not in st.session_state:
-            st.session_state[key] = []
-        st.session_state[key].append(message)
+        index = self._get("chat_record_count", 0)
+
+        # Classify once here rather than on every rerender
+        if isinstance(message, HumanMessage):
+            kind = MESSAGE_KIND_USER
+            self._append("turn_starts", index)
+        elif message.name == MESSAGE_KIND_RECOMMENDATION:
+            kind = MESSAGE_KIND_RECOMMENDATION
+        else:
+            kind = MESSAGE_KIND_ASSISTANT
+
+        # Appended rather than rewritten, so a message costs the same at any
+        # length of conversation
+        self._append(
+            "chat_records", ChatRecord(id=index, kind=kind, content=message.content)
+        )
+        self._set("chat_record_count", index + 1)
+
+    def get_chat_window_turns(self) -> int:
+        """Get how many of the latest turns the chat shows"""
+        return self._get("chat_window_turns", settings.CHAT_WINDOW_TURNS)
+
+    def set_chat_window_turns(self, turns: int):
+        """Set how many of the latest turns the chat shows"""
+        self._set("chat_window_turns", turns)
 
     def get_color_associations(self) -> Optional[List[str]]:
         """Get current color associations"""
-        return st.session_state.get(f"{self.key_prefix}color_associations")
+        return self._get("color_associations")
 
     def set_color_associations(self, colors: Optional[List[str]]):
         """Set color associations"""
-        st.session_state[f"{self.key_prefix}color_associations"] = colors
+        self._set("color_associations", colors)
 
     def is_initialized(self) -> bool:
         """Check if the application is initialized"""
-        return f"{self.key_prefix}initialized" in st.session_state
+        return bool(self._get("initialized", False))
 
     def set_initialized(self):
         """Mark application as initialized"""
-        st.session_state[f"{self.key_prefix}initialized"] = True
+        self._set("initialized", True)
 
     def get_handprint_state(self, key: str, default=None):
         """Get handprint-related state"""
-        return st.session_state.get(key, default)
+        return self.store.get(self.session_id, key, default)
 
     def set_handprint_state(self, key: str, value):
         """Set handprint-related state"""
-        st.session_state[key] = value
+        self.store.set(self.session_id, key, value)
+
+    def get_handprint_lease(self) -> Optional[BlobLease]:
+        """Get the lease pinning this session's handprint image"""
+        return self.local.get(f"{self.key_prefix}handprint_lease")
+
+    def set_handprint_lease(self, lease: Optional[BlobLease]):
+        """Set the lease pinning this session's handprint image"""
+        self.local[f"{self.key_prefix}handprint_lease"] = lease
+
+    def get_last_trace(self) -> Optional[Trace]:
+        """Get the trace of this session's latest turn or handprint analysis"""
+        return self.local.get(f"{self.key_prefix}last_trace")
+
+    def set_last_trace(self, trace: Trace):
+        """Set the trace of this session's latest turn or handprint analysis"""
+        self.local[f"{self.key_prefix}last_trace"] = trace
+
+    def get_memory_report(self) -> Dict[str, int]:
+        """Approximate bytes held by each session state entry"""
+        return {
+            key: deep_sizeof(value)
+            for key, value in self.store.items(self.session_id).items()
+        }
@@ -0,0 +1,106 @@
+"""
+Process-wide event loop for running async workflow turns
+"""
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_shared_loop() -> asyncio.AbstractEventLoop:
+    """Get the shared event loop, starting it on a daemon thread if needed"""
+    global _loop
+
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="mystica-event-loop", daemon=True
+            )
+            thread.start()
+            _loop = loop
+
+    return _loop
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Event loop running in the current thread, if any"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def run_coroutine(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the shared event loop and wait for its result
+
+    Every Streamlit script thread submits its turn to the same loop, so
+    in-flight LLM calls from all sessions share one loop and one async
+    HTTP connection pool instead of blocking a thread each.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Optional number of seconds to wait for the result
+
+    Returns:
+        The coroutine's result
+
+    Raises:
+        RuntimeError: If called from the shared loop's own thread, where
+            waiting on the loop would deadlock; await the coroutine instead
+    """
+    loop = get_shared_loop()
+    if _running_loop() is loop:
+        if asyncio.iscoroutine(coro):
+            coro.close()
+        raise RuntimeError(
+            "Synchronous call made from the shared event loop thread; "
+            "use the async variant (await it) instead"
+        )
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result(timeout)
+
+
+def iterate_async(aiterator: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async iterator on the shared event loop from a sync caller
+
+    Every step runs in one context, so context variables set by the
+    iterator (such as the current tracing span) carry over between items.
+
+    Args:
+        aiterator: Async iterator (typically an async generator)
+
+    Yields:
+        Items produced by the async iterator
+    """
+    exhausted = object()
+    context = contextvars.copy_context()
+
+    async def _next():
+        try:
+            return await aiterator.__anext__()
+        except StopAsyncIteration:
+            return exhausted
+
+    async def _in_context(coro):
+        return await asyncio.get_running_loop().create_task(coro, context=context)
+
+    try:
+        while True:
+            item = run_coroutine(_in_context(_next()))
+            if item is exhausted:
+                return
+            yield item
+    finally:
+        aclose = getattr(aiterator, "aclose", None)
+        if aclose is not None:
+            run_coroutine(_in_context(aclose()))
@@ -0,0 +1,169 @@
+"""
+Color lexicon shared by the fortune teller and the product recommender
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple
+
+from settings import settings
+
+
+class ColorMention(NamedTuple):
+    """A color term found in text"""
+
+    term: str
+    color: str
+    start: int
+    end: int
+
+
+@dataclass
+class ColorScan:
+    """Color mentions found in a text, in order of appearance"""
+
+    mentions: List[ColorMention] = field(default_factory=list)
+
+    @property
+    def colors(self) -> List[str]:
+        """Canonical colors in order of first mention"""
+        return list(dict.fromkeys(mention.color for mention in self.mentions))
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """Number of mentions per canonical color"""
+        return dict(Counter(mention.color for mention in self.mentions))
+
+
+class ColorLexicon:
+    """
+    Maps color vocabulary to canonical colors with one compiled regex
+
+    Terms are matched case-insensitively on word boundaries, longest first,
+    so "golden" is not counted as "gold" and "redeem" is not "red". The
+    alternation is factored into a prefix trie so the regex engine tests
+    each position against a handful of branches rather than every term.
+    """
+
+    def __init__(
+        self,
+        vocabulary: List[str] = settings.COLOR_VOCABULARY,
+        canonical: Dict[str, str] = settings.COLOR_CANONICAL,
+    ):
+        self.canonical = {
+            term.lower(): canonical.get(term.lower(), term.capitalize())
+            for term in vocabulary
+        }
+        self.colors = sorted(set(self.canonical.values()))
+        alternation = _trie_pattern(self.canonical)
+        self.pattern = re.compile(rf"\b(?:{alternation})\b")
+        self._ignorecase_pattern = re.compile(self.pattern.pattern, re.IGNORECASE)
+
+    def scan(self, text: str, offset: int = 0) -> List[ColorMention]:
+        """Find every color mention in text, with positions shifted by offset"""
+        lowered = text.lower()
+
+        # Lowercasing a few non-ASCII characters changes their length
+        if len(lowered) != len(text):
+            matches = self._ignorecase_pattern.finditer(text)
+        else:
+            matches = self.pattern.finditer(lowered)
+
+        canonical = self.canonical
+        mentions = []
+        for match in matches:
+            term = match.group().lower()
+            mentions.append(
+                ColorMention(
+                    term, canonical[term], offset + match.start(), offset + match.end()
+                )
+            )
+        return mentions
+
+    def extract(self, text: str) -> ColorScan:
+        """Scan text in a single pass"""
+        return ColorScan(mentions=self.scan(text))
+
+    def normalize(self, color_string: str) -> str:
+        """Canonical color for a free-text color such as "Brown (for chocolate variant)" """
+        mentions = self.scan(color_string)
+        if mentions:
+            return mentions[0].color
+        return color_string.split("(")[0].strip().capitalize()
+
+    def scanner(self) -> "IncrementalColorScanner":
+        """Create a scanner for text that arrives in chunks"""
+        return IncrementalColorScanner(self)
+
+
+def _trie_pattern(terms) -> str:
+    """Build a regex alternation factored by common prefixes"""
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = "|".join(branches)
+        if "" in node:
+            # A term ends here; longer terms continue greedily
+            return f"(?:{body})?"
+        return body if len(branches) == 1 else f"(?:{body})"
+
+    return build(trie)
+
+
+class IncrementalColorScanner:
+    """Scans streamed text for colors, never splitting a word across chunks"""
+
+    # The last non-word character, i.e. where the trailing partial word begins
+    _LAST_BOUNDARY = re.compile(r"\W(?=\w*$)")
+
+    def __init__(self, lexicon: ColorLexicon):
+        self.lexicon = lexicon
+        self.scan = ColorScan()
+        self._pending = ""
+        self._offset = 0
+
+    @property
+    def colors(self) -> List[str]:
+        """Canonical colors seen so far, in order of first mention"""
+        return self.scan.colors
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk and return canonical colors not seen before"""
+        self._pending += chunk
+
+        # Only scan up to the last non-word character; the rest may be a partial word
+        match = self._LAST_BOUNDARY.search(self._pending)
+        return self._consume(match.end() if match else 0)
+
+    def finish(self) -> List[str]:
+        """Scan whatever text is left and return canonical colors not seen before"""
+        return self._consume(len(self._pending))
+
+    def _consume(self, cut: int) -> List[str]:
+        """Scan the pending text up to cut"""
+        if cut == 0:
+            return []
+
+        seen = set(self.scan.colors)
+        mentions = self.lexicon.scan(self._pending[:cut], self._offset)
+        self.scan.mentions.extend(mentions)
+        self._pending = self._pending[cut:]
+        self._offset += cut
+
+        return list(dict.fromkeys(m.color for m in mentions if m.color not in seen))
+
+
+color_lexicon = ColorLexicon()
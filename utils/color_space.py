@@ -0,0 +1,149 @@
+"""
+Perceptual color matching in CIELAB space
+
+Every term of the color vocabulary is placed in CIELAB (D65), where
+Euclidean distance (CIE76 delta E) roughly follows perceived difference.
+A product color matches a fortune color when it is within
+COLOR_MATCH_MAX_DISTANCE of it, with a similarity falling from 1 at the
+same color to 0 at the threshold, so "coral" finds orange and pink
+products and "violet" finds purple ones. Product colors sharing the
+fortune color's canonical color always match at least at
+COLOR_MATCH_CANONICAL_SIMILARITY, as before perceptual matching.
+
+The similarity of every vocabulary term to every color of a catalog is a
+small matrix, computed once per catalog (see CatalogRanker).
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from settings import settings
+from utils.color_lexicon import ColorLexicon, color_lexicon
+
+# D65 white point of CIE XYZ
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+# Linear sRGB to CIE XYZ (D65)
+_SRGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+
+
+def hex_to_rgb(value: str) -> np.ndarray:
+    """sRGB components, 0 to 255, of a "#RRGGBB" color"""
+    value = value.lstrip("#")
+    return np.array([int(value[i : i + 2], 16) for i in (0, 2, 4)], dtype=np.float64)
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """
+    CIELAB coordinates of sRGB colors
+
+    Args:
+        rgb: Array of shape (..., 3) with components from 0 to 255
+
+    Returns:
+        Array of the same shape holding L*, a* and b*
+    """
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _SRGB_TO_XYZ.T / _WHITE
+
+    epsilon, kappa = 216 / 24389, 24389 / 27
+    f = np.where(xyz > epsilon, np.cbrt(xyz), (kappa * xyz + 16) / 116)
+    return np.stack(
+        [
+            116 * f[..., 1] - 16,
+            500 * (f[..., 0] - f[..., 1]),
+            200 * (f[..., 1] - f[..., 2]),
+        ],
+        axis=-1,
+    )
+
+
+def lab_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """CIE76 delta E between every color of a and every color of b"""
+    return np.linalg.norm(a[:, None, :] - b[None, :, :], axis=-1)
+
+
+class ColorSpace:
+    """CIELAB coordinates of the color vocabulary and matching against it"""
+
+    def __init__(
+        self,
+        rgb: Dict[str, str] = settings.COLOR_RGB,
+        lexicon: ColorLexicon = color_lexicon,
+    ):
+        self.lexicon = lexicon
+        self.terms: List[str] = [term for term in lexicon.canonical if term in rgb]
+        self.lab = srgb_to_lab(np.array([hex_to_rgb(rgb[t]) for t in self.terms]))
+        self._rows = {term: row for row, term in enumerate(self.terms)}
+        self._term_cache: Dict[str, str] = {}
+
+    def term(self, color: str) -> str:
+        """
+        Lowercase color term of a free-text color
+
+        The first vocabulary term in it ("Emerald green" is "emerald"),
+        otherwise the text before any parenthesis, lowercased.
+        """
+        term = self._term_cache.get(color)
+        if term is None:
+            mentions = self.lexicon.scan(color)
+            if mentions:
+                term = mentions[0].term
+            else:
+                term = color.split("(")[0].strip().lower()
+            self._term_cache[color] = term
+        return term
+
+    def row(self, term: str) -> Optional[int]:
+        """Row of a vocabulary term in match matrices, None if it has no color"""
+        return self._rows.get(term)
+
+    def nearest(self, lab: np.ndarray) -> Tuple[str, float]:
+        """Vocabulary term nearest to a CIELAB color, and its delta E"""
+        distances = lab_distances(lab[None, :], self.lab)[0]
+        row = int(np.argmin(distances))
+        return self.terms[row], float(distances[row])
+
+    def match_matrix(
+        self,
+        colors: Sequence[str],
+        max_distance: float = settings.COLOR_MATCH_MAX_DISTANCE,
+        canonical_similarity: float = settings.COLOR_MATCH_CANONICAL_SIMILARITY,
+    ) -> np.ndarray:
+        """
+        Similarity of every vocabulary term to every color
+
+        Args:
+            colors: Color terms (see term), typically those of a catalog
+            max_distance: Delta E at and beyond which colors do not match
+            canonical_similarity: Least similarity of colors with the same
+                canonical color
+
+        Returns:
+            Array of shape (len(self.terms), len(colors)), 1 for the same
+            color and 0 for no match or a color outside the vocabulary
+        """
+        similarity = np.zeros((len(self.terms), len(colors)))
+        known = [i for i, color in enumerate(colors) if color in self._rows]
+        if not known:
+            return similarity
+
+        rows = [self._rows[colors[i]] for i in known]
+        near = np.clip(1 - lab_distances(self.lab, self.lab[rows]) / max_distance, 0, 1)
+        canonical = np.array([self.lexicon.canonical[term] for term in self.terms])
+        same = canonical[:, None] == canonical[rows][None, :]
+        similarity[:, known] = np.where(
+            same, np.maximum(near, canonical_similarity), near
+        )
+        return similarity
+
+
+color_space = ColorSpace()
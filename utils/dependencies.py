@@ -1,27 +1,66 @@
-import streamlit as st
-from langchain_openai import ChatOpenAI
+"""
+Dependency wiring for Mystica Oracle
+
+AgentRegistry builds the LLM clients, agents, caches and stores once per
+process; none of them hold session state, so every session and thread
+shares them. DIContainer binds them to one session on each Streamlit rerun
+(or service request), which costs a state manager and a workflow copy.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from langchain_core.language_models import BaseChatModel
 
 from agents.analyzers import VisionHandprintAnalyzer
 from agents.extractors import LLMMessageExtractor
-from agents.fortune_teller import MysticaFortuneGenerator
+from agents.fortune_teller import MysticaFortuneGenerator, MysticaFusedTurnGenerator
 from agents.recommenders import MysticaProductRecommender
 from agents.workflow import MysticaWorkflow
+from data.blob_store import BlobStore, create_blob_store
+from data.handprint_cache import HandprintAnalysisCache
+from data.llm_cache import create_cache_backend, create_stage_caches
+from data.reasons_store import ReasonBatcher, ReasonsRefresher, ReasonsStore
 from data.repositories import ProductRepository
+from data.session_store import create_session_store
+from data.text_index import TextIndex, load_text_index
 from settings import settings
 from ui.chat import ChatInterface
 from ui.controls import ControlPanel
 from ui.state import StateManager
+from utils.token_accounting import TokenAccountingCallback, token_accountant
 
+T = TypeVar("T")
 
-class DIContainer:
-    """Dependency injection container for managing app dependencies"""
+
+class AgentRegistry:
+    """Process-wide, thread-safe home of stateless agents, LLM clients and stores"""
 
     def __init__(self):
-        self._instances = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory: Callable[[], T]) -> T:
+        """Build an instance on first use; concurrent callers wait for that build"""
+        if name in self._instances:
+            return self._instances[name]
+
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._instances:
+                self._instances[name] = factory()
+        return self._instances[name]
+
+    def get_llms(self):
+        """Get the chat and vision LLM clients"""
+        return self._get("llms", self._create_llms)
+
+    def _create_llms(self):
+        # langchain_openai (and the openai SDK) take a while to import
+        from langchain_openai import ChatOpenAI
 
-    @st.cache_resource
-    def get_llms(_self):
-        """Get LLM instances (cached)"""
         llm = ChatOpenAI(
             model=settings.LLM_MODEL,
             temperature=settings.LLM_TEMPERATURE,
@@ -34,39 +73,164 @@ class DIContainer:
         )
         return llm, vision_llm
 
+    def get_llm_caches(self):
+        """Get per-stage LLM response caches over the shared backend"""
+        return self._get(
+            "llm_caches", lambda: create_stage_caches(create_cache_backend())
+        )
+
+    def get_stage_llm(self, stage: str) -> BaseChatModel:
+        """Get the LLM for a workflow stage, with token accounting and its cache if any"""
+        return self._get(f"llm.{stage}", lambda: self._create_stage_llm(stage))
+
+    def _create_stage_llm(self, stage: str) -> BaseChatModel:
+        llm, vision_llm = self.get_llms()
+        base_llm = vision_llm if stage == "handprint" else llm
+
+        update = {"callbacks": [TokenAccountingCallback(stage, base_llm.model_name)]}
+        cache = self.get_llm_caches().get(stage)
+        if cache is not None:
+            update["cache"] = cache
+        return base_llm.model_copy(update=update)
+
+    def get_token_usage(self):
+        """Get prompt and completion token totals per stage"""
+        return token_accountant.usage()
+
+    def get_llm_cache_stats(self):
+        """Get hit/miss counters per cached stage"""
+        return {stage: cache.stats for stage, cache in self.get_llm_caches().items()}
+
+    def get_reasons_store(self):
+        """Get the shared reasons store and its background refresher"""
+        return self._get("reasons_store", self._create_reasons_store)
+
+    def _create_reasons_store(self):
+        store = ReasonsStore()
+        refresher = ReasonsRefresher(
+            store,
+            MysticaProductRecommender(
+                self.get_stage_llm("reasons")
+            ).generate_fresh_reasons,
+        )
+        refresher.start()
+        return store, refresher
+
+    def get_reason_batcher(self) -> Optional[ReasonBatcher]:
+        """Get the batcher shared by all sessions' reason requests, if enabled"""
+        return self._get("reason_batcher", self._create_reason_batcher)
+
+    def _create_reason_batcher(self) -> Optional[ReasonBatcher]:
+        if not settings.REASONS_BATCHING:
+            return None
+        return ReasonBatcher(
+            MysticaProductRecommender(
+                self.get_stage_llm("reasons")
+            ).agenerate_fresh_reasons
+        )
+
+    def get_text_index(self) -> Optional[TextIndex]:
+        """Get the memory-mapped product text index, if it has been built"""
+        return self._get(
+            "text_index", lambda: load_text_index(settings.TEXT_INDEX_PATH)
+        )
+
+    def get_handprint_cache(self) -> HandprintAnalysisCache:
+        """Get the handprint analysis cache shared by all sessions"""
+        return self._get("handprint_cache", HandprintAnalysisCache)
+
+    def get_blob_store(self) -> BlobStore:
+        """Get the blob store shared by all sessions"""
+        return self._get("blob_store", create_blob_store)
+
+    def get_session_store(self):
+        """Get the session store shared by headless service sessions"""
+        return self._get("session_store", create_session_store)
+
+    def get_product_repository(self) -> ProductRepository:
+        """Get product repository instance"""
+        return self._get("product_repository", ProductRepository)
+
+    def get_fused_generator(self) -> Optional[MysticaFusedTurnGenerator]:
+        """Get the single-call extraction and fortune generator, if enabled"""
+        return self._get("fused_generator", self._create_fused_generator)
+
+    def _create_fused_generator(self) -> Optional[MysticaFusedTurnGenerator]:
+        if not settings.FUSED_TURN_MODE:
+            return None
+        return MysticaFusedTurnGenerator(self.get_stage_llm("fused"))
+
+    def get_workflow(self) -> MysticaWorkflow:
+        """Get the workflow and its agents, not yet bound to a session"""
+        return self._get("workflow", self._create_workflow)
+
+    def _create_workflow(self) -> MysticaWorkflow:
+        # Create service instances
+        extractor = LLMMessageExtractor(self.get_stage_llm("extraction"))
+        fortune_generator = MysticaFortuneGenerator(self.get_stage_llm("fortune"))
+        handprint_analyzer = VisionHandprintAnalyzer(self.get_stage_llm("handprint"))
+        reasons_store, reasons_refresher = self.get_reasons_store()
+        product_recommender = MysticaProductRecommender(
+            self.get_stage_llm("reasons"),
+            reasons_store=reasons_store,
+            reasons_refresher=reasons_refresher,
+            reason_batcher=self.get_reason_batcher(),
+            text_index=self.get_text_index(),
+        )
+
+        # Create workflow
+        return MysticaWorkflow(
+            extractor=extractor,
+            fortune_generator=fortune_generator,
+            handprint_analyzer=handprint_analyzer,
+            product_recommender=product_recommender,
+            product_repository=self.get_product_repository(),
+            handprint_cache=self.get_handprint_cache(),
+            blob_store=self.get_blob_store(),
+            fused_generator=self.get_fused_generator(),
+        )
+
+
+_registry: Optional[AgentRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> AgentRegistry:
+    """Get the process-wide registry, creating it on first use"""
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = AgentRegistry()
+
+    return _registry
+
+
+class DIContainer:
+    """Session-bound app objects over the process-wide AgentRegistry"""
+
+    def __init__(
+        self,
+        state_manager: Optional[StateManager] = None,
+        registry: Optional[AgentRegistry] = None,
+    ):
+        self.registry = registry or get_registry()
+        self._instances = {}
+        if state_manager is not None:
+            self._instances["state_manager"] = state_manager
+
     def get_state_manager(self) -> StateManager:
         """Get state manager instance"""
         if "state_manager" not in self._instances:
             self._instances["state_manager"] = StateManager()
         return self._instances["state_manager"]
 
-    def get_product_repository(self) -> ProductRepository:
-        """Get product repository instance"""
-        if "product_repository" not in self._instances:
-            self._instances["product_repository"] = ProductRepository()
-        return self._instances["product_repository"]
-
     def get_workflow(self) -> MysticaWorkflow:
-        """Get workflow instance"""
+        """Get the shared workflow bound to this session's state"""
         if "workflow" not in self._instances:
-            llm, vision_llm = self.get_llms()
-
-            # Create service instances
-            extractor = LLMMessageExtractor(llm)
-            fortune_generator = MysticaFortuneGenerator(llm)
-            handprint_analyzer = VisionHandprintAnalyzer(vision_llm)
-            product_recommender = MysticaProductRecommender(llm)
-
-            # Create workflow
-            self._instances["workflow"] = MysticaWorkflow(
-                extractor=extractor,
-                fortune_generator=fortune_generator,
-                handprint_analyzer=handprint_analyzer,
-                product_recommender=product_recommender,
-                product_repository=self.get_product_repository(),
-                state_manager=self.get_state_manager(),
+            self._instances["workflow"] = self.registry.get_workflow().for_session(
+                self.get_state_manager()
             )
-
         return self._instances["workflow"]
 
     def get_chat_interface(self) -> ChatInterface:
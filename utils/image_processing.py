@@ -1,7 +1,43 @@
 import base64
+import hashlib
 import io
+import math
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Tuple
 
-from PIL import Image
+import numpy as np
+
+from core.models import HandprintImage
+from settings import settings
+
+# PIL is imported where images are opened, keeping it off the app start path
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Vision model image budget (OpenAI high/low detail scaling rules)
+LOW_DETAIL_SIZE = 512
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+TILE_SIZE = 512
+BASE_TOKENS = 85
+TOKENS_PER_TILE = 170
+
+# Skin tone range in YCbCr used to locate the hand
+SKIN_CB_RANGE = (77, 127)
+SKIN_CR_RANGE = (133, 173)
+HAND_DETECTION_SIZE = 256
+HAND_MARGIN = 0.1
+
+# Perceptual hash grid (dHash compares horizontally adjacent pixels)
+DHASH_SIZE = 8
+
+# Shortest side to decode JPEGs at, leaving headroom for the hand crop
+DECODE_MIN_SIDE = 1200
+
+# Dominant color k-means: pixels within this CIELAB distance of the median
+# border color are background, unless that would leave too few pixels
+BACKGROUND_MAX_DISTANCE = 12.0
+BACKGROUND_MIN_FOREGROUND = 0.05
+KMEANS_MAX_ITERATIONS = 20
 
 
 def convert_image_to_base64(uploaded_file) -> str:
@@ -14,6 +50,8 @@ def convert_image_to_base64(uploaded_file) -> str:
     Returns:
         Base64 encoded string of the image
     """
+    from PIL import Image
+
     # Open image with PIL
     pil_image = Image.open(uploaded_file)
 
@@ -31,3 +69,347 @@ def convert_image_to_base64(uploaded_file) -> str:
     img_base64 = base64.b64encode(buffered.getvalue()).decode()
 
     return img_base64
+
+
+def prepare_handprint_image(
+    uploaded_file,
+    detail: str = settings.VISION_IMAGE_DETAIL,
+    target_bytes: int = settings.VISION_IMAGE_TARGET_BYTES,
+    crop_to_hand: bool = settings.VISION_IMAGE_CROP_TO_HAND,
+) -> HandprintImage:
+    """
+    Preprocess an uploaded handprint photo for the vision model
+
+    Applies EXIF orientation, crops to the hand when it can be found,
+    downscales to the vision model's tile budget and picks the highest
+    JPEG quality that fits the byte target.
+
+    Args:
+        uploaded_file: Streamlit uploaded file object (or any file-like object)
+        detail: Vision detail level, "low" or "high"
+        target_bytes: Size target for the JPEG payload
+        crop_to_hand: Whether to crop to the detected hand bounding box
+
+    Returns:
+        Preprocessed handprint image
+    """
+    from PIL import Image, ImageOps
+
+    raw = read_upload_bytes(uploaded_file)
+    pil_image = Image.open(io.BytesIO(raw))
+
+    # Let the JPEG decoder downscale in the DCT domain instead of decoding 12 MP
+    scale = DECODE_MIN_SIDE / min(pil_image.size)
+    if scale < 1:
+        pil_image.draft(
+            "RGB", (int(pil_image.width * scale), int(pil_image.height * scale))
+        )
+
+    ImageOps.exif_transpose(pil_image, in_place=True)
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+
+    # Crop to the hand so the tile budget is spent on the palm
+    if crop_to_hand:
+        bbox = find_hand_bbox(pil_image)
+        if bbox is not None:
+            pil_image = pil_image.crop(bbox)
+
+    # Downscale to what the vision model will actually look at
+    size = fit_to_vision_budget(pil_image.width, pil_image.height, detail)
+    if size != pil_image.size:
+        pil_image = pil_image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    data = encode_jpeg_to_target(pil_image, target_bytes)
+
+    return HandprintImage(
+        data=data,
+        detail=detail,
+        width=pil_image.width,
+        height=pil_image.height,
+        content_hash=compute_content_hash(raw),
+        perceptual_hash=compute_dhash(pil_image),
+    )
+
+
+def read_upload_bytes(uploaded_file) -> bytes:
+    """Read the raw bytes of an uploaded file without consuming it"""
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+
+    position = uploaded_file.tell()
+    raw = uploaded_file.read()
+    uploaded_file.seek(position)
+    return raw
+
+
+def compute_content_hash(raw: bytes) -> str:
+    """SHA-256 of the raw uploaded bytes"""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def compute_dhash(image: "Image.Image") -> int:
+    """
+    64-bit difference hash of an image
+
+    Near-duplicate photos (re-encoded, resized, slightly re-lit) land
+    within a few bits of each other.
+    """
+    from PIL import Image
+
+    gray = image.convert("L").resize(
+        (DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS
+    )
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def find_hand_bbox(image: "Image.Image") -> Optional[Tuple[int, int, int, int]]:
+    """
+    Find the bounding box of the hand using a YCbCr skin-tone mask
+
+    Returns:
+        (left, upper, right, lower) box in image coordinates, or None when no
+        plausible hand region is found
+    """
+    small = image.reduce(max(1, max(image.size) // HAND_DETECTION_SIZE))
+    ycbcr = np.asarray(small.convert("YCbCr"))
+
+    cb = ycbcr[..., 1]
+    cr = ycbcr[..., 2]
+    mask = (
+        (cb >= SKIN_CB_RANGE[0])
+        & (cb <= SKIN_CB_RANGE[1])
+        & (cr >= SKIN_CR_RANGE[0])
+        & (cr <= SKIN_CR_RANGE[1])
+    )
+
+    # Too little or too much skin means the mask is not telling us anything
+    coverage = mask.mean()
+    if coverage < 0.05 or coverage > 0.9:
+        return None
+
+    # Ignore sparse rows/columns so stray skin-colored pixels don't widen the box
+    rows = np.flatnonzero(mask.mean(axis=1) > 0.05)
+    cols = np.flatnonzero(mask.mean(axis=0) > 0.05)
+    if rows.size == 0 or cols.size == 0:
+        return None
+
+    scale_x = image.width / small.width
+    scale_y = image.height / small.height
+    margin_x = (cols[-1] - cols[0] + 1) * HAND_MARGIN
+    margin_y = (rows[-1] - rows[0] + 1) * HAND_MARGIN
+
+    left = max(0, int((cols[0] - margin_x) * scale_x))
+    upper = max(0, int((rows[0] - margin_y) * scale_y))
+    right = min(image.width, int(math.ceil((cols[-1] + 1 + margin_x) * scale_x)))
+    lower = min(image.height, int(math.ceil((rows[-1] + 1 + margin_y) * scale_y)))
+
+    if right - left < 32 or lower - upper < 32:
+        return None
+    return left, upper, right, lower
+
+
+def fit_to_vision_budget(
+    width: int,
+    height: int,
+    detail: str = settings.VISION_IMAGE_DETAIL,
+    max_tiles: int = settings.VISION_IMAGE_MAX_TILES,
+) -> Tuple[int, int]:
+    """Get the largest size the vision model uses without exceeding the tile budget"""
+    if detail == "low":
+        scale = min(1.0, LOW_DETAIL_SIZE / max(width, height))
+    else:
+        scale = min(
+            1.0,
+            HIGH_DETAIL_MAX_SIDE / max(width, height),
+            HIGH_DETAIL_SHORT_SIDE / min(width, height),
+        )
+        while count_tiles(width * scale, height * scale) > max_tiles:
+            scale *= 0.9
+
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def count_tiles(width: float, height: float) -> int:
+    """Count the 512px tiles a high detail image is billed for"""
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def estimate_vision_tokens(
+    width: int, height: int, detail: str = settings.VISION_IMAGE_DETAIL
+) -> int:
+    """Estimate the input tokens the vision model bills for an image"""
+    if detail == "low":
+        return BASE_TOKENS
+
+    # The model scales high detail images the same way before tiling
+    scale = min(
+        1.0,
+        HIGH_DETAIL_MAX_SIDE / max(width, height),
+        HIGH_DETAIL_SHORT_SIDE / min(width, height),
+    )
+    return BASE_TOKENS + TOKENS_PER_TILE * count_tiles(width * scale, height * scale)
+
+
+def encode_jpeg_to_target(
+    image: "Image.Image",
+    target_bytes: int,
+    min_quality: int = settings.VISION_IMAGE_MIN_QUALITY,
+    max_quality: int = settings.VISION_IMAGE_MAX_QUALITY,
+) -> bytes:
+    """Encode as JPEG with the highest quality whose size fits the target"""
+    best = _encode_jpeg(image, min_quality)
+    if len(best) > target_bytes:
+        return best
+
+    # Binary search over quality; size grows monotonically with quality
+    low, high = min_quality + 1, max_quality
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode_jpeg(image, quality)
+        if len(data) <= target_bytes:
+            best = data
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    return best
+
+
+def _encode_jpeg(image: "Image.Image", quality: int) -> bytes:
+    """Encode an image as JPEG at the given quality"""
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=quality)
+    return buffered.getvalue()
+
+
+class DominantColor(NamedTuple):
+    """A color cluster of an image"""
+
+    rgb: Tuple[int, int, int]
+    lab: np.ndarray
+    weight: float
+
+
+def dominant_colors(
+    image: "Image.Image", clusters: int, sample_side: int, seed: int = 0
+) -> List[DominantColor]:
+    """
+    Dominant colors of a product packshot, heaviest first
+
+    The image is downsampled to sample_side, the background (the color of
+    the border) and transparent pixels are dropped, and the rest are
+    clustered with k-means in CIELAB.
+
+    Args:
+        image: Image in any mode
+        clusters: Number of k-means clusters
+        sample_side: Longest side the image is downsampled to
+        seed: Seed of the k-means initialization
+
+    Returns:
+        Clusters with their mean color and share of the foreground pixels
+    """
+    from PIL import Image
+
+    from utils.color_space import lab_distances, srgb_to_lab
+
+    image.draft("RGB", (sample_side, sample_side))
+    image = image.convert("RGBA")
+    image.thumbnail((sample_side, sample_side), Image.Resampling.BOX)
+    pixels = np.asarray(image, dtype=np.float64)
+
+    rgb, opaque = pixels[..., :3], pixels[..., 3] >= 128
+    lab = srgb_to_lab(rgb)
+    border = np.concatenate([lab[0], lab[-1], lab[1:-1, 0], lab[1:-1, -1]])
+    border_opaque = np.concatenate(
+        [opaque[0], opaque[-1], opaque[1:-1, 0], opaque[1:-1, -1]]
+    )
+
+    keep = opaque
+    if border_opaque.any():
+        background = np.median(border[border_opaque], axis=0)
+        distance = lab_distances(lab.reshape(-1, 3), background[None, :])[:, 0]
+        foreground = opaque & (distance.reshape(opaque.shape) > BACKGROUND_MAX_DISTANCE)
+        if foreground.sum() >= BACKGROUND_MIN_FOREGROUND * opaque.size:
+            keep = foreground
+    if not keep.any():
+        return []
+
+    points, colors = lab[keep], rgb[keep]
+    labels, centers = kmeans(points, min(clusters, len(points)), seed=seed)
+    counts = np.bincount(labels, minlength=len(centers))
+    mean_rgb = (
+        np.stack(
+            [
+                np.bincount(labels, weights=colors[:, c], minlength=len(centers))
+                for c in range(3)
+            ],
+            axis=-1,
+        )
+        / np.maximum(counts, 1)[:, None]
+    )
+
+    return [
+        DominantColor(
+            tuple(int(round(v)) for v in mean_rgb[i]),
+            centers[i],
+            float(counts[i] / len(points)),
+        )
+        for i in np.argsort(-counts, kind="stable")
+        if counts[i]
+    ]
+
+
+def kmeans(
+    points: np.ndarray,
+    clusters: int,
+    iterations: int = KMEANS_MAX_ITERATIONS,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lloyd's k-means with k-means++ initialization, vectorized over points
+
+    Args:
+        points: Array of shape (n, d)
+        clusters: Number of clusters, at most n
+        iterations: Most assignment rounds; stops earlier once stable
+        seed: Seed of the initialization
+
+    Returns:
+        Cluster label of every point and the cluster centers
+    """
+    rng = np.random.default_rng(seed)
+    centers = np.empty((clusters, points.shape[1]))
+    centers[0] = points[rng.integers(len(points))]
+    closest = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, clusters):
+        # Points already on a center have weight 0; fall back to uniform
+        total = closest.sum()
+        p = closest / total if total > 0 else None
+        centers[i] = points[rng.choice(len(points), p=p)]
+        closest = np.minimum(closest, ((points - centers[i]) ** 2).sum(axis=1))
+
+    labels = np.full(len(points), -1)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.stack(
+            [
+                np.bincount(labels, weights=points[:, d], minlength=clusters)
+                for d in range(points.shape[1])
+            ],
+            axis=-1,
+        )
+        # Empty clusters keep their center
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+
+    return labels, centers
@@ -0,0 +1,38 @@
+"""
+Memory accounting helpers for Mystica Oracle
+"""
+
+import sys
+from typing import Any
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate bytes held by an object and everything it references"""
+    seen = set()
+    stack = [obj]
+    total = 0
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+
+        # Classes, modules and functions are shared, not owned by the object
+        if isinstance(current, type) or callable(current):
+            continue
+        total += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, bytearray, int, float)):
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+
+    return total
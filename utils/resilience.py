@@ -0,0 +1,341 @@
+"""
+Deadlines, timeouts, hedged requests and circuit breaking for LLM calls
+
+A turn sets a deadline that every stage inherits through a context variable.
+Each LLM call then runs under LLMCallPolicy, which:
+
+* times out at the stage timeout or the turn deadline, whichever is sooner
+* fires a duplicate (hedged) request when the first one outlives the
+  recent p95 latency, and keeps whichever answers first
+* fails fast while the model's circuit breaker is open after an error spike
+
+Calls that are skipped or abandoned raise LLMUnavailableError, which the
+agents turn into their canned fallbacks.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from core.exceptions import LLMUnavailableError
+from settings import settings
+from utils.async_runner import run_coroutine
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+    """Limit the block (and everything it awaits) to a time budget"""
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield _deadline.get()
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            # Exited in another context than entered (e.g. a generator closed late)
+            _deadline.set(outer)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self, window: int = settings.LLM_LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Add a latency sample"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(
+        self, q: float, min_samples: int = settings.LLM_HEDGE_MIN_SAMPLES
+    ) -> Optional[float]:
+        """Latency percentile, or None until there are enough samples"""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker for one model
+
+    Opens when at least min_calls calls in the window failed at failure_rate
+    or more. While open, calls fail fast; after open_seconds one trial call
+    is let through (half-open) and its outcome closes or reopens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = settings.CIRCUIT_FAILURE_RATE,
+        min_calls: int = settings.CIRCUIT_MIN_CALLS,
+        window_seconds: float = settings.CIRCUIT_WINDOW_SECONDS,
+        open_seconds: float = settings.CIRCUIT_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                logger.info("Circuit for %s closed", self.name)
+                self.state = self.CLOSED
+                self._trial_in_flight = False
+                self._outcomes.clear()
+            self._add_outcome(True)
+
+    def record_failure(self):
+        """Record a failed or timed-out call"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._add_outcome(False)
+
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def record_abandoned(self):
+        """Record a call cancelled by its caller, which says nothing of the model"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def _add_outcome(self, ok: bool):
+        """Add an outcome and drop the ones that fell out of the window"""
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _open(self):
+        """Start failing fast"""
+        logger.warning("Circuit for %s opened for %.0fs", self.name, self.open_seconds)
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+        self._outcomes.clear()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[Tuple[str, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(model: str) -> CircuitBreaker:
+    """Process-wide circuit breaker of a model"""
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model)
+        return _breakers[model]
+
+
+def get_latency_tracker(stage: str, model: str) -> LatencyTracker:
+    """Process-wide latency window of a stage's calls to a model"""
+    with _registry_lock:
+        key = (stage, model)
+        if key not in _latencies:
+            _latencies[key] = LatencyTracker()
+        return _latencies[key]
+
+
+class LLMCallPolicy:
+    """Timeout, hedging and circuit breaking for one stage's LLM calls"""
+
+    def __init__(
+        self,
+        stage: str,
+        model: Optional[str],
+        timeout_seconds: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_percentile: float = settings.LLM_HEDGE_PERCENTILE,
+        breaker: Optional[CircuitBreaker] = None,
+        latencies: Optional[LatencyTracker] = None,
+    ):
+        config = settings.LLM_CALL_STAGES.get(stage, {})
+        model = model or "unknown"
+        self.stage = stage
+        self.timeout_seconds = (
+            timeout_seconds
+            if timeout_seconds is not None
+            else config.get("timeout_seconds")
+        )
+        self.hedge = hedge if hedge is not None else config.get("hedge", False)
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or get_circuit_breaker(model)
+        self.latencies = latencies or get_latency_tracker(stage, model)
+
+    def invoke(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run an async call under the policy from synchronous code
+
+        Must not be called from the shared event loop's thread (async code
+        awaits ainvoke instead); doing so raises RuntimeError.
+        """
+        return run_coroutine(self.ainvoke(call))
+
+    async def ainvoke(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Run a call under the policy; call is invoked once per attempt"""
+        timeout = self._admit()
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._hedged(call), timeout)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            tracer.annotate(timed_out=True)
+            raise LLMUnavailableError(
+                f"{self.stage} call timed out after {timeout:.1f}s"
+            )
+        except asyncio.CancelledError:
+            self.breaker.record_abandoned()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        self.latencies.record(time.perf_counter() - start)
+        return result
+
+    async def astream(self, stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Stream under the policy; the timeout covers the whole stream"""
+        timeout = self._admit()
+        expires = time.monotonic() + timeout if timeout is not None else None
+        iterator = stream().__aiter__()
+        try:
+            while True:
+                wait = None if expires is None else expires - time.monotonic()
+                if wait is not None and wait <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), wait)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            tracer.annotate(timed_out=True)
+            raise LLMUnavailableError(f"{self.stage} stream timed out")
+        except (GeneratorExit, asyncio.CancelledError):
+            self.breaker.record_abandoned()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+        self.breaker.record_success()
+
+    def _admit(self) -> Optional[float]:
+        """Check the breaker and deadline and return the timeout for a call"""
+        left = remaining_time()
+        if left is not None and left <= 0:
+            tracer.annotate(deadline_exceeded=True)
+            raise LLMUnavailableError(f"No time left in the turn for {self.stage}")
+        if not self.breaker.allow():
+            tracer.annotate(circuit_open=True)
+            raise LLMUnavailableError(f"Circuit for {self.breaker.name} is open")
+
+        timeouts = [t for t in (self.timeout_seconds, left) if t is not None]
+        return min(timeouts) if timeouts else None
+
+    async def _hedged(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run the call, duplicating it if it outlives the recent p95"""
+        primary = asyncio.ensure_future(call())
+        delay = self.latencies.percentile(self.hedge_percentile)
+        if not self.hedge or delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        tracer.annotate(hedged=True)
+        backup = asyncio.ensure_future(call())
+        pending = {primary, backup}
+        try:
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            tracer.annotate(hedge_won=True)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, backup):
+                if not task.done():
+                    task.cancel()
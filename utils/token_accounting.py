@@ -0,0 +1,209 @@
+"""
+Per-stage prompt and completion token accounting for Mystica Oracle
+"""
+
+import json
+import logging
+import math
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import tiktoken
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.outputs import LLMResult
+
+from data.llm_cache import CACHE_HIT_INFO
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Tokens OpenAI chat models add around every message, and to prime the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Rough characters per token, used when the tokenizer cannot be loaded
+FALLBACK_CHARS_PER_TOKEN = 4
+
+_encodings: Dict[str, Optional[tiktoken.Encoding]] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """Tokenizer for a model, or None if it cannot be loaded (e.g. offline)"""
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning("Estimating %s tokens from length: %s", model, e)
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens in a text"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def message_text(message: BaseMessage) -> str:
+    """Text parts of a message (image parts are not counted)"""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in message.content
+    )
+
+
+def count_message_tokens(messages: List[BaseMessage], model: str) -> Tuple[int, int]:
+    """Prompt tokens of a chat request, and how many of them are system messages"""
+    total = TOKENS_PER_REPLY
+    static = 0
+    for message in messages:
+        tokens = TOKENS_PER_MESSAGE + count_tokens(message_text(message), model)
+        total += tokens
+        if isinstance(message, SystemMessage):
+            static += tokens
+    return total, static
+
+
+@dataclass
+class StageTokenUsage:
+    """Token counts accumulated for one workflow stage"""
+
+    calls: int = 0
+    # Calls answered by the LLM response cache, which spend no tokens
+    cached_calls: int = 0
+    prompt_tokens: int = 0
+    static_prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def dynamic_prompt_tokens(self) -> int:
+        """Prompt tokens that change from call to call"""
+        return self.prompt_tokens - self.static_prompt_tokens
+
+
+class TokenAccountant:
+    """Thread-safe per-stage token totals"""
+
+    def __init__(self):
+        self._usage: Dict[str, StageTokenUsage] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage: str,
+        prompt_tokens: int,
+        static_prompt_tokens: int,
+        completion_tokens: int,
+    ):
+        """Add one call's token counts to a stage"""
+        with self._lock:
+            usage = self._usage.setdefault(stage, StageTokenUsage())
+            usage.calls += 1
+            usage.prompt_tokens += prompt_tokens
+            usage.static_prompt_tokens += static_prompt_tokens
+            usage.completion_tokens += completion_tokens
+
+    def record_cache_hit(self, stage: str):
+        """Count a call of a stage that the response cache answered"""
+        with self._lock:
+            self._usage.setdefault(stage, StageTokenUsage()).cached_calls += 1
+
+    def usage(self) -> Dict[str, StageTokenUsage]:
+        """Snapshot of the totals per stage"""
+        with self._lock:
+            return {stage: replace(usage) for stage, usage in self._usage.items()}
+
+    def reset(self):
+        """Forget all totals"""
+        with self._lock:
+            self._usage.clear()
+
+
+token_accountant = TokenAccountant()
+
+
+class TokenAccountingCallback(BaseCallbackHandler):
+    """Counts and logs the tokens of every call made by a stage's LLM"""
+
+    def __init__(
+        self, stage: str, model: str, accountant: TokenAccountant = token_accountant
+    ):
+        self.stage = stage
+        self.model = model
+        self.accountant = accountant
+        self._prompts: Dict[UUID, Tuple[int, int]] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ):
+        self._prompts[run_id] = count_message_tokens(messages[0], self.model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        prompt_tokens, static_tokens = self._prompts.pop(run_id, (0, 0))
+        if self._from_cache(response):
+            self.accountant.record_cache_hit(self.stage)
+            logger.info("stage=%s served from the LLM response cache", self.stage)
+            return
+
+        completion_tokens = sum(
+            count_tokens(self._completion_text(generation), self.model)
+            for generations in response.generations
+            for generation in generations
+        )
+
+        self.accountant.record(
+            self.stage, prompt_tokens, static_tokens, completion_tokens
+        )
+        tracer.annotate(
+            prompt_tokens=prompt_tokens,
+            static_prompt_tokens=static_tokens,
+            completion_tokens=completion_tokens,
+        )
+        logger.info(
+            "stage=%s prompt_tokens=%d static=%d dynamic=%d completion_tokens=%d",
+            self.stage,
+            prompt_tokens,
+            static_tokens,
+            prompt_tokens - static_tokens,
+            completion_tokens,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._prompts.pop(run_id, None)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any):
+        span = tracer.current_span()
+        if span is not None:
+            span.increment("retries")
+
+    def _from_cache(self, response: LLMResult) -> bool:
+        """Whether every generation was served by LLMResponseCache"""
+        generations = [g for gs in response.generations for g in gs]
+        return bool(generations) and all(
+            (g.generation_info or {}).get(CACHE_HIT_INFO) for g in generations
+        )
+
+    def _completion_text(self, generation) -> str:
+        """Generated text, or the tool call arguments of structured output"""
+        if generation.text:
+            return generation.text
+        message = getattr(generation, "message", None)
+        tool_calls = getattr(message, "tool_calls", None)
+        return json.dumps([call["args"] for call in tool_calls]) if tool_calls else ""
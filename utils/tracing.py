@@ -0,0 +1,287 @@
+"""
+Timing spans and latency histograms for workflow turns
+
+A trace covers one turn (or handprint analysis) and holds a tree of spans:
+workflow stages, and inside them the LLM calls made by the agents. The
+current span travels in a context variable, so spans opened in asyncio
+tasks and worker threads nest under the stage that started them, and
+callbacks (token accounting, LLM caches) can annotate the span they run in.
+
+Every finished span feeds a per-name latency histogram, exportable in the
+Prometheus text format; finished traces can also be appended to a JSON
+lines file.
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, TextIO
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Span attributes also kept as Prometheus counters, per span name
+COUNTED_ATTRIBUTES = [
+    "prompt_tokens",
+    "completion_tokens",
+    "retries",
+    "hedged",
+    "hedge_won",
+    "timed_out",
+    "circuit_open",
+    "deadline_exceeded",
+]
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace"""
+
+    name: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = 0.0
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now while still open)"""
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attributes: Any):
+        """Set attributes on the span"""
+        self.attributes.update(attributes)
+
+    def increment(self, key: str, amount: int = 1):
+        """Add to a numeric attribute"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+@dataclass
+class Trace:
+    """The spans of one turn, in the order they started"""
+
+    name: str
+    trace_id: str
+    started_at: float
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def root(self) -> Span:
+        """Span covering the whole trace"""
+        return self.spans[0]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Spans as JSON-serializable dicts, times relative to the trace start"""
+        origin = self.root.start
+        return [
+            {
+                "trace_id": self.trace_id,
+                "trace": self.name,
+                "started_at": self.started_at,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "offset_ms": (span.start - origin) * 1000,
+                "duration_ms": span.duration * 1000,
+                "error": span.error,
+                "attributes": span.attributes,
+            }
+            for span in self.spans
+        ]
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds in seconds"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[int]:
+        """Observations at or below each bucket bound, then the total"""
+        totals, running = [], 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+class Tracer:
+    """Records spans, keeps recent traces and aggregates span latencies"""
+
+    def __init__(
+        self,
+        buckets: List[float] = settings.TRACE_BUCKETS,
+        history: int = settings.TRACE_HISTORY,
+        jsonl_path: str = settings.TRACE_JSONL_PATH,
+    ):
+        self.buckets = buckets
+        self.jsonl_path = jsonl_path
+        self._traces: Deque[Trace] = deque(maxlen=history)
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Trace]:
+        """Start a trace whose root span covers the block"""
+        trace = Trace(name=name, trace_id=uuid.uuid4().hex, started_at=time.time())
+        trace_token = _current_trace.set(trace)
+        try:
+            with self.span(name, **attributes):
+                yield trace
+        finally:
+            _reset(_current_trace, trace_token, None)
+            self._finish_trace(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the block as a child of the current span"""
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start=time.perf_counter(),
+            attributes=dict(attributes),
+        )
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(span)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # A stream closed by its consumer is not a failure
+            raise
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _reset(_current_span, token, parent)
+            self._observe(span)
+
+    def current_span(self) -> Optional[Span]:
+        """Innermost open span of this context, if any"""
+        return _current_span.get()
+
+    def annotate(self, **attributes: Any):
+        """Set attributes on the current span, if there is one"""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def recent_traces(self) -> List[Trace]:
+        """Finished traces, oldest first"""
+        with self._lock:
+            return list(self._traces)
+
+    def export_prometheus(self, prefix: str = "mystica") -> str:
+        """Span histograms and counters in the Prometheus text format"""
+        with self._lock:
+            histograms = {
+                name: (h.buckets, h.cumulative(), h.sum)
+                for name, h in self._histograms.items()
+            }
+            counters = dict(self._counters)
+
+        duration = f"{prefix}_span_duration_seconds"
+        lines = [
+            f"# HELP {duration} Duration of workflow spans",
+            f"# TYPE {duration} histogram",
+        ]
+        for name, (buckets, cumulative, total) in sorted(histograms.items()):
+            bounds = [str(bound) for bound in buckets] + ["+Inf"]
+            for bound, count in zip(bounds, cumulative):
+                lines.append(f'{duration}_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'{duration}_sum{{span="{name}"}} {total}')
+            lines.append(f'{duration}_count{{span="{name}"}} {cumulative[-1]}')
+
+        for metric in sorted({metric for _, metric in counters}):
+            lines.append(f"# TYPE {prefix}_span_{metric}_total counter")
+            for (name, counted), value in sorted(counters.items()):
+                if counted == metric:
+                    lines.append(
+                        f'{prefix}_span_{metric}_total{{span="{name}"}} {value:g}'
+                    )
+        return "\n".join(lines) + "\n"
+
+    def export_jsonl(self, stream: TextIO, traces: Optional[List[Trace]] = None):
+        """Write spans as JSON lines, recent traces by default"""
+        for trace in self.recent_traces() if traces is None else traces:
+            for record in trace.to_records():
+                stream.write(json.dumps(record, default=str) + "\n")
+
+    def _observe(self, span: Span):
+        """Feed a finished span into its histogram and counters"""
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = Histogram(self.buckets)
+            histogram.observe(span.duration)
+
+            counted = [
+                (key, span.attributes[key])
+                for key in COUNTED_ATTRIBUTES
+                if key in span.attributes
+            ]
+            if "cache_hit" in span.attributes:
+                counted.append(("cache_hits", int(bool(span.attributes["cache_hit"]))))
+                counted.append(("cache_lookups", 1))
+            if span.error == "CancelledError":
+                counted.append(("cancelled", 1))
+            elif span.error:
+                counted.append(("errors", 1))
+            for key, value in counted:
+                self._counters[span.name, key] = (
+                    self._counters.get((span.name, key), 0) + value
+                )
+
+    def _finish_trace(self, trace: Trace):
+        """Keep a finished trace and append it to the JSON lines file"""
+        with self._lock:
+            self._traces.append(trace)
+
+        if self.jsonl_path:
+            try:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    self.export_jsonl(f, [trace])
+            except OSError as e:
+                logger.warning("Could not append trace to %s: %s", self.jsonl_path, e)
+
+
+def _reset(var: ContextVar, token, previous):
+    """Restore a context variable, even from a different context"""
+    try:
+        var.reset(token)
+    except ValueError:
+        # Exited in another context than entered (e.g. a generator closed late)
+        var.set(previous)
+
+
+tracer = Tracer()